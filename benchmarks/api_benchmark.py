@@ -0,0 +1,299 @@
+"""
+Benchmark of HTTP API. Seeds users and notes, then drives mixes of login, refresh, list, create, update and delete
+requests against create_app() through in-process test client and through real WSGI server on localhost.
+Reports latency percentiles, throughput and memory allocated per request (peak of tracemalloc, measured in-process
+only); results are saved as JSON, so runs of different commits can be compared.
+
+Run from root directory:
+    python -m benchmarks.api_benchmark --users 10 --notes 1000 --note-size 2000 --mix mixed --transport both
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from uuid import UUID, uuid4
+
+from sqlalchemy import insert
+from werkzeug.serving import make_server
+
+from opennote.app import create_app
+from opennote.auth.auth import create_salt, hash_password
+from opennote.database import db
+from opennote.db_model import Note, User
+from opennote.test_config import AppTestConfig
+
+PASSWORD = "benchmark password"
+MIXES = {
+    "read": {"list": 1.0},
+    "write": {"create": 0.4, "update": 0.4, "delete": 0.2},
+    "auth": {"login": 0.5, "refresh": 0.5},
+    "mixed": {"list": 0.6, "create": 0.1, "update": 0.15, "delete": 0.05, "refresh": 0.1},
+}
+TRANSPORTS = ["in-process", "server"]
+
+
+class InProcessClient:
+    def __init__(self, app):
+        self._client = app.test_client(use_cookies=False)
+
+    def request(self, method: str, path: str, body: dict = None, cookie: str = None) -> tuple[int, dict, bytes]:
+        response = self._client.open(path, method=method, json=body, headers={"Cookie": cookie} if cookie else {})
+        return response.status_code, response.headers, response.data
+
+
+class HttpClient:
+    def __init__(self, port: int):
+        self._port = port
+
+    def request(self, method: str, path: str, body: dict = None, cookie: str = None) -> tuple[int, dict, bytes]:
+        connection = http.client.HTTPConnection("127.0.0.1", self._port)
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        if cookie:
+            headers["Cookie"] = cookie
+        try:
+            connection.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+            response = connection.getresponse()
+            return response.status, response.headers, response.read()
+        finally:
+            connection.close()
+
+
+class UserSession:
+    """Client of a single benchmark user, keeping its auth cookie and notes it can modify"""
+
+    def __init__(self, client, username: str, notes: list[dict], note_size: int, rng: random.Random):
+        self.client = client
+        self.username = username
+        self.notes = notes
+        self.note_size = note_size
+        self.rng = rng
+        self.cookie = None
+        self.created_ids = []
+
+    def login(self) -> int:
+        status, headers, _ = self.client.request("POST", "/access-token/login",
+                                                 {"username": self.username, "password": PASSWORD})
+        self._keep_cookie(headers)
+        return status
+
+    def refresh(self) -> int:
+        status, headers, _ = self.client.request("POST", "/access-token/refresh", cookie=self.cookie)
+        self._keep_cookie(headers)
+        return status
+
+    def list(self) -> int:
+        return self.client.request("GET", "/notes/?limit=50", cookie=self.cookie)[0]
+
+    def create(self) -> int:
+        status, _, data = self.client.request("POST", "/notes/", {"name": f"bench {uuid4().hex[:40]}",
+                                                                  "content": "x" * self.note_size}, self.cookie)
+        if status == 201:
+            self.created_ids.append(json.loads(data)["id"])
+        return status
+
+    def update(self) -> int:
+        note = self.rng.choice(self.notes)
+        note["content"] = self.rng.choice("abcdef") * self.note_size
+        return self.client.request("PUT", f"/notes/{note['id']}", note, self.cookie)[0]
+
+    def delete(self) -> int:
+        if not self.created_ids:
+            self.create()
+        return self.client.request("DELETE", f"/notes/{self.created_ids.pop()}", cookie=self.cookie)[0]
+
+    def _keep_cookie(self, headers):
+        set_cookie = headers.get("Set-Cookie")
+        if set_cookie and set_cookie.startswith("Authorization=Bearer"):
+            self.cookie = set_cookie.split(";")[0]
+
+
+def seed(app, users: int, notes: int, note_size: int) -> dict[str, list[dict]]:
+    """Returns notes of each seeded user by username, notes are split between users evenly"""
+    user_ids = {f"bench-user-{i}": uuid4() for i in range(users)}
+    notes_by_user = {username: [] for username in user_ids}
+    rows = []
+    for i in range(notes):
+        username = f"bench-user-{i % users}"
+        note = {"id": str(uuid4()), "name": f"seed {i}", "content": "x" * note_size}
+        notes_by_user[username].append(note)
+        rows.append(note | {"id": UUID(note["id"]), "user_id": user_ids[username]})
+    with app.app_context():
+        for username, user_id in user_ids.items():
+            salt = create_salt()
+            db.session.add(User(id=user_id, username=username, password_salt=salt,
+                                password=hash_password(PASSWORD, salt)))
+        db.session.commit()
+        if rows:
+            db.session.execute(insert(Note), rows)
+            db.session.commit()
+    return notes_by_user
+
+
+def run_mix(sessions: list[UserSession], mix: dict[str, float], requests: int, trace_memory: bool) -> dict:
+    operations = list(mix)
+    weights = [mix[operation] for operation in operations]
+    latencies = defaultdict(list)
+    memory = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+
+    def worker(session: UserSession, count: int):
+        for operation in session.rng.choices(operations, weights, k=count):
+            if trace_memory:
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+            start = time.perf_counter()
+            status = getattr(session, operation)()
+            seconds = time.perf_counter() - start
+            with lock:
+                latencies[operation].append(seconds)
+                if status >= 400:
+                    errors[operation] += 1
+                if trace_memory:
+                    memory[operation].append(tracemalloc.get_traced_memory()[1] - before)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(sessions)) as executor:
+        share, remainder = divmod(requests, len(sessions))
+        futures = [executor.submit(worker, session, share + (index < remainder))
+                   for index, session in enumerate(sessions)]
+        for future in futures:
+            future.result()
+    wall_seconds = time.perf_counter() - start
+
+    all_latencies = [seconds for samples in latencies.values() for seconds in samples]
+    result = {
+        "requests": len(all_latencies),
+        "seconds": wall_seconds,
+        "throughput_rps": len(all_latencies) / wall_seconds,
+        "latency_ms": _latency_summary(all_latencies),
+        "operations": {operation: {"requests": len(samples), "errors": errors[operation],
+                                   "latency_ms": _latency_summary(samples)}
+                       for operation, samples in latencies.items()},
+    }
+    if trace_memory:
+        for operation, samples in memory.items():
+            result["operations"][operation]["memory_kib"] = {"mean": statistics.mean(samples) / 1024,
+                                                             "max": max(samples) / 1024}
+    return result
+
+
+def benchmark_transport(app, transport: str, notes_by_user: dict[str, list[dict]], args) -> dict:
+    server = None
+    if transport == "server":
+        server = make_server("127.0.0.1", 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        client = HttpClient(server.server_port)
+    else:
+        client = InProcessClient(app)
+    try:
+        usernames = list(notes_by_user)[:args.concurrency]
+        sessions = [UserSession(client, username, notes_by_user[username], args.note_size,
+                                random.Random(args.seed + index)) for index, username in enumerate(usernames)]
+        for session in sessions:
+            assert session.login() == 201, "benchmark user can't log in"
+
+        results = {}
+        for mix in args.mix:
+            results[mix] = run_mix(sessions, MIXES[mix], args.requests, trace_memory=False)
+            if server:
+                # werkzeug server alone allocates ~10 MiB per request, which would hide app allocations
+                continue
+            # single client, so peak of traced memory isn't shared with other requests
+            tracemalloc.start()
+            memory = run_mix(sessions[:1], MIXES[mix], args.memory_requests, trace_memory=True)
+            tracemalloc.stop()
+            for operation, operation_result in memory["operations"].items():
+                results[mix]["operations"].setdefault(operation, {})["memory_kib"] = operation_result["memory_kib"]
+        return results
+    finally:
+        if server:
+            server.shutdown()
+
+
+def print_results(results: dict):
+    print(f"{'transport':<12}{'mix':<8}{'operation':<10}{'requests':>10}{'errors':>8}{'p50 [ms]':>10}"
+          f"{'p95 [ms]':>10}{'p99 [ms]':>10}{'mem [KiB]':>11}{'req/s':>9}")
+    for transport, mixes in results.items():
+        for mix, result in mixes.items():
+            for operation, operation_result in sorted(result["operations"].items()):
+                latency = operation_result.get("latency_ms", {})
+                print(f"{transport:<12}{mix:<8}{operation:<10}{operation_result.get('requests', 0):>10}"
+                      f"{operation_result.get('errors', 0):>8}{latency.get('p50', 0):>10.2f}"
+                      f"{latency.get('p95', 0):>10.2f}{latency.get('p99', 0):>10.2f}"
+                      f"{operation_result.get('memory_kib', {}).get('mean', 0):>11.1f}")
+            latency = result["latency_ms"]
+            print(f"{transport:<12}{mix:<8}{'all':<10}{result['requests']:>10}{'':>8}{latency['p50']:>10.2f}"
+                  f"{latency['p95']:>10.2f}{latency['p99']:>10.2f}{'':>11}{result['throughput_rps']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="empty database, by default temporary SQLite file is used")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--notes", type=int, default=500)
+    parser.add_argument("--note-size", type=int, default=1000, help="characters of note content")
+    parser.add_argument("--mix", nargs="+", choices=list(MIXES), default=list(MIXES))
+    parser.add_argument("--transport", choices=TRANSPORTS + ["both"], default="both")
+    parser.add_argument("--requests", type=int, default=500, help="requests of each mix measured for latency")
+    parser.add_argument("--memory-requests", type=int, default=50,
+                        help="requests of each mix measured for memory (with tracemalloc, so separately)")
+    parser.add_argument("--concurrency", type=int, default=4, help="simultaneous clients, each logged as other user")
+    parser.add_argument("--password-work-factor", type=int, default=AppTestConfig.password_hash_work_factor)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON results file, by default benchmarks/results/api_<commit>.json")
+    args = parser.parse_args()
+
+    os.environ.setdefault("JWT_SECRET", "benchmark")
+    os.environ.setdefault("ORIGINS", "*")
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = args.database_url or f"sqlite:///{os.path.join(directory, 'yana.db')}"
+        app = create_app(AppTestConfig(test_database_url=url, skip_auth=False,
+                                       password_hash_work_factor=args.password_work_factor))
+        notes_by_user = seed(app, args.users, args.notes, args.note_size)
+
+        results = {}
+        for transport in TRANSPORTS if args.transport == "both" else [args.transport]:
+            results[transport] = benchmark_transport(app, transport, notes_by_user, args)
+
+    print_results(results)
+    commit = _git_commit()
+    output = args.output or os.path.join("benchmarks", "results", f"api_{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as file:
+        json.dump({"commit": commit, "created_at": datetime.now(timezone.utc).isoformat(),
+                   "python": platform.python_version(), "arguments": vars(args), "results": results}, file, indent=2)
+    print(f"results saved to {output}")
+
+
+def _latency_summary(samples: list[float]) -> dict:
+    milliseconds = sorted(seconds * 1000 for seconds in samples)
+    if len(milliseconds) < 2:
+        milliseconds = milliseconds * 2 or [0.0, 0.0]
+    percentiles = statistics.quantiles(milliseconds, n=100, method="inclusive")
+    return {"mean": statistics.mean(milliseconds), "p50": percentiles[49], "p95": percentiles[94],
+            "p99": percentiles[98], "max": milliseconds[-1]}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], check=True, capture_output=True,
+                              text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == '__main__':
+    main()
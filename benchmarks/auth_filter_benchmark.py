@@ -0,0 +1,89 @@
+"""
+Micro-benchmark of auth filter deciding if request needs jwt, on app with many public and authenticated routes.
+'before' reproduces previous implementation, which scanned public path prefixes with startswith on every request.
+Requests carry valid jwt, which is already verified (as it's kept in flask.g), so only the decision is measured.
+
+Run from root directory:
+    python -m benchmarks.auth_filter_benchmark --routes 60
+"""
+import argparse
+import time
+from uuid import uuid4
+
+from flask import Blueprint, Flask, Response, g, request
+
+from opennote.auth.auth_filter import AuthException, creat_auth_filter, extract_jwt_from_request, public_blueprint
+from opennote.auth.jwt import JWT, InvalidJWT
+from opennote.common.data_time_utils import timestamp_in_seconds
+
+
+def legacy_auth_filter(bypass_prefixes: list[str]):
+    def auth_filter():
+        for start_with in bypass_prefixes:
+            if request.path.startswith(start_with):
+                return
+        if request.method == "OPTIONS":
+            return
+        try:
+            jwt = extract_jwt_from_request()
+            if jwt.is_expired:
+                raise AuthException("Expired token")
+        except (AuthException, InvalidJWT):
+            return Response(), 403
+
+    return auth_filter
+
+
+def create_benchmark_app(routes: int) -> tuple[Flask, list[str], list[str]]:
+    """Half of routes is public, each public route is in its own blueprint with its own prefix (like /metrics)"""
+    app = Flask(__name__)
+    app.config['JWT_SECRET'] = "benchmark secret"
+    public_paths, private_paths = [], []
+    for i in range(routes // 2):
+        blueprint = public_blueprint(Blueprint(f"public_{i}", __name__, url_prefix=f"/public-{i}"))
+        blueprint.add_url_rule('/items', endpoint='items', view_func=lambda: "")
+        app.register_blueprint(blueprint)
+        public_paths.append(f"/public-{i}/items")
+    private = Blueprint("private", __name__, url_prefix="/private")
+    for i in range(routes - routes // 2):
+        private.add_url_rule(f'/items-{i}', endpoint=f'items_{i}', view_func=lambda: "")
+        private_paths.append(f"/private/items-{i}")
+    app.register_blueprint(private)
+    return app, public_paths, private_paths
+
+
+def filter_calls_per_second(app: Flask, auth_filter, paths: list[str], cookie: str, rounds: int) -> float:
+    elapsed = 0.0
+    for path in paths:
+        with app.test_request_context(path, headers={"Cookie": cookie}):
+            extract_jwt_from_request()
+            start = time.perf_counter()
+            for _ in range(rounds):
+                auth_filter()
+            elapsed += time.perf_counter() - start
+            g.pop('jwt')
+    return rounds * len(paths) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--routes", type=int, default=60, help="routes of app, half of them public")
+    parser.add_argument("--rounds", type=int, default=2000, help="filter calls per route")
+    args = parser.parse_args()
+
+    app, public_paths, private_paths = create_benchmark_app(args.routes)
+    legacy = legacy_auth_filter([path.rsplit('/', 1)[0] for path in public_paths])
+    current = creat_auth_filter(app)
+    with app.app_context():
+        token = JWT.create(issued_at=timestamp_in_seconds(), refresh_token=uuid4(), user_id=uuid4()).serialize()
+    cookie = f"Authorization=Bearer {token}"
+
+    print(f"{'routes':<15}{'before [calls/s]':>20}{'after [calls/s]':>20}{'speedup':>10}")
+    for name, paths in [("public", public_paths), ("authenticated", private_paths)]:
+        before_rate = filter_calls_per_second(app, legacy, paths, cookie, args.rounds)
+        after_rate = filter_calls_per_second(app, current, paths, cookie, args.rounds)
+        print(f"{name:<15}{before_rate:>20,.0f}{after_rate:>20,.0f}{after_rate / before_rate:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
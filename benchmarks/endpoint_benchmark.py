@@ -0,0 +1,113 @@
+"""
+Micro-benchmark of per-request overhead of routing_decorators.endpoint: binding body and jwt and serializing result.
+'before' reproduces previous implementation, which read annotations on each call, built body from request.get_json()
+and serialized results with jsonify. Handlers return prepared results and median time of pushing request context
+alone is subtracted, so only decorator work is reported.
+
+Run from root directory:
+    python -m benchmarks.endpoint_benchmark
+"""
+import argparse
+import statistics
+import time
+from functools import wraps
+from uuid import uuid4
+
+from flask import Flask, Response, jsonify, request
+
+from opennote.app import PydanticJsonProvider
+from opennote.auth.auth_filter import extract_jwt_from_request
+from opennote.auth.jwt import JWT
+from opennote.common.data_time_utils import timestamp_in_seconds
+from opennote.common.routing_decorators import endpoint
+from opennote.database import db, route_reads_to_replica
+from opennote.metrics.request_metrics import AUTH_PHASE, HANDLER_PHASE, PARSE_PHASE, SERIALIZE_PHASE, request_timings
+from opennote.notes.notes import CreateNoteDTO, NoteDTO, NotesPageDTO
+
+
+def legacy_endpoint(func):
+    @wraps(func)
+    def decorated_function(*args, **kwargs):
+        timings = request_timings()
+        fun_kwargs = kwargs
+        if request.method == 'GET':
+            route_reads_to_replica()
+        if "body" in func.__annotations__:
+            with timings.phase(PARSE_PHASE):
+                fun_kwargs = fun_kwargs | {'body': func.__annotations__["body"](**request.get_json())}
+        if "jwt" in func.__annotations__:
+            with timings.phase(AUTH_PHASE):
+                fun_kwargs = fun_kwargs | {'jwt': extract_jwt_from_request()}
+        with timings.phase(HANDLER_PHASE):
+            result, status, *headers = func(*args, **fun_kwargs)
+        with timings.phase(SERIALIZE_PHASE):
+            if isinstance(result, Response):
+                return result, status, *headers
+            return jsonify(result), status, *headers
+
+    return decorated_function
+
+
+def scenarios(notes: list[NoteDTO]) -> list:
+    """(name, request arguments, handler) for each measured endpoint shape"""
+    page = NotesPageDTO(items=notes, next_cursor="cursor")
+
+    def create_note(body: CreateNoteDTO, jwt: JWT) -> tuple[NoteDTO, int, dict]:
+        return notes[0], 201, {}
+
+    def list_notes(jwt: JWT) -> tuple[list[NoteDTO], int]:
+        return notes, 200
+
+    def notes_page(jwt: JWT) -> tuple[NotesPageDTO, int]:
+        return page, 200
+
+    create_body = {"json": {"name": "name", "content": notes[0].content}}
+    return [
+        ("create", dict(method="POST", **create_body), create_note),
+        ("list", dict(method="GET"), list_notes),
+        ("page", dict(method="GET"), notes_page),
+    ]
+
+
+def overhead_us(app: Flask, handler, request_arguments: dict, cookie: str, rounds: int) -> tuple[float, float]:
+    """
+    Median time of request with legacy and current decorator, without median time of pushing request context alone.
+    Variants are interleaved, so drift of machine load affects all of them the same.
+    """
+    variants = [lambda: None, legacy_endpoint(handler), endpoint(handler)]
+    samples = [[] for _ in variants]
+    for _ in range(rounds):
+        for variant, variant_samples in zip(variants, samples):
+            start = time.perf_counter()
+            with app.test_request_context('/notes/', headers={"Cookie": cookie}, **request_arguments):
+                variant()
+            variant_samples.append(time.perf_counter() - start)
+    context_only, before, after = (statistics.median(variant_samples) for variant_samples in samples)
+    return (before - context_only) * 1e6, (after - context_only) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--notes", type=int, default=50, help="notes in list and page results")
+    parser.add_argument("--note-size", type=int, default=200, help="characters of note content")
+    parser.add_argument("--rounds", type=int, default=10000)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.json = PydanticJsonProvider(app)
+    app.config['JWT_SECRET'] = "benchmark secret"
+    # GET requests check if reads should go to replica, no query is sent
+    app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:///:memory:"
+    db.init_app(app)
+    with app.app_context():
+        token = JWT.create(issued_at=timestamp_in_seconds(), refresh_token=uuid4(), user_id=uuid4()).serialize()
+    cookie = f"Authorization=Bearer {token}"
+    notes = [NoteDTO(id=uuid4(), name=f"note {i}", content="x" * args.note_size) for i in range(args.notes)]
+
+    print(f"{'endpoint':<10}{'before [us/req]':>18}{'after [us/req]':>18}{'speedup':>10}")
+    for name, request_arguments, handler in scenarios(notes):
+        before, after = overhead_us(app, handler, request_arguments, cookie, args.rounds)
+        print(f"{name:<10}{before:>18.1f}{after:>18.1f}{before / after:>9.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Micro-benchmark of JWT signing and verification.
+'before' reproduces previous implementation which derived key and re-serialized header and payload on each use.
+
+Run from root directory:
+    python -m benchmarks.jwt_benchmark
+"""
+import argparse
+import hashlib
+import hmac
+import time
+from base64 import b64encode
+from uuid import uuid4
+
+from flask import Flask, current_app
+
+from opennote.auth.jwt import JWT
+from opennote.common.data_time_utils import timestamp_in_seconds
+
+
+def legacy_signature(jwt: JWT) -> str:
+    return b64encode(hmac.new(
+        key=bytes(current_app.config.get("JWT_SECRET"), JWT.STRING_ENCODING),
+        msg=bytes(f"{jwt.header}.{jwt.payload}", JWT.STRING_ENCODING),
+        digestmod=hashlib.sha256
+    ).digest()).decode(JWT.STRING_ENCODING)
+
+
+def legacy_serialize(jwt: JWT) -> str:
+    # every property access re-serialized header and payload
+    return f"{jwt.header}.{jwt.payload}.{jwt._signature or legacy_signature(jwt)}"
+
+
+def legacy_verify(token: str):
+    jwt = JWT.from_string(token)
+    if not hmac.compare_digest(jwt.signature, legacy_signature(jwt)):
+        raise AssertionError("invalid signature")
+
+
+def verify(token: str):
+    JWT.from_string(token).validate()
+
+
+def tokens_per_second(operation, tokens, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for token in tokens:
+            operation(token)
+    return rounds * len(tokens) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config['JWT_SECRET'] = "benchmark secret"
+    with app.app_context():
+        jwts = [JWT.create(issued_at=timestamp_in_seconds(), refresh_token=uuid4(), user_id=uuid4())
+                for _ in range(args.tokens)]
+        tokens = [jwt.serialize() for jwt in jwts]
+
+        results = [
+            ("serialize", legacy_serialize, JWT.serialize, jwts),
+            ("verify", legacy_verify, verify, tokens),
+        ]
+        print(f"{'operation':<12}{'before [tokens/s]':>20}{'after [tokens/s]':>20}{'speedup':>10}")
+        for name, before, after, inputs in results:
+            before_rate = tokens_per_second(before, inputs, args.rounds)
+            after_rate = tokens_per_second(after, inputs, args.rounds)
+            print(f"{name:<12}{before_rate:>20,.0f}{after_rate:>20,.0f}{after_rate / before_rate:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Benchmark of password verification throughput (upper bound of logins/s per worker) for given work factors.
+Concurrent clients share one hashing pool, same as request threads of a single app.
+
+Run from root directory:
+    python -m benchmarks.password_hashing_benchmark --algorithm scrypt --work-factors 4096 16384
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from opennote.auth.passwords import PasswordHashing, DEFAULT_ALGORITHM, DEFAULT_WORKERS, PBKDF2_SHA256, SCRYPT
+
+DEFAULT_BENCHMARK_WORK_FACTORS = {
+    PBKDF2_SHA256: [10_000, 100_000, 600_000],
+    SCRYPT: [2 ** 12, 2 ** 14, 2 ** 15],
+}
+
+
+def logins_per_second(hashing: PasswordHashing, stored: str, clients: int, logins: int) -> float:
+    def login(_):
+        assert hashing.verify("password", "salt", stored)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as client_threads:
+        list(client_threads.map(login, range(logins)))
+    return logins / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--algorithm", default=DEFAULT_ALGORITHM, choices=[PBKDF2_SHA256, SCRYPT])
+    parser.add_argument("--work-factors", type=int, nargs="+")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="size of hashing pool")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent logins")
+    parser.add_argument("--logins", type=int, default=32)
+    args = parser.parse_args()
+
+    print(f"{args.algorithm}, {args.workers} hashing workers, {args.clients} concurrent clients")
+    print(f"{'work factor':>12}{'logins/s':>12}")
+    for work_factor in args.work_factors or DEFAULT_BENCHMARK_WORK_FACTORS[args.algorithm]:
+        hashing = PasswordHashing(algorithm=args.algorithm, work_factor=work_factor, max_workers=args.workers)
+        stored = hashing.hash("password", "salt")
+        rate = logins_per_second(hashing, stored, args.clients, args.logins)
+        print(f"{work_factor:>12}{rate:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
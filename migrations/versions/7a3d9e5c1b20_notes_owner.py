@@ -0,0 +1,77 @@
+"""Notes owner
+
+Revision ID: 7a3d9e5c1b20
+Revises: 1f6c0b8e5a42
+Create Date: 2026-10-18 17:02:48.530117
+
+"""
+import uuid
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '7a3d9e5c1b20'
+down_revision = '1f6c0b8e5a42'
+branch_labels = None
+depends_on = None
+
+# existing notes are given to admin user created with starting data
+ADMIN_ID = uuid.UUID("a155d430-fac1-489c-8d2b-634808e04bd6")
+# SQLite keeps unnamed constraints, so name is given to reflected one in batch mode
+NAMING_CONVENTION = {"uq": "uq_%(table_name)s_%(column_0_name)s"}
+SQLITE_FTS_TRIGGERS = [
+    "CREATE TRIGGER notes_fts_insert AFTER INSERT ON notes BEGIN "
+    "INSERT INTO notes_fts(id, name, content) VALUES (new.id, new.name, new.content); END",
+    "CREATE TRIGGER notes_fts_update AFTER UPDATE OF name, content ON notes BEGIN "
+    "UPDATE notes_fts SET name = new.name, content = new.content WHERE id = old.id; END",
+    "CREATE TRIGGER notes_fts_delete AFTER DELETE ON notes BEGIN "
+    "DELETE FROM notes_fts WHERE id = old.id; END",
+]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    name_unique_constraint = 'notes_name_key' if dialect == 'postgresql' else 'uq_notes_name'
+
+    op.add_column('notes', sa.Column('user_id', sa.Uuid(), nullable=True))
+    op.execute(sa.table('notes', sa.column('user_id', sa.Uuid())).update().values(user_id=ADMIN_ID))
+    with op.batch_alter_table('notes', naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.alter_column('user_id', existing_type=sa.Uuid(), nullable=False)
+        batch_op.drop_constraint(name_unique_constraint, type_='unique')
+        batch_op.create_unique_constraint('uq_notes_user_id_name', ['user_id', 'name'])
+        batch_op.drop_index('ix_notes_updated_at_id')
+        batch_op.create_index('ix_notes_user_id_updated_at', ['user_id', 'updated_at', 'id'], unique=False)
+
+    op.add_column('note_tombstones', sa.Column('user_id', sa.Uuid(), nullable=True))
+    op.execute(sa.table('note_tombstones', sa.column('user_id', sa.Uuid())).update().values(user_id=ADMIN_ID))
+    with op.batch_alter_table('note_tombstones') as batch_op:
+        batch_op.alter_column('user_id', existing_type=sa.Uuid(), nullable=False)
+        batch_op.drop_index('ix_note_tombstones_deleted_at')
+        batch_op.create_index('ix_note_tombstones_user_id_deleted_at', ['user_id', 'deleted_at'], unique=False)
+
+    if dialect == 'sqlite':
+        # batch mode recreated notes table, which dropped its full text search triggers
+        for trigger in SQLITE_FTS_TRIGGERS:
+            op.execute(trigger)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    name_unique_constraint = 'notes_name_key' if dialect == 'postgresql' else 'uq_notes_name'
+
+    with op.batch_alter_table('note_tombstones') as batch_op:
+        batch_op.drop_index('ix_note_tombstones_user_id_deleted_at')
+        batch_op.create_index('ix_note_tombstones_deleted_at', ['deleted_at'], unique=False)
+        batch_op.drop_column('user_id')
+
+    with op.batch_alter_table('notes') as batch_op:
+        batch_op.drop_index('ix_notes_user_id_updated_at')
+        batch_op.create_index('ix_notes_updated_at_id', ['updated_at', 'id'], unique=False)
+        batch_op.drop_constraint('uq_notes_user_id_name', type_='unique')
+        batch_op.create_unique_constraint(name_unique_constraint, ['name'])
+        batch_op.drop_column('user_id')
+
+    if dialect == 'sqlite':
+        for trigger in SQLITE_FTS_TRIGGERS:
+            op.execute(trigger)
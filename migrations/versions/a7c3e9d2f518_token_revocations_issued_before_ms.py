@@ -0,0 +1,36 @@
+"""Token revocations issued before in milliseconds
+
+Revision ID: a7c3e9d2f518
+Revises: f4b8e1c6a273
+Create Date: 2026-10-20 09:41:26.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e9d2f518'
+down_revision = 'f4b8e1c6a273'
+branch_labels = None
+depends_on = None
+
+token_revocations = sa.table('token_revocations', sa.column('issued_before', sa.BigInteger()))
+
+
+def upgrade():
+    with op.batch_alter_table('token_revocations') as batch_op:
+        batch_op.alter_column('issued_before', existing_type=sa.Integer(), type_=sa.BigInteger(),
+                              existing_nullable=True)
+    op.execute(token_revocations.update()
+               .where(token_revocations.c.issued_before.is_not(None))
+               .values(issued_before=token_revocations.c.issued_before * 1000))
+
+
+def downgrade():
+    # rounded up, so tokens revoked in milliseconds stay revoked
+    op.execute(token_revocations.update()
+               .where(token_revocations.c.issued_before.is_not(None))
+               .values(issued_before=(token_revocations.c.issued_before + 999) / 1000))
+    with op.batch_alter_table('token_revocations') as batch_op:
+        batch_op.alter_column('issued_before', existing_type=sa.BigInteger(), type_=sa.Integer(),
+                              existing_nullable=True)
@@ -0,0 +1,42 @@
+"""Refresh token families
+
+Revision ID: b6d1f3a8c259
+Revises: 4c8e2d7b9f16
+Create Date: 2026-10-18 19:25:41.118830
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b6d1f3a8c259'
+down_revision = '4c8e2d7b9f16'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('refresh_tokens', sa.Column('family_id', sa.Uuid(), nullable=True))
+    # every existing token starts its own family, as tokens without family claim do
+    refresh_tokens = sa.table('refresh_tokens', sa.column('id', sa.Uuid()), sa.column('family_id', sa.Uuid()))
+    op.execute(refresh_tokens.update().values(family_id=refresh_tokens.c.id))
+    with op.batch_alter_table('refresh_tokens') as batch_op:
+        batch_op.alter_column('family_id', existing_type=sa.Uuid(), nullable=False)
+        batch_op.create_index('ix_refresh_tokens_family_id', ['family_id'], unique=False)
+
+    with op.batch_alter_table('token_revocations') as batch_op:
+        batch_op.alter_column('family_id', existing_type=sa.Uuid(), nullable=True)
+        batch_op.add_column(sa.Column('user_id', sa.Uuid(), nullable=True))
+        batch_op.add_column(sa.Column('issued_before', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    op.execute(sa.text("DELETE FROM token_revocations WHERE family_id IS NULL"))
+    with op.batch_alter_table('token_revocations') as batch_op:
+        batch_op.drop_column('issued_before')
+        batch_op.drop_column('user_id')
+        batch_op.alter_column('family_id', existing_type=sa.Uuid(), nullable=False)
+
+    with op.batch_alter_table('refresh_tokens') as batch_op:
+        batch_op.drop_index('ix_refresh_tokens_family_id')
+        batch_op.drop_column('family_id')
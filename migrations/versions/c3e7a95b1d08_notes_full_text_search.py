@@ -0,0 +1,45 @@
+"""Notes full text search
+
+Revision ID: c3e7a95b1d08
+Revises: 9b41e6d0f2a7
+Create Date: 2026-10-18 13:26:55.072914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c3e7a95b1d08'
+down_revision = '9b41e6d0f2a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("ALTER TABLE notes ADD COLUMN search_vector tsvector GENERATED ALWAYS AS "
+                   "(to_tsvector('simple', name || ' ' || content)) STORED")
+        op.create_index('ix_notes_search_vector', 'notes', ['search_vector'], unique=False, postgresql_using='gin')
+    elif dialect == 'sqlite':
+        # FTS5 index kept in sync by triggers, used as fallback for tests
+        op.execute("CREATE VIRTUAL TABLE notes_fts USING fts5(id UNINDEXED, name, content)")
+        op.execute("INSERT INTO notes_fts(id, name, content) SELECT id, name, content FROM notes")
+        op.execute("CREATE TRIGGER notes_fts_insert AFTER INSERT ON notes BEGIN "
+                   "INSERT INTO notes_fts(id, name, content) VALUES (new.id, new.name, new.content); END")
+        op.execute("CREATE TRIGGER notes_fts_update AFTER UPDATE OF name, content ON notes BEGIN "
+                   "UPDATE notes_fts SET name = new.name, content = new.content WHERE id = old.id; END")
+        op.execute("CREATE TRIGGER notes_fts_delete AFTER DELETE ON notes BEGIN "
+                   "DELETE FROM notes_fts WHERE id = old.id; END")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.drop_index('ix_notes_search_vector', table_name='notes')
+        op.drop_column('notes', 'search_vector')
+    elif dialect == 'sqlite':
+        op.execute("DROP TRIGGER notes_fts_delete")
+        op.execute("DROP TRIGGER notes_fts_update")
+        op.execute("DROP TRIGGER notes_fts_insert")
+        op.execute("DROP TABLE notes_fts")
@@ -0,0 +1,24 @@
+"""Note tombstones deleted at index
+
+Revision ID: c5e2b8f41d96
+Revises: a7c3e9d2f518
+Create Date: 2026-10-20 10:27:53.904615
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c5e2b8f41d96'
+down_revision = 'a7c3e9d2f518'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # tombstones are purged by deletion time
+    op.create_index('ix_note_tombstones_deleted_at', 'note_tombstones', ['deleted_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_note_tombstones_deleted_at', table_name='note_tombstones')
@@ -0,0 +1,25 @@
+"""Users notes version
+
+Revision ID: d2a9c4e7f135
+Revises: b6d1f3a8c259
+Create Date: 2026-10-19 10:12:37.512904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'd2a9c4e7f135'
+down_revision = 'b6d1f3a8c259'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.add_column(sa.Column('notes_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('notes_version')
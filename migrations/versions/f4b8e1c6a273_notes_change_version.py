@@ -0,0 +1,38 @@
+"""Notes change version
+
+Revision ID: f4b8e1c6a273
+Revises: d2a9c4e7f135
+Create Date: 2026-10-19 11:02:15.730418
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'f4b8e1c6a273'
+down_revision = 'd2a9c4e7f135'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # existing notes and tombstones get version 0, clients with older sync tokens get all of them once
+    # notes aren't altered in batch mode, which would recreate the table and drop its SQLite full text search triggers
+    op.add_column('notes', sa.Column('change_version', sa.Integer(), server_default='0', nullable=False))
+    op.create_index('ix_notes_user_id_change_version', 'notes', ['user_id', 'change_version'], unique=False)
+
+    with op.batch_alter_table('note_tombstones') as batch_op:
+        batch_op.add_column(sa.Column('change_version', sa.Integer(), server_default='0', nullable=False))
+        batch_op.drop_index('ix_note_tombstones_user_id_deleted_at')
+        batch_op.create_index('ix_note_tombstones_user_id_change_version', ['user_id', 'change_version'],
+                              unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('note_tombstones') as batch_op:
+        batch_op.drop_index('ix_note_tombstones_user_id_change_version')
+        batch_op.create_index('ix_note_tombstones_user_id_deleted_at', ['user_id', 'deleted_at'], unique=False)
+        batch_op.drop_column('change_version')
+
+    op.drop_index('ix_notes_user_id_change_version', table_name='notes')
+    op.drop_column('notes', 'change_version')
@@ -2,16 +2,23 @@ import os
 import typing as t
 from os import environ
 
-from flask import Flask
+import click
+from flask import Flask, current_app
+from flask.cli import with_appcontext
 from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from sqlalchemy import URL
 
-from opennote.auth import auth
+from opennote.auth import auth, passwords, revocations, user_cache
 from opennote.auth.auth_filter import creat_auth_filter
+from opennote.auth.refresh_token_gc import init_refresh_token_gc
+from opennote.common import compression
 from opennote.common.error_handling import register_error_handlers
-from opennote.notes import notes
-from .database import init_db
+from opennote.metrics import metrics, query_budget
+from opennote.metrics.request_metrics import init_request_metrics
+from opennote.notes import notes, response_cache
+from .database import init_db, migrate_db, engine_options, MIGRATE_ON_STARTUP, REPLICA_BIND, \
+    DEFAULT_READ_PRIMARY_SECONDS
 from .test_config import AppTestConfig
 
 
@@ -41,23 +48,90 @@ def create_app(test_config: AppTestConfig = None) -> Flask:
     app.register_blueprint(notes.bluprint)
     app.register_blueprint(auth.bluprint_auth)
     app.register_blueprint(auth.bluprint_users)
+    app.register_blueprint(metrics.bluprint)
 
     if not (test_config and test_config.skip_auth):
-        app.before_request(creat_auth_filter(bypass_prefixes=auth.AUTH_ROUTES))
+        app.before_request(creat_auth_filter(app))
 
     register_error_handlers(app)
-
+    app.config['COMPRESSION_MIN_SIZE'] = _int_from_env("COMPRESSION_MIN_SIZE", compression.DEFAULT_MIN_SIZE)
+    app.config['COMPRESSION_CACHE_BYTES'] = _int_from_env("COMPRESSION_CACHE_BYTES", compression.DEFAULT_CACHE_BYTES)
+    compression.init_compression(app)
+    app.config['NOTES_CACHE_BYTES'] = _int_from_env("NOTES_CACHE_BYTES", response_cache.DEFAULT_MAX_BYTES)
+    app.config['NOTES_CACHE_TTL'] = _int_from_env("NOTES_CACHE_TTL", response_cache.DEFAULT_TTL_SECONDS)
+    app.config['NOTES_CACHE_REDIS_URL'] = environ.get("NOTES_CACHE_REDIS_URL")
+    response_cache.init_notes_response_cache(app)
+    app.config['NOTES_TOMBSTONE_RETENTION_DAYS'] = _int_from_env("NOTES_TOMBSTONE_RETENTION_DAYS",
+                                                                 notes.DEFAULT_TOMBSTONE_RETENTION_DAYS)
+    init_request_metrics(app)
+
+    startup_mode = environ.get("DB_STARTUP_MODE", MIGRATE_ON_STARTUP)
     if test_config and test_config.test_database_url:
-        init_db(app, test_config.test_database_url)
+        database_url = test_config.test_database_url
+        replica_url = test_config.test_replica_database_url
     else:
-        init_db(app, URL.create(drivername="postgresql",
-                                host="localhost",
-                                database="yana",
-                                username=environ.get("DB_USERNAME"),
-                                password=environ.get("DB_PASSWORD")))
+        database_url = _postgres_url(environ.get("DB_HOST", "localhost"), _int_from_env("DB_PORT"))
+        replica_host = environ.get("DB_REPLICA_HOST")
+        replica_url = replica_host and _postgres_url(replica_host, _int_from_env("DB_REPLICA_PORT"))
+    pool_settings = dict(pool_size=_int_from_env("DB_POOL_SIZE"),
+                         max_overflow=_int_from_env("DB_MAX_OVERFLOW"),
+                         pool_timeout=_int_from_env("DB_POOL_TIMEOUT"),
+                         pool_recycle=_int_from_env("DB_POOL_RECYCLE"),
+                         pool_pre_ping=environ.get("DB_POOL_PRE_PING", "true").lower() == "true",
+                         statement_timeout_ms=_int_from_env("DB_STATEMENT_TIMEOUT_MS"))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(database_url, **pool_settings)
+    if replica_url:
+        app.config['SQLALCHEMY_BINDS'] = {REPLICA_BIND: {"url": replica_url,
+                                                         **engine_options(replica_url, **pool_settings)}}
+        app.config['READ_PRIMARY_SECONDS'] = _int_from_env("DB_READ_PRIMARY_SECONDS",
+                                                           DEFAULT_READ_PRIMARY_SECONDS)
+    init_db(app, database_url, startup_mode)
+    app.cli.add_command(setup_db_command)
 
     app.config['JWT_SECRET'] = os.environ.get("JWT_SECRET")
-
-    auth.init_starting_data(app)
+    app.config['PASSWORD_HASH_ALGORITHM'] = os.environ.get("PASSWORD_HASH_ALGORITHM", passwords.DEFAULT_ALGORITHM)
+    app.config['PASSWORD_HASH_WORK_FACTOR'] = _int_from_env("PASSWORD_HASH_WORK_FACTOR")
+    app.config['PASSWORD_HASH_WORKERS'] = _int_from_env("PASSWORD_HASH_WORKERS", passwords.DEFAULT_WORKERS)
+    if test_config:
+        app.config['PASSWORD_HASH_WORK_FACTOR'] = test_config.password_hash_work_factor
+    passwords.init_password_hashing(app)
+    app.config['USER_CACHE_TTL'] = _int_from_env("USER_CACHE_TTL", user_cache.DEFAULT_TTL_SECONDS)
+    app.config['USER_CACHE_SIZE'] = _int_from_env("USER_CACHE_SIZE", user_cache.DEFAULT_MAX_SIZE)
+    app.config['USER_CACHE_REDIS_URL'] = environ.get("USER_CACHE_REDIS_URL")
+    user_cache.init_user_cache(app)
+    app.config['REFRESH_TOKEN_MODE'] = environ.get("REFRESH_TOKEN_MODE", revocations.DATABASE_MODE)
+    app.config['REVOCATIONS_SYNC_SECONDS'] = _int_from_env("REVOCATIONS_SYNC_SECONDS", revocations.DEFAULT_SYNC_SECONDS)
+    app.config['REVOCATIONS_CAPACITY'] = _int_from_env("REVOCATIONS_CAPACITY", revocations.DEFAULT_CAPACITY)
+    revocations.init_token_revocation(app)
+    init_refresh_token_gc(app)
+    app.config['QUERY_WARNINGS'] = environ.get("QUERY_WARNINGS", "false").lower() == "true"
+    app.config['QUERY_WARNING_SLOW_MS'] = _int_from_env("QUERY_WARNING_SLOW_MS", query_budget.DEFAULT_SLOW_MS)
+    query_budget.init_query_warnings(app)
+
+    if startup_mode == MIGRATE_ON_STARTUP:
+        auth.init_starting_data(app)
 
     return app
+
+
+@click.command('setup-db')
+@with_appcontext
+def setup_db_command():
+    """Create and migrate database and add starting data. Run once before starting app with DB_STARTUP_MODE=check."""
+    migrate_db(current_app)
+    auth.init_starting_data(current_app)
+    click.echo("Database is up to date")
+
+
+def _postgres_url(host: str, port: t.Optional[int]) -> URL:
+    return URL.create(drivername="postgresql",
+                      host=host,
+                      port=port,
+                      database=environ.get("DB_NAME", "yana"),
+                      username=environ.get("DB_USERNAME"),
+                      password=environ.get("DB_PASSWORD"))
+
+
+def _int_from_env(name: str, default: int = None) -> t.Optional[int]:
+    value = environ.get(name)
+    return int(value) if value else default
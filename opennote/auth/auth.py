@@ -1,28 +1,31 @@
-import hashlib
 from typing import Union, Literal
 
 from flask import Blueprint, Response, Flask, jsonify, request
 from pydantic import BaseModel
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
 from uuid import uuid4, UUID
 
-from opennote.common.data_time_utils import timestamp_in_seconds, timestamp_to_cookie_expires_format, PAST_TIME_EXPIRE_AT_COOKIE_VALUE
+from opennote.common.data_time_utils import timestamp_in_seconds, timestamp_in_milliseconds, \
+    timestamp_to_cookie_expires_format, PAST_TIME_EXPIRE_AT_COOKIE_VALUE
 from opennote.common.error_handling import ClientError
 from opennote.common.routing_decorators import endpoint
 from opennote.database import db
 from opennote.db_model import User, RefreshToken
+from .auth_filter import public_blueprint
 from .jwt import JWT
+from .passwords import password_hashing
+from .revocations import revoke_family, revoke_user_tokens, stateless_refresh_tokens, token_denylist
+from .user_cache import user_cache
 
 ACCESS_TOKEN_PREFIX = '/access-token'
 LOGIN_AUTH_ROUTE = '/login'
 REFRESH_AUTH_ROUTE = '/refresh'
 LOGOUT_AUTH_ROUTE = '/logout'
-AUTH_ROUTES = [
-    ACCESS_TOKEN_PREFIX + LOGIN_AUTH_ROUTE,
-    ACCESS_TOKEN_PREFIX + REFRESH_AUTH_ROUTE,
-    ACCESS_TOKEN_PREFIX + LOGOUT_AUTH_ROUTE
-]
+LOGOUT_EVERYWHERE_AUTH_ROUTE = '/logout-everywhere'
 
-bluprint_auth = Blueprint('access_token', __name__, url_prefix=ACCESS_TOKEN_PREFIX)
+# refresh and logout read (possibly expired) jwt themselves and check its refresh token
+bluprint_auth = public_blueprint(Blueprint('access_token', __name__, url_prefix=ACCESS_TOKEN_PREFIX))
 bluprint_users = Blueprint('users', __name__, url_prefix='/users')
 
 
@@ -56,8 +59,7 @@ def init_starting_data(app: Flask):
         existing_user = db.session.query(User).filter_by(username=username).first()
         if not existing_user:
             salt = create_salt()
-            hashed_password = hashlib.sha256((password + salt).encode("utf-8")).hexdigest()
-            db.session.add(User(id=id, username=username, password_salt=salt, password=hashed_password))
+            db.session.add(User(id=id, username=username, password_salt=salt, password=hash_password(password, salt)))
             db.session.commit()
 
 
@@ -65,32 +67,51 @@ def init_starting_data(app: Flask):
 @endpoint
 def register(body: RegisterRequest) -> tuple[Response, int]:
     salt = create_salt()
-    if db.session.query(User).filter_by(username=body.username).first():
-        raise AuthClientError(code="VALIDATION_ERROR", status_code=400)
     db.session.add(
         User(id=uuid4(), username=body.username, password_salt=salt, password=hash_password(body.password, salt)))
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        # username is unique, other violations aren't client's fault
+        if db.session.scalar(select(User.id).where(User.username == body.username)):
+            raise AuthClientError(code="VALIDATION_ERROR", status_code=400)
+        raise
     return Response(), 201
 
 
 @bluprint_users.get('/whoami')
 @endpoint
 def whoami(jwt: JWT) -> tuple[UserResponse, int]:
-    user = db.session.query(User).get(jwt.user_id)
+    user = user_cache().by_id(jwt.user_id)
+    if not user:
+        return Response(), 403
     return UserResponse(username=user.username), 200
 
 
 @bluprint_auth.post(LOGIN_AUTH_ROUTE)
 @endpoint
 def create_token(body: AuthRequest) -> tuple[Union[AuthResponse, Response], int]:
-    user = db.session.query(User).filter_by(username=body.username).first()
+    cached_user = user_cache().by_username(body.username)
+    # password hash isn't cached, it's read only here
+    user = db.session.get(User, cached_user.id) if cached_user else None
     if not user:
+        password_hashing().verify_missing_user(body.password)
         return Response(), 403
-    if hash_password(body.password, user.password_salt) != user.password:
+    if not password_hashing().verify(body.password, user.password_salt, user.password):
         return Response(), 403
-
-    token = create_new_token_with_refresh_token_persisted(user.id)
+    rehashed_password = None
+    if password_hashing().needs_rehash(user.password):
+        rehashed_password = password_hashing().hash_async(body.password, user.password_salt)
+
+    if stateless_refresh_tokens():
+        token = JWT.create(issued_at=timestamp_in_seconds(), refresh_token=uuid4(), user_id=user.id,
+                           issued_at_ms=timestamp_in_milliseconds())
+    else:
+        token = create_new_token_with_refresh_token_persisted(user.id)
     response = create_auth_response(token)
+    if rehashed_password:
+        user.password = rehashed_password.result()
     db.session.commit()
     return response, 201
 
@@ -98,12 +119,30 @@ def create_token(body: AuthRequest) -> tuple[Union[AuthResponse, Response], int]
 @bluprint_auth.post(REFRESH_AUTH_ROUTE)
 @endpoint
 def preform_token_refresh(jwt: JWT) -> tuple[Union[AuthResponse, Response], int]:
-    refresh_token = db.session.query(RefreshToken).get(jwt.refresh_token)
-    if refresh_token.expire_at < timestamp_in_seconds() or not refresh_token.active:
+    now = timestamp_in_seconds()
+    if jwt.refresh_token_expire_at < now:
+        return Response(), 403
+    if stateless_refresh_tokens():
+        if token_denylist().is_revoked(jwt.family_id, jwt.user_id, jwt.issued_at_ms):
+            return Response(), 403
+        token = JWT.create(issued_at=now, refresh_token=uuid4(), user_id=jwt.user_id, family_id=jwt.family_id,
+                           issued_at_ms=timestamp_in_milliseconds())
+        return create_auth_response(token), 201
+
+    # deactivating in the same statement as checking, so concurrent refreshes with one token can't both succeed
+    rotated = db.session.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == jwt.refresh_token, RefreshToken.active, RefreshToken.expire_at >= now)
+        .values(active=False)
+        .returning(RefreshToken.family_id)
+    ).first()
+    if rotated is None:
+        # token was already rotated or revoked, whoever holds its successor may have stolen it
+        deactivate_refresh_tokens(RefreshToken.family_id == jwt.family_id)
+        db.session.commit()
         return Response(), 403
-    refresh_token.active = False
 
-    token = create_new_token_with_refresh_token_persisted(user_id=jwt.user_id)
+    token = create_new_token_with_refresh_token_persisted(user_id=jwt.user_id, family_id=rotated.family_id)
     response = create_auth_response(token)
     db.session.commit()
     return response, 201
@@ -111,13 +150,52 @@ def preform_token_refresh(jwt: JWT) -> tuple[Union[AuthResponse, Response], int]
 
 @bluprint_auth.post(LOGOUT_AUTH_ROUTE)
 @endpoint
-def delete_token(jwt: JWT) -> tuple[Union[AuthResponse, Response], int]:
-    refresh_token = db.session.query(RefreshToken).get(jwt.refresh_token)
-    refresh_token.active = False
+def delete_token(jwt: JWT) -> tuple[Response, int]:
+    if not is_refreshable(jwt):
+        return Response(), 403
+    if stateless_refresh_tokens():
+        revoke_family(jwt.family_id)
+    else:
+        deactivate_refresh_tokens(RefreshToken.family_id == jwt.family_id)
+        db.session.commit()
+    return create_logout_response(), 204
+
+
+@bluprint_auth.post(LOGOUT_EVERYWHERE_AUTH_ROUTE)
+@endpoint
+def delete_all_tokens(jwt: JWT) -> tuple[Response, int]:
+    if not is_refreshable(jwt):
+        return Response(), 403
+    if stateless_refresh_tokens():
+        revoke_user_tokens(jwt.user_id)
+    else:
+        deactivate_refresh_tokens(RefreshToken.user_id == jwt.user_id)
+        db.session.commit()
+    return create_logout_response(), 204
+
+
+def is_refreshable(jwt: JWT) -> bool:
+    """
+    Whether refresh token of jwt is still valid. Logout routes are public to accept expired access tokens, so they
+    check it themselves, otherwise any leaked token, however old, could log its user out.
+    """
+    now = timestamp_in_seconds()
+    if jwt.refresh_token_expire_at < now:
+        return False
+    if stateless_refresh_tokens():
+        return not token_denylist().is_revoked(jwt.family_id, jwt.user_id, jwt.issued_at_ms)
+    return db.session.scalar(select(RefreshToken.id).where(
+        RefreshToken.id == jwt.refresh_token, RefreshToken.active, RefreshToken.expire_at >= now)) is not None
 
+
+def deactivate_refresh_tokens(condition):
+    db.session.execute(update(RefreshToken).where(condition, RefreshToken.active).values(active=False))
+
+
+def create_logout_response():
     response = Response()
     response.headers.add('Set-Cookie', f"Authorization=deleted; HttpOnly; SameSite=Strict; Secure; Path=/; Expires={PAST_TIME_EXPIRE_AT_COOKIE_VALUE}")
-    return response, 204
+    return response
 
 
 def create_auth_response(token):
@@ -129,11 +207,13 @@ def create_auth_response(token):
     return response
 
 
-def create_new_token_with_refresh_token_persisted(user_id: UUID) -> JWT:
-    refresh_token = RefreshToken(user_id=user_id, expire_at=timestamp_in_seconds() + JWT.REFRESH_TOKEN_TTL)
+def create_new_token_with_refresh_token_persisted(user_id: UUID, family_id: UUID = None) -> JWT:
+    refresh_token = RefreshToken(user_id=user_id, expire_at=timestamp_in_seconds() + JWT.REFRESH_TOKEN_TTL,
+                                 family_id=family_id)
     db.session.add(refresh_token)
 
-    token = JWT.create(issued_at=timestamp_in_seconds(), refresh_token=refresh_token.id, user_id=user_id)
+    token = JWT.create(issued_at=timestamp_in_seconds(), refresh_token=refresh_token.id, user_id=user_id,
+                       family_id=refresh_token.family_id)
     return token
 
 
@@ -142,4 +222,4 @@ def create_salt():
 
 
 def hash_password(password, salt):
-    return hashlib.sha256((password + salt).encode("utf-8")).hexdigest()
+    return password_hashing().hash(password, salt)
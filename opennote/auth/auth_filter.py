@@ -1,24 +1,71 @@
-from typing import List
+from typing import Optional
 
-from flask import request, Response
+from flask import Blueprint, Flask, g, request, Response
 
 from opennote.auth.jwt import JWT, InvalidJWT
 
+_PUBLIC = "auth_public"
+# endpoint of flask's own static files route
+_STATIC_ENDPOINT = "static"
+
 
 class AuthException(Exception):
     pass
 
 
-def creat_auth_filter(bypass_prefixes: List[str]):
+def public(view):
+    """Marks view function as not requiring jwt. Use under route decorator."""
+    setattr(view, _PUBLIC, True)
+    return view
+
+
+def public_blueprint(blueprint: Blueprint) -> Blueprint:
+    """Marks all views of blueprint (and of blueprints nested in it) as not requiring jwt"""
+    setattr(blueprint, _PUBLIC, True)
+    return blueprint
+
+
+class AuthPolicies:
+    """
+    Whether endpoints require jwt. Views are authenticated unless they, or any of their blueprints, are marked public.
+    Policies of all routes are resolved once when filter is created, routes added later are resolved on their first
+    request. Requests not matching any route require jwt, so their existence isn't revealed.
+    """
+
+    def __init__(self, app: Flask):
+        self._app = app
+        self._requires_auth: dict[Optional[str], bool] = {None: True}
+        for rule in app.url_map.iter_rules():
+            self._requires_auth[rule.endpoint] = self._resolve(rule.endpoint)
+
+    def requires_auth(self, endpoint: Optional[str]) -> bool:
+        try:
+            return self._requires_auth[endpoint]
+        except KeyError:
+            requires_auth = self._requires_auth[endpoint] = self._resolve(endpoint)
+            return requires_auth
+
+    def _resolve(self, endpoint: str) -> bool:
+        if endpoint == _STATIC_ENDPOINT or getattr(self._app.view_functions.get(endpoint), _PUBLIC, False):
+            return False
+        # 'parent.child.view' belongs to blueprints 'parent' and 'parent.child'
+        blueprint_names = endpoint.split('.')[:-1]
+        for i in range(len(blueprint_names)):
+            blueprint = self._app.blueprints.get('.'.join(blueprint_names[:i + 1]))
+            if getattr(blueprint, _PUBLIC, False):
+                return False
+        return True
+
+
+def creat_auth_filter(app: Flask):
+    policies = AuthPolicies(app)
+    app.extensions["auth_policies"] = policies
+
     def auth_filter():
-        for start_with in bypass_prefixes:
-            if request.path.startswith(start_with):
-                return
-        if request.method == "OPTIONS":
+        if request.method == "OPTIONS" or not policies.requires_auth(request.endpoint):
             return
         try:
             jwt = extract_jwt_from_request()
-            jwt.validate()
             if jwt.is_expired:
                 raise AuthException("Expired token")
         except (AuthException, InvalidJWT) as error:
@@ -28,6 +75,10 @@ def creat_auth_filter(bypass_prefixes: List[str]):
 
 
 def extract_jwt_from_request() -> JWT:
+    """Returns verified (but possibly expired) token. It's extracted once per request and kept in flask.g"""
+    if 'jwt' in g:
+        return g.jwt
+
     try:
         auth_cookie = request.cookies.get('Authorization')
         auth_type, token = auth_cookie.split(' ')
@@ -38,6 +89,7 @@ def extract_jwt_from_request() -> JWT:
         raise AuthException("Invalid auth type")
 
     try:
-        return JWT.from_string(token)
+        g.jwt = JWT.verified_from_string(token)
+        return g.jwt
     except InvalidJWT:
         raise AuthException("Invalid token")
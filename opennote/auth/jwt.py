@@ -2,7 +2,10 @@ import hashlib
 import hmac
 import json
 import numbers
+import threading
 from base64 import b64encode, b64decode
+from collections import OrderedDict
+from typing import Optional
 from uuid import UUID, uuid4
 
 from flask import current_app
@@ -24,6 +27,8 @@ class JWT:
     _ISSUED_AT = "exp"
     _TOKE_ID = "iat"
     _USER_ID = "user_id"
+    _FAMILY_ID = "fam"
+    _ISSUED_AT_MS = "ims"
 
     def __init__(self,
                  expire_at: int = None,
@@ -31,20 +36,42 @@ class JWT:
                  refresh_token: UUID = None,
                  user_id: UUID = None,
                  algorith: str = None,
-                 signature: str = None):
+                 signature: str = None,
+                 signing_input: bytes = None,
+                 family_id: UUID = None,
+                 issued_at_ms: int = None):
         self.expire_at = expire_at
         self.refresh_token = refresh_token
         self.user_id = user_id
+        # refresh tokens issued by refreshing one token share family of the token issued on login
+        self.family_id = family_id or refresh_token
+        # precise issue time, compared with user's revocation time, tokens without it count as issued at whole second
+        self._issued_at_ms = issued_at_ms
         self.algorith = algorith
         self._signature = signature
+        self._signing_input = signing_input  # 'header.payload' exactly as received, None for locally created token
 
     @classmethod
-    def create(cls, issued_at: int, user_id: UUID, refresh_token: UUID) -> 'JWT':
+    def verified_from_string(cls, token: str) -> 'JWT':
+        """Same as from_string followed by validate, but recently verified tokens are served from app's cache"""
+        cache = _verified_tokens_cache()
+        jwt = cache.get(token)
+        if jwt is None:
+            jwt = cls.from_string(token)
+            jwt.validate()
+            cache.put(token, jwt)
+        return jwt
+
+    @classmethod
+    def create(cls, issued_at: int, user_id: UUID, refresh_token: UUID, family_id: UUID = None,
+               issued_at_ms: int = None) -> 'JWT':
         return cls(expire_at=issued_at + JWT.TIME_TO_LIVE,
                    refresh_token_expire_at=issued_at + JWT.REFRESH_TOKEN_TTL,
                    refresh_token=refresh_token,
                    user_id=user_id,
-                   algorith=JWT.SUPPORTED_ALGORITHM)
+                   algorith=JWT.SUPPORTED_ALGORITHM,
+                   family_id=family_id,
+                   issued_at_ms=issued_at_ms)
 
     @classmethod
     def from_string(cls, token: str) -> 'JWT':
@@ -57,19 +84,25 @@ class JWT:
                        refresh_token_expire_at=payload_json[JWT._ISSUED_AT],
                        refresh_token=UUID(payload_json[JWT._TOKE_ID]),
                        user_id=UUID(payload_json[JWT._USER_ID]),
-                       signature=signature)
+                       family_id=UUID(payload_json[JWT._FAMILY_ID]) if JWT._FAMILY_ID in payload_json else None,
+                       issued_at_ms=payload_json.get(JWT._ISSUED_AT_MS),
+                       signature=signature,
+                       signing_input=bytes(f"{header}.{payload}", JWT.STRING_ENCODING))
         except:
             raise InvalidJWT("parsing error")
 
     def serialize(self) -> str:
-        return f"{self.header}.{self.payload}.{self.signature}"
+        signing_input = f"{self.header}.{self.payload}"
+        signature = self._signature or _signer().sign(bytes(signing_input, JWT.STRING_ENCODING))
+        return f"{signing_input}.{signature}"
 
     def validate(self):
         if self.algorith != JWT.SUPPORTED_ALGORITHM:
             raise InvalidJWT("unsupported algorith")
         if not isinstance(self.expire_at, numbers.Number):
             raise AttributeError("issued_at is not a number")
-        if not hmac.compare_digest(self.signature, self._generate_signature()):
+        signing_input = self._signing_input or bytes(f"{self.header}.{self.payload}", JWT.STRING_ENCODING)
+        if not _signer().verify(signing_input, self.signature):
             raise InvalidJWT("invalid signature")
 
     @property
@@ -84,16 +117,29 @@ class JWT:
 
     @property
     def payload(self) -> str:
-        return JWT._object_to_json_b64({
+        payload = {
             JWT._ISSUED_AT: self.expire_at,
             JWT._TOKE_ID: str(self.refresh_token or uuid4()),
             JWT._USER_ID: str(self.user_id),
-        })
+        }
+        if self.family_id:
+            payload[JWT._FAMILY_ID] = str(self.family_id)
+        if self._issued_at_ms is not None:
+            payload[JWT._ISSUED_AT_MS] = self._issued_at_ms
+        return JWT._object_to_json_b64(payload)
 
     @property
     def signature(self) -> str:
         return self._signature or self._generate_signature()
 
+    @property
+    def issued_at(self) -> int:
+        return self.expire_at - self.TIME_TO_LIVE
+
+    @property
+    def issued_at_ms(self) -> int:
+        return self._issued_at_ms if self._issued_at_ms is not None else self.issued_at * 1000
+
     @property
     def refresh_token_expire_at(self) -> int:
         return self.expire_at - self.TIME_TO_LIVE + self.REFRESH_TOKEN_TTL
@@ -107,8 +153,70 @@ class JWT:
         return json.loads(b64decode(b64).decode(JWT.STRING_ENCODING))
 
     def _generate_signature(self) -> str:
-        return b64encode(hmac.new(
-            key=bytes(current_app.config.get("JWT_SECRET"), JWT.STRING_ENCODING),
-            msg=bytes(f"{self.header}.{self.payload}", JWT.STRING_ENCODING),
-            digestmod=hashlib.sha256
-        ).digest()).decode(JWT.STRING_ENCODING)
+        return _signer().sign(bytes(f"{self.header}.{self.payload}", JWT.STRING_ENCODING))
+
+
+class JWTSigner:
+    """HMAC-SHA256 signing and verification with key prepared once per app. Each use works on copy of pre-keyed hmac."""
+
+    def __init__(self, secret: str):
+        self.key = bytes(secret, JWT.STRING_ENCODING)
+        self._hmac = hmac.new(key=self.key, digestmod=hashlib.sha256)
+
+    def sign(self, signing_input: bytes) -> str:
+        mac = self._hmac.copy()
+        mac.update(signing_input)
+        return b64encode(mac.digest()).decode(JWT.STRING_ENCODING)
+
+    def verify(self, signing_input: bytes, signature: str) -> bool:
+        return hmac.compare_digest(bytes(self.sign(signing_input), JWT.STRING_ENCODING),
+                                   bytes(signature, JWT.STRING_ENCODING))
+
+
+class VerifiedJWTCache:
+    """Bounded LRU of verified tokens keyed by raw token string. Tokens are kept only until they expire."""
+    DEFAULT_MAX_SIZE = 1024
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE):
+        self.max_size = max_size
+        self._tokens: OrderedDict[str, JWT] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[JWT]:
+        with self._lock:
+            jwt = self._tokens.get(token)
+            if jwt is None:
+                return None
+            if jwt.is_expired:
+                del self._tokens[token]
+                return None
+            self._tokens.move_to_end(token)
+            return jwt
+
+    def put(self, token: str, jwt: JWT):
+        if jwt.is_expired:
+            return
+        with self._lock:
+            self._tokens[token] = jwt
+            self._tokens.move_to_end(token)
+            if len(self._tokens) > self.max_size:
+                self._tokens.popitem(last=False)
+
+    def __len__(self):
+        return len(self._tokens)
+
+
+def _signer() -> JWTSigner:
+    signer = current_app.extensions.get("jwt_signer")
+    if signer is None:
+        signer = JWTSigner(current_app.config.get("JWT_SECRET"))
+        current_app.extensions["jwt_signer"] = signer
+    return signer
+
+
+def _verified_tokens_cache() -> VerifiedJWTCache:
+    cache = current_app.extensions.get("jwt_verified_tokens")
+    if cache is None:
+        cache = VerifiedJWTCache(current_app.config.get("JWT_CACHE_SIZE", VerifiedJWTCache.DEFAULT_MAX_SIZE))
+        current_app.extensions["jwt_verified_tokens"] = cache
+    return cache
@@ -0,0 +1,118 @@
+"""
+Passwords are stored in User.password as '<algorithm>$<work factor>$<hex hash>', salt is kept in User.password_salt.
+Values without '$' are legacy single round of salted SHA-256 and are rehashed on next successful login.
+"""
+import atexit
+import hashlib
+import hmac
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from flask import Flask, current_app
+
+PBKDF2_SHA256 = "pbkdf2_sha256"
+SCRYPT = "scrypt"
+DEFAULT_ALGORITHM = PBKDF2_SHA256
+DEFAULT_WORK_FACTORS = {
+    PBKDF2_SHA256: 600_000,  # iterations
+    SCRYPT: 2 ** 14,  # CPU/memory cost 'n'
+}
+DEFAULT_WORKERS = 4
+SCRYPT_BLOCK_SIZE = 8
+SCRYPT_PARALLELIZATION = 1
+_SEPARATOR = "$"
+_DUMMY_PASSWORD = "dummy password"
+_DUMMY_SALT = "dummysalt"
+# pools are shared by all apps of the process (ex. one per test), by their size
+_executors: dict[int, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def derive(algorithm: str, work_factor: int, password: str, salt: str) -> str:
+    password_bytes = password.encode("utf-8")
+    salt_bytes = salt.encode("utf-8")
+    if algorithm == PBKDF2_SHA256:
+        return hashlib.pbkdf2_hmac("sha256", password_bytes, salt_bytes, work_factor).hex()
+    if algorithm == SCRYPT:
+        return hashlib.scrypt(password_bytes, salt=salt_bytes, n=work_factor, r=SCRYPT_BLOCK_SIZE,
+                              p=SCRYPT_PARALLELIZATION, maxmem=256 * SCRYPT_BLOCK_SIZE * work_factor).hex()
+    raise ValueError(f"Unsupported password hashing algorithm: {algorithm}")
+
+
+def hash_password(algorithm: str, work_factor: int, password: str, salt: str) -> str:
+    return _SEPARATOR.join([algorithm, str(work_factor), derive(algorithm, work_factor, password, salt)])
+
+
+def verify_password(password: str, salt: str, stored: str) -> bool:
+    if _SEPARATOR not in stored:
+        expected = legacy_hash_password(password, salt)
+    else:
+        algorithm, work_factor, _ = stored.split(_SEPARATOR)
+        expected = hash_password(algorithm, int(work_factor), password, salt)
+    return hmac.compare_digest(expected.encode("utf-8"), stored.encode("utf-8"))
+
+
+def legacy_hash_password(password: str, salt: str) -> str:
+    return hashlib.sha256((password + salt).encode("utf-8")).hexdigest()
+
+
+class PasswordHashing:
+    """
+    Runs password hashing on bounded thread pool, shared by the process. Pool only limits how many KDFs run at once
+    (hashlib KDFs release GIL while working), it frees no request threads, as request thread waits for result of its
+    own KDF.
+    """
+
+    def __init__(self, algorithm: str = DEFAULT_ALGORITHM, work_factor: int = None, max_workers: int = DEFAULT_WORKERS):
+        self.algorithm = algorithm
+        self.work_factor = work_factor or DEFAULT_WORK_FACTORS[algorithm]
+        self._executor = _shared_executor(max_workers)
+        self._dummy_hash = None
+
+    def hash(self, password: str, salt: str) -> str:
+        return self.hash_async(password, salt).result()
+
+    def hash_async(self, password: str, salt: str) -> Future:
+        return self._executor.submit(hash_password, self.algorithm, self.work_factor, password, salt)
+
+    def verify(self, password: str, salt: str, stored: str) -> bool:
+        return self._executor.submit(verify_password, password, salt, stored).result()
+
+    def verify_missing_user(self, password: str):
+        """
+        Verifies password against hash in current format, so login of missing user takes as long as of existing one
+        and doesn't reveal which usernames exist
+        """
+        if self._dummy_hash is None:
+            self._dummy_hash = self.hash(_DUMMY_PASSWORD, _DUMMY_SALT)
+        self.verify(password, _DUMMY_SALT, self._dummy_hash)
+
+    def needs_rehash(self, stored: str) -> bool:
+        return not stored.startswith(_SEPARATOR.join([self.algorithm, str(self.work_factor), ""]))
+
+
+def init_password_hashing(app: Flask):
+    app.extensions["password_hashing"] = PasswordHashing(
+        algorithm=app.config.get("PASSWORD_HASH_ALGORITHM", DEFAULT_ALGORITHM),
+        work_factor=app.config.get("PASSWORD_HASH_WORK_FACTOR"),
+        max_workers=app.config.get("PASSWORD_HASH_WORKERS", DEFAULT_WORKERS))
+
+
+def password_hashing() -> PasswordHashing:
+    return current_app.extensions["password_hashing"]
+
+
+def _shared_executor(max_workers: int) -> ThreadPoolExecutor:
+    with _executors_lock:
+        if max_workers not in _executors:
+            _executors[max_workers] = ThreadPoolExecutor(max_workers=max_workers,
+                                                         thread_name_prefix=f"password-hashing-{max_workers}")
+        return _executors[max_workers]
+
+
+@atexit.register
+def _shutdown_executors():
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        _executors.clear()
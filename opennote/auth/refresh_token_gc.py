@@ -0,0 +1,104 @@
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import click
+from flask import Flask, current_app
+from flask.cli import AppGroup
+from sqlalchemy import delete, not_, or_, select
+
+from opennote.common.data_time_utils import timestamp_in_seconds
+from opennote.database import db
+from opennote.db_model import NoteTombstone, RefreshToken, TokenRevocation
+from opennote.notes.notes import DEFAULT_TOMBSTONE_RETENTION_DAYS
+
+DEFAULT_BATCH_SIZE = 1000
+
+refresh_tokens_cli = AppGroup('refresh-tokens', help="Refresh tokens maintenance.")
+
+
+@dataclass
+class PurgeResult:
+    removed: int
+    seconds: float
+    revocations_removed: int = 0
+    tombstones_removed: int = 0
+
+
+def purge_refresh_tokens(batch_size: int = DEFAULT_BATCH_SIZE) -> PurgeResult:
+    """
+    Deletes expired and inactive refresh tokens. Each batch is deleted and committed separately, so locks are kept short.
+    Expired token revocations (of stateless mode) and tombstones of notes deleted more than
+    NOTES_TOMBSTONE_RETENTION_DAYS ago are deleted too. Requires app context.
+    """
+    start = time.perf_counter()
+    now = timestamp_in_seconds()
+    removed = _delete_in_batches(RefreshToken.id, or_(RefreshToken.expire_at < now, not_(RefreshToken.active)),
+                                 batch_size)
+    revocations_removed = db.session.execute(delete(TokenRevocation).where(TokenRevocation.expire_at < now)).rowcount
+    db.session.commit()
+    retention_days = current_app.config.get("NOTES_TOMBSTONE_RETENTION_DAYS", DEFAULT_TOMBSTONE_RETENTION_DAYS)
+    # deleted_at is set by database, in UTC
+    deleted_before = datetime.utcnow() - timedelta(days=retention_days)
+    tombstones_removed = _delete_in_batches(NoteTombstone.id, NoteTombstone.deleted_at < deleted_before, batch_size)
+    return PurgeResult(removed=removed, seconds=time.perf_counter() - start, revocations_removed=revocations_removed,
+                       tombstones_removed=tombstones_removed)
+
+
+def _delete_in_batches(id_column, condition, batch_size: int) -> int:
+    removed = 0
+    while True:
+        ids = db.session.scalars(select(id_column).where(condition).limit(batch_size)).all()
+        if ids:
+            db.session.execute(delete(id_column.class_).where(id_column.in_(ids)))
+            db.session.commit()
+            removed += len(ids)
+        if len(ids) < batch_size:
+            return removed
+
+
+@refresh_tokens_cli.command('purge')
+@click.option('--batch-size', default=DEFAULT_BATCH_SIZE, show_default=True, help="Rows deleted per transaction.")
+@click.option('--every', type=int, default=None,
+              help="Keep running and purge every given seconds. Run it in one process only.")
+def purge_command(batch_size: int, every: int):
+    """Delete expired and inactive refresh tokens, expired revocations and old tombstones of deleted notes."""
+    if every:
+        RefreshTokenPurgeScheduler(current_app._get_current_object(), every, batch_size).run()
+        return
+    result = purge_refresh_tokens(batch_size)
+    click.echo(f"Removed {result.removed} refresh tokens in {result.seconds:.3f}s")
+    if result.revocations_removed:
+        click.echo(f"Removed {result.revocations_removed} expired token revocations")
+    if result.tombstones_removed:
+        click.echo(f"Removed {result.tombstones_removed} tombstones of deleted notes")
+
+
+class RefreshTokenPurgeScheduler:
+    """
+    Runs purge_refresh_tokens every 'interval' seconds until stopped. It's started by purge command only, not by app
+    workers, which would all delete the same batches at the same times.
+    """
+
+    def __init__(self, app: Flask, interval: int, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.app = app
+        self.interval = interval
+        self.batch_size = batch_size
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                with self.app.app_context():
+                    result = purge_refresh_tokens(self.batch_size)
+                self.app.logger.info("Removed %d refresh tokens in %.3fs", result.removed, result.seconds)
+            except Exception:
+                self.app.logger.exception("Refresh tokens purge failed")
+
+    def stop(self):
+        self._stopped.set()
+
+
+def init_refresh_token_gc(app: Flask):
+    app.cli.add_command(refresh_tokens_cli)
@@ -0,0 +1,196 @@
+"""
+Stateless refresh token mode (REFRESH_TOKEN_MODE=stateless). Refresh token is validated by jwt signature and expiry
+alone, so login and refresh don't write to database. Tokens aren't rotated, refreshed token stays valid until it
+expires. Logout revokes the whole family of tokens (all refreshed from one login), logout everywhere revokes all user's
+tokens issued until now (in milliseconds, so login right after it isn't revoked): row is added to token_revocations and
+lands in in-memory denylist of every instance. Denylist is loaded when app is created and then synced incrementally
+(rows with higher seq) at most every REVOCATIONS_SYNC_SECONDS, so other instances see revocation with that delay.
+Revoked family is kept for refresh token ttl from revocation, as tokens refreshed before it (not only the one presented
+on logout) expire by then.
+"""
+import hashlib
+import math
+import threading
+import time
+from typing import Callable, Iterable, Optional
+from uuid import UUID
+
+from flask import Flask, current_app
+from sqlalchemy import select
+
+from opennote.auth.jwt import JWT
+from opennote.common.data_time_utils import timestamp_in_milliseconds, timestamp_in_seconds
+from opennote.database import db
+from opennote.db_model import TokenRevocation
+
+DATABASE_MODE = "database"
+STATELESS_MODE = "stateless"
+DEFAULT_SYNC_SECONDS = 5
+DEFAULT_CAPACITY = 100_000
+# seq values of concurrent transactions can become visible out of order, so recent ones are read again on sync
+SYNC_OVERLAP = 100
+
+
+class BloomFilter:
+    """Set of bytes keys answering 'maybe' or 'no', sized for capacity keys at given false positive rate"""
+
+    def __init__(self, capacity: int, false_positive_rate: float = 0.01):
+        self.capacity = capacity
+        self.size_bits = max(8, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.size_bits + 7) // 8)
+
+    def add(self, key: bytes):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: bytes) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def _positions(self, key: bytes) -> Iterable[int]:
+        # double hashing, k positions from two halves of one digest
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size_bits for i in range(self.hashes))
+
+
+class TokenDenylist:
+    """
+    Revoked token families and users' revocation times, with their expiry. Lookups check bloom filter first, so the
+    common case (neither family nor user revoked) doesn't touch the exact sets.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, sync_seconds: int = DEFAULT_SYNC_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.capacity = capacity
+        self.sync_seconds = sync_seconds
+        self._clock = clock
+        self._revoked: dict[UUID, int] = {}
+        # user id -> (tokens issued before in milliseconds, expire at)
+        self._users_revoked: dict[UUID, tuple[int, int]] = {}
+        self._bloom = BloomFilter(capacity)
+        self._last_seq = 0
+        self._synced_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def is_revoked(self, family_id: UUID, user_id: UUID = None, issued_at_ms: int = None) -> bool:
+        """Requires app context, revocations added by other instances are loaded when sync is due"""
+        if self._synced_at is None or self._clock() - self._synced_at >= self.sync_seconds:
+            self.sync()
+        now = timestamp_in_seconds()
+        if family_id.bytes in self._bloom:
+            expire_at = self._revoked.get(family_id)
+            if expire_at is not None and expire_at >= now:
+                return True
+        if user_id is not None and user_id.bytes in self._bloom:
+            issued_before, expire_at = self._users_revoked.get(user_id, (None, None))
+            return issued_before is not None and expire_at >= now and issued_at_ms < issued_before
+        return False
+
+    def add(self, family_id: UUID, expire_at: int):
+        with self._lock:
+            self._add(family_id, expire_at)
+
+    def add_user(self, user_id: UUID, issued_before: int, expire_at: int):
+        with self._lock:
+            self._add_user(user_id, issued_before, expire_at)
+
+    def sync(self):
+        """
+        Loads revocations added since previous sync and forgets expired ones, unless previous sync was less than
+        sync_seconds ago (concurrent lookups may all find sync due, only the first one syncs). Requires app context.
+        """
+        with self._lock:
+            if self._synced_at is not None and self._clock() - self._synced_at < self.sync_seconds:
+                return
+            now = timestamp_in_seconds()
+            rows = db.session.execute(
+                select(TokenRevocation.seq, TokenRevocation.family_id, TokenRevocation.user_id,
+                       TokenRevocation.issued_before, TokenRevocation.expire_at)
+                .where(TokenRevocation.seq > self._last_seq - SYNC_OVERLAP, TokenRevocation.expire_at >= now)
+                .order_by(TokenRevocation.seq)
+            ).all()
+            for seq, family_id, user_id, issued_before, expire_at in rows:
+                if family_id is not None:
+                    self._add(family_id, expire_at)
+                else:
+                    self._add_user(user_id, issued_before, expire_at)
+                self._last_seq = max(self._last_seq, seq)
+
+            expired = [family_id for family_id, expire_at in self._revoked.items() if expire_at < now]
+            for family_id in expired:
+                del self._revoked[family_id]
+            expired_users = [user_id for user_id, (_, expire_at) in self._users_revoked.items() if expire_at < now]
+            for user_id in expired_users:
+                del self._users_revoked[user_id]
+            if expired or expired_users or self._size() > self.capacity:
+                self._rebuild_bloom()
+            self._synced_at = self._clock()
+
+    def __len__(self):
+        return self._size()
+
+    def _size(self) -> int:
+        return len(self._revoked) + len(self._users_revoked)
+
+    def _add(self, family_id: UUID, expire_at: int):
+        self._revoked[family_id] = max(expire_at, self._revoked.get(family_id, expire_at))
+        self._add_to_bloom(family_id)
+
+    def _add_user(self, user_id: UUID, issued_before: int, expire_at: int):
+        previous_issued_before, previous_expire_at = self._users_revoked.get(user_id, (issued_before, expire_at))
+        self._users_revoked[user_id] = (max(issued_before, previous_issued_before), max(expire_at, previous_expire_at))
+        self._add_to_bloom(user_id)
+
+    def _add_to_bloom(self, id: UUID):
+        if self._size() > self.capacity:
+            self._rebuild_bloom()
+        else:
+            self._bloom.add(id.bytes)
+
+    def _rebuild_bloom(self):
+        while self._size() > self.capacity:
+            self.capacity *= 2
+        bloom = BloomFilter(self.capacity)
+        for id in [*self._revoked, *self._users_revoked]:
+            bloom.add(id.bytes)
+        # swapped at once, lookups without lock see either old or new filter
+        self._bloom = bloom
+
+
+def init_token_revocation(app: Flask):
+    """Requires initialized database, denylist is loaded before app serves any request"""
+    if app.config.get("REFRESH_TOKEN_MODE", DATABASE_MODE) == STATELESS_MODE:
+        denylist = TokenDenylist(capacity=app.config.get("REVOCATIONS_CAPACITY", DEFAULT_CAPACITY),
+                                 sync_seconds=app.config.get("REVOCATIONS_SYNC_SECONDS", DEFAULT_SYNC_SECONDS))
+        with app.app_context():
+            denylist.sync()
+        app.extensions["token_denylist"] = denylist
+
+
+def stateless_refresh_tokens() -> bool:
+    return "token_denylist" in current_app.extensions
+
+
+def token_denylist() -> TokenDenylist:
+    return current_app.extensions["token_denylist"]
+
+
+def revoke_family(family_id: UUID):
+    """Revokes all refresh tokens of family for every instance. Commits session. Requires app context."""
+    # tokens of family refreshed until now expire at the latest one refresh token ttl from now
+    expire_at = timestamp_in_seconds() + JWT.REFRESH_TOKEN_TTL
+    db.session.add(TokenRevocation(family_id=family_id, expire_at=expire_at))
+    db.session.commit()
+    token_denylist().add(family_id, expire_at)
+
+
+def revoke_user_tokens(user_id: UUID):
+    """Revokes all refresh tokens of user issued until now, for every instance. Commits session. Requires app context."""
+    # tokens issued in earlier milliseconds, login in the same second as revocation stays valid
+    issued_before = timestamp_in_milliseconds()
+    expire_at = timestamp_in_seconds() + JWT.REFRESH_TOKEN_TTL
+    db.session.add(TokenRevocation(user_id=user_id, issued_before=issued_before, expire_at=expire_at))
+    db.session.commit()
+    token_denylist().add_user(user_id, issued_before, expire_at)
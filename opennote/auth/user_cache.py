@@ -0,0 +1,194 @@
+"""
+Read-through cache of users (id and username) by id and by username for auth endpoints. Users are kept in process for
+USER_CACHE_TTL seconds, least recently used ones are evicted above USER_CACHE_SIZE. Optional shared backend (ex. Redis client, see
+LocalSharedCache for the interface) lets app instances reuse users loaded by each other. Users written through ORM are
+invalidated after commit, in process and in shared backend; other instances' in process copies live until their TTL.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional
+from uuid import UUID
+
+from flask import Flask, current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import object_session
+
+from opennote.database import RoutingSession, db
+from opennote.db_model import User
+
+DEFAULT_TTL_SECONDS = 300
+DEFAULT_MAX_SIZE = 10_000
+_WRITTEN_USERS = "written_users"
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """
+    Detached copy of User, safe to share between sessions and threads. Password hash and salt aren't kept, so
+    credentials aren't copied into every process and shared backend.
+    """
+    id: UUID
+    username: str
+
+    @classmethod
+    def from_user(cls, user: User) -> 'CachedUser':
+        return cls(id=user.id, username=user.username)
+
+    def to_json(self) -> str:
+        return json.dumps({"id": str(self.id), "username": self.username})
+
+    @classmethod
+    def from_json(cls, value) -> 'CachedUser':
+        fields = json.loads(value)
+        return cls(id=UUID(fields["id"]), username=fields["username"])
+
+
+class LocalSharedCache:
+    """
+    In process stand-in of shared backend, with the subset of Redis client interface used by UserCache and
+    NotesResponseCache: get(key), set(key, value, ex=seconds) and delete(*keys).
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._values: dict[str, tuple[float, str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            expire_at, value = self._values.get(key, (None, None))
+            if expire_at is not None and expire_at <= self._clock():
+                del self._values[key]
+                return None
+            return value
+
+    def set(self, key: str, value: str, ex: int = None):
+        with self._lock:
+            self._values[key] = (self._clock() + ex if ex else None, value)
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._values.pop(key, None)
+
+
+class UserCache:
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, ttl_seconds: int = DEFAULT_TTL_SECONDS, shared=None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self._clock = clock
+        self._users: OrderedDict[str, tuple[float, CachedUser]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def by_id(self, id: UUID) -> Optional[CachedUser]:
+        """Requires app context"""
+        return self._get(_id_key(id), lambda: db.session.get(User, id))
+
+    def by_username(self, username: str) -> Optional[CachedUser]:
+        """Requires app context"""
+        return self._get(_username_key(username), lambda: db.session.query(User).filter_by(username=username).first())
+
+    def invalidate(self, id: UUID, username: str):
+        keys = [_id_key(id), _username_key(username)]
+        with self._lock:
+            for key in keys:
+                self._users.pop(key, None)
+        if self.shared is not None:
+            self.shared.delete(*keys)
+
+    def __len__(self):
+        return len(self._users)
+
+    def _get(self, key: str, load: Callable[[], Optional[User]]) -> Optional[CachedUser]:
+        user = self._get_local(key)
+        if user is not None:
+            return user
+        if self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                user = CachedUser.from_json(value)
+                self._put_local(user)
+                return user
+
+        loaded = load()
+        if loaded is None:
+            return None
+        user = CachedUser.from_user(loaded)
+        self._put_local(user)
+        if self.shared is not None:
+            value = user.to_json()
+            self.shared.set(_id_key(user.id), value, ex=self.ttl_seconds)
+            self.shared.set(_username_key(user.username), value, ex=self.ttl_seconds)
+        return user
+
+    def _get_local(self, key: str) -> Optional[CachedUser]:
+        with self._lock:
+            expire_at, user = self._users.get(key, (None, None))
+            if user is None:
+                return None
+            if expire_at <= self._clock():
+                del self._users[key]
+                return None
+            # both keys of user are used together, so they age together
+            for user_key in (_id_key(user.id), _username_key(user.username)):
+                if user_key in self._users:
+                    self._users.move_to_end(user_key)
+            return user
+
+    def _put_local(self, user: CachedUser):
+        expire_at = self._clock() + self.ttl_seconds
+        with self._lock:
+            for key in (_id_key(user.id), _username_key(user.username)):
+                self._users[key] = (expire_at, user)
+                self._users.move_to_end(key)
+            while len(self._users) > self.max_size:
+                self._users.popitem(last=False)
+
+
+def init_user_cache(app: Flask):
+    shared = app.config.get("USER_CACHE_SHARED_BACKEND")
+    if shared is None and app.config.get("USER_CACHE_REDIS_URL"):
+        import redis  # optional dependency, needed only for shared cache
+        shared = redis.Redis.from_url(app.config["USER_CACHE_REDIS_URL"])
+    app.extensions["user_cache"] = UserCache(max_size=app.config.get("USER_CACHE_SIZE", DEFAULT_MAX_SIZE),
+                                             ttl_seconds=app.config.get("USER_CACHE_TTL", DEFAULT_TTL_SECONDS),
+                                             shared=shared)
+
+
+def user_cache() -> UserCache:
+    return current_app.extensions["user_cache"]
+
+
+@event.listens_for(User, "after_insert")
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _remember_written_user(mapper, connection, user: User):
+    usernames = {user.username, *inspect(user).attrs.username.history.deleted}
+    written = object_session(user).info.setdefault(_WRITTEN_USERS, set())
+    written.update((user.id, username) for username in usernames)
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _invalidate_written_users(session):
+    written = session.info.pop(_WRITTEN_USERS, None)
+    if written and has_app_context() and "user_cache" in current_app.extensions:
+        for id, username in written:
+            user_cache().invalidate(id, username)
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _forget_written_users(session):
+    session.info.pop(_WRITTEN_USERS, None)
+
+
+def _id_key(id: UUID) -> str:
+    return f"user:id:{id}"
+
+
+def _username_key(username: str) -> str:
+    return f"user:username:{username}"
@@ -0,0 +1,175 @@
+"""
+Compression of responses negotiated by Accept-Encoding. gzip is always available, brotli and zstd when 'brotli' and
+'zstandard' packages are installed. Bodies smaller than COMPRESSION_MIN_SIZE bytes are sent as they are, streamed
+responses are compressed chunk by chunk. Compressed bodies of GET responses with ETag are cached
+(up to COMPRESSION_CACHE_BYTES), so unchanged notes list isn't compressed again for every client.
+"""
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from flask import Flask, Response, current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+GZIP = "gzip"
+BROTLI = "br"
+ZSTD = "zstd"
+DEFAULT_MIN_SIZE = 1024
+DEFAULT_CACHE_BYTES = 16 * 1024 * 1024
+COMPRESSIBLE_MIMETYPES = ("application/json", "text/")
+
+
+class _GzipCompressor:
+    def __init__(self):
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush_block(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliCompressor:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=5)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush_block(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdCompressor:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=3).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush_block(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+# in order of preference, when client accepts several of them with the same quality
+COMPRESSORS = {
+    **({ZSTD: _ZstdCompressor} if zstandard else {}),
+    **({BROTLI: _BrotliCompressor} if brotli else {}),
+    GZIP: _GzipCompressor,
+}
+
+
+class CompressedBodiesCache:
+    """LRU of compressed bodies keyed by (ETag, encoding), bounded by total size of bodies"""
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self._bodies: OrderedDict[tuple[str, str], bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, etag: str, encoding: str) -> Optional[bytes]:
+        with self._lock:
+            body = self._bodies.get((etag, encoding))
+            if body is not None:
+                self._bodies.move_to_end((etag, encoding))
+            return body
+
+    def put(self, etag: str, encoding: str, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._bodies.pop((etag, encoding), None)
+            if previous is not None:
+                self.size_bytes -= len(previous)
+            self._bodies[(etag, encoding)] = body
+            self.size_bytes += len(body)
+            while self.size_bytes > self.max_bytes:
+                _, evicted = self._bodies.popitem(last=False)
+                self.size_bytes -= len(evicted)
+
+    def __len__(self):
+        return len(self._bodies)
+
+
+def init_compression(app: Flask):
+    cache_bytes = app.config.get("COMPRESSION_CACHE_BYTES", DEFAULT_CACHE_BYTES)
+    app.extensions["compressed_bodies_cache"] = CompressedBodiesCache(cache_bytes) if cache_bytes else None
+    app.after_request(compress_response)
+
+
+def compress_response(response: Response) -> Response:
+    if not _is_compressible(response):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = request.accept_encodings.best_match(COMPRESSORS)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.iter_encoded(), COMPRESSORS[encoding](),
+                                             getattr(response.response, "close", None))
+        response.headers.pop("Content-Length", None)
+    else:
+        body = _compressed_body(response, encoding)
+        if body is None:
+            return response
+        response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def _is_compressible(response: Response) -> bool:
+    return (200 <= response.status_code < 300 and response.status_code != 204
+            and "Content-Encoding" not in response.headers and not response.direct_passthrough
+            and response.mimetype.startswith(COMPRESSIBLE_MIMETYPES))
+
+
+def _compressed_body(response: Response, encoding: str) -> Optional[bytes]:
+    etag, weak = response.get_etag()
+    cache = current_app.extensions["compressed_bodies_cache"] if etag and not weak and request.method == "GET" else None
+    if cache is not None:
+        cached = cache.get(etag, encoding)
+        if cached is not None:
+            return cached
+
+    data = response.get_data()
+    if len(data) < current_app.config.get("COMPRESSION_MIN_SIZE", DEFAULT_MIN_SIZE):
+        return None
+    compressor = COMPRESSORS[encoding]()
+    body = compressor.compress(data) + compressor.finish()
+    if cache is not None:
+        cache.put(etag, encoding, body)
+    return body
+
+
+def _compress_stream(chunks: Iterable[bytes], compressor, close) -> Iterable[bytes]:
+    """Every chunk is flushed, so client gets it as soon as it's produced"""
+    try:
+        for chunk in chunks:
+            compressed = compressor.compress(chunk) + compressor.flush_block()
+            if compressed:
+                yield compressed
+        yield compressor.finish()
+    finally:
+        if close:
+            close()
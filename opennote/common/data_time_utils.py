@@ -7,6 +7,10 @@ def timestamp_in_seconds() -> int:
     return int(datetime.now().timestamp())
 
 
+def timestamp_in_milliseconds() -> int:
+    return int(datetime.now().timestamp() * 1000)
+
+
 def timestamp_to_cookie_expires_format(unix_timestamp: int) -> str:
     dt = datetime.utcfromtimestamp(unix_timestamp)
     return dt.strftime("%a, %d %b %Y %H:%M:%S GMT")
\ No newline at end of file
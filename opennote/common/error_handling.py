@@ -30,7 +30,7 @@ def handle_client_error(e: ClientError) -> tuple[ErrorResponse, int]:
 
 @endpoint
 def handle_validation_error(error: ValidationError) -> tuple[ErrorResponse, int]:
-    message = '\n'.join(f"{', '.join(e['loc'])}: {e['msg']}" for e in error.errors())
+    message = '\n'.join(f"{', '.join(str(loc) for loc in e['loc'])}: {e['msg']}" for e in error.errors())
     return ErrorResponse(code="VALIDATION_ERROR", message=message), 400
 
 
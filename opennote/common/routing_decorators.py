@@ -1,8 +1,14 @@
+import functools
 from functools import wraps
+from typing import Union, get_args, get_origin
 
-from flask import request, jsonify, Response
+from flask import current_app, request, jsonify, Response
+from pydantic import BaseModel, TypeAdapter
 
 from opennote.auth.auth_filter import extract_jwt_from_request, AuthException
+from opennote.database import route_reads_to_replica
+from opennote.metrics.request_metrics import AUTH_PHASE, HANDLER_PHASE, PARSE_PHASE, SERIALIZE_PHASE, RequestTimings, \
+    request_timings
 
 
 def endpoint(func):
@@ -14,24 +20,101 @@ def endpoint(func):
     - If your function has 'jwt' parameter and request contains jwt, it will be extracted from request and provided to function
     \b
     - If first element of return type tuple is not flask.Response, this part of return type will be transformed to response with json made from this element
+    \b
+    - Return type tuple can have third element with response headers
+    \b
+    - Queries of GET requests are sent to read replica, if it's configured (see database.route_reads_to_replica)
+    \b
+    - Time of parsing body, extracting jwt, handling and serializing result is recorded (see metrics.request_metrics)
+    \b
+    - Annotations are read once, when function is decorated (see BindingPlan)
     """
 
+    plan = BindingPlan(func)
+
     @wraps(func)
     def decorated_function(*args: any, **kwargs: any) -> tuple[Response, int]:
-        fun_kwargs = kwargs
+        timings = request_timings()
+        try:
+            plan.bind(kwargs, timings)
+        except AuthException:
+            return Response(), 403
+        with timings.phase(HANDLER_PHASE):
+            result = func(*args, **kwargs)
+        with timings.phase(SERIALIZE_PHASE):
+            return plan.to_response(*result)
+
+    return decorated_function
+
+
+class BindingPlan:
+    """
+    What endpoint does with each request, worked out from function annotations once, when function is decorated.
+    Body is validated straight from request bytes. Results are serialized by pydantic TypeAdapters of types declared
+    in return annotation (ex. list[NoteDTO]), other results go through jsonify.
+    """
+
+    def __init__(self, func):
+        annotations = func.__annotations__
+        self.body_model = annotations.get("body")
+        self.needs_jwt = "jwt" in annotations
+        self.serializers: dict[type, TypeAdapter] = {
+            get_origin(result_type) or result_type: _type_adapter(result_type)
+            for result_type in _result_types(annotations.get("return"))
+        }
 
-        if "body" in func.__annotations__:
-            fun_kwargs = fun_kwargs | {'body': func.__annotations__["body"](**request.get_json())}
+    def bind(self, kwargs: dict, timings: RequestTimings):
+        """Adds 'body' and 'jwt' to kwargs of the call"""
+        if request.method == 'GET':
+            route_reads_to_replica()
 
-        if "jwt" in func.__annotations__:
-            try:
-                fun_kwargs = fun_kwargs | {'jwt': extract_jwt_from_request()}
-            except AuthException:
-                return Response(), 403
+        if self.body_model is not None:
+            with timings.phase(PARSE_PHASE):
+                if not request.is_json:
+                    request.on_json_loading_failed(None)
+                kwargs['body'] = self.body_model.model_validate_json(request.get_data())
 
-        result, status = func(*args, **fun_kwargs)
+        if self.needs_jwt:
+            with timings.phase(AUTH_PHASE):
+                kwargs['jwt'] = extract_jwt_from_request()
+
+    def to_response(self, result, status: int, *headers) -> tuple:
         if isinstance(result, Response):
-            return result, status
-        return jsonify(result), status
+            return result, status, *headers
+        serializer = self.serializers.get(type(result))
+        if serializer is None:
+            return jsonify(result), status, *headers
+        return current_app.response_class(_dump_json(serializer, result), mimetype="application/json"), \
+            status, *headers
 
-    return decorated_function
+
+def json_body(result, result_type) -> bytes:
+    """Result serialized the same way as endpoint serializes it, ex. to cache response body"""
+    return _dump_json(_type_adapter(result_type), result)
+
+
+def _dump_json(serializer: TypeAdapter, result) -> bytes:
+    # trailing new line, as in jsonify
+    return serializer.dump_json(result) + b"\n"
+
+
+@functools.lru_cache(maxsize=None)
+def _type_adapter(result_type) -> TypeAdapter:
+    """Adapters are shared by endpoints returning the same type"""
+    return TypeAdapter(result_type)
+
+
+def _result_types(return_annotation) -> list:
+    """Serializable types of the first element of returned tuple, ex. [list[NoteDTO], NotesPageDTO]"""
+    if get_origin(return_annotation) is not tuple:
+        return []
+    result_type = get_args(return_annotation)[0]
+    candidates = get_args(result_type) if get_origin(result_type) is Union else (result_type,)
+    return [candidate for candidate in candidates if _is_serializable(candidate)]
+
+
+def _is_serializable(result_type) -> bool:
+    if get_origin(result_type) is list:
+        item_type, = get_args(result_type)
+        return isinstance(item_type, type) and issubclass(item_type, BaseModel)
+    return isinstance(result_type, type) and issubclass(result_type, BaseModel)
@@ -1,25 +1,172 @@
+import functools
+
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from flask import Flask, Response, current_app, g, has_app_context, has_request_context, request
 from flask_migrate import Migrate, upgrade
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Select, event, make_url
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy_utils import database_exists, create_database
 
+from opennote.metrics.pool_metrics import MeteredQueuePool
+
 
 class Base(DeclarativeBase):
     pass
 
 
-db = SQLAlchemy(model_class=Base)
+MIGRATE_ON_STARTUP = "migrate"
+CHECK_ON_STARTUP = "check"
+
+REPLICA_BIND = "replica"
+# set after client's write, so its following reads see that write instead of possibly lagging replica
+READ_PRIMARY_COOKIE = "ReadPrimary"
+DEFAULT_READ_PRIMARY_SECONDS = 10
+
+# created by hand written migrations and not mapped in model, so autogenerate should not drop them
+_NOT_MAPPED_SCHEMA_OBJECTS = ('notes_fts', 'search_vector', 'ix_notes_search_vector')
+
+
+class SchemaOutOfDateError(Exception):
+    pass
+
+
+class RoutingSession(Session):
+    """Session sending SELECTs to replica bind when current request was routed there (see route_reads_to_replica)"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and isinstance(clause, Select) and reads_from_replica():
+            return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _mark_written_on_flush(session, flush_context):
+    _mark_written()
 
 
-def init_db(app, url):
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _mark_written_on_execute(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _mark_written()
+
+
+db = SQLAlchemy(model_class=Base, session_options={"class_": RoutingSession})
+
+
+def init_db(app: Flask, url, startup_mode: str = MIGRATE_ON_STARTUP):
+    """
+    With MIGRATE_ON_STARTUP database is created if needed and migrated to newest revision.
+    With CHECK_ON_STARTUP database is not touched on startup. Before first request its revision is compared with
+    newest one, so migrations have to be applied earlier (see 'flask setup-db').
+    Reads are routed to replica when SQLALCHEMY_BINDS contains REPLICA_BIND, see route_reads_to_replica.
+    """
     app.config["SQLALCHEMY_DATABASE_URI"] = url
-    if not database_exists(url):
-        create_database(url)
     db.init_app(app)
+    if REPLICA_BIND in app.config["SQLALCHEMY_BINDS"]:
+        app.after_request(_set_read_primary_cookie)
 
-    migrate = Migrate(app, db)
+    migrate = Migrate(app, db, include_object=_include_in_migrations)
     migrate.init_app(app, db)
+
+    if startup_mode == CHECK_ON_STARTUP:
+        app.before_request(_create_schema_revision_check())
+    else:
+        migrate_db(app)
+
+    return db
+
+
+def engine_options(url, pool_size: int = None, max_overflow: int = None, pool_timeout: int = None,
+                   pool_recycle: int = None, pool_pre_ping: bool = True, statement_timeout_ms: int = None) -> dict:
+    """Options for SQLALCHEMY_ENGINE_OPTIONS, not given ones are left with SQLAlchemy defaults"""
+    url = make_url(url)
+    if _is_in_memory_sqlite(url):
+        return {}
+    options = {"poolclass": MeteredQueuePool, "pool_pre_ping": pool_pre_ping}
+    pool_options = {"pool_size": pool_size, "max_overflow": max_overflow, "pool_timeout": pool_timeout,
+                    "pool_recycle": pool_recycle}
+    options |= {name: value for name, value in pool_options.items() if value is not None}
+    if statement_timeout_ms and url.get_backend_name() == 'postgresql':
+        options["connect_args"] = {"options": f"-c statement_timeout={statement_timeout_ms}"}
+    return options
+
+
+def migrate_db(app: Flask):
+    url = make_url(app.config["SQLALCHEMY_DATABASE_URI"])
+    if not _is_in_memory_sqlite(url) and not database_exists(url):
+        create_database(url)
+
     with app.app_context():
         upgrade()
 
-    return db
+
+def route_reads_to_replica():
+    """
+    Sends SELECTs of current request to replica, if it's configured and client didn't write recently.
+    Requires request context.
+    """
+    if REPLICA_BIND in db.engines and READ_PRIMARY_COOKIE not in request.cookies:
+        g.read_from_replica = True
+
+
+def reads_from_replica() -> bool:
+    """Whether SELECTs of current request go to replica, which may not have seen recent writes yet"""
+    return has_app_context() and g.get("read_from_replica", False)
+
+
+def verify_schema_revision(app: Flask):
+    with app.app_context(), db.engine.connect() as connection:
+        current = set(MigrationContext.configure(connection).get_current_heads())
+    expected = _head_revisions(app.extensions['migrate'].directory)
+    if current != expected:
+        raise SchemaOutOfDateError(f"Database revision {current or 'empty'} doesn't match migrations head {expected}, "
+                                   f"run 'flask setup-db'")
+
+
+def _mark_written():
+    if has_request_context():
+        g.wrote_to_primary = True
+
+
+def _set_read_primary_cookie(response: Response) -> Response:
+    if g.get("wrote_to_primary", False):
+        max_age = current_app.config.get("READ_PRIMARY_SECONDS", DEFAULT_READ_PRIMARY_SECONDS)
+        response.headers.add('Set-Cookie',
+                             f"{READ_PRIMARY_COOKIE}=1; HttpOnly; SameSite=Strict; Secure; Path=/; Max-Age={max_age}")
+    return response
+
+
+def _is_in_memory_sqlite(url) -> bool:
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+@functools.lru_cache
+def _head_revisions(migrations_directory: str) -> frozenset:
+    config = Config()
+    config.set_main_option('script_location', migrations_directory)
+    return frozenset(ScriptDirectory.from_config(config).get_heads())
+
+
+def _create_schema_revision_check():
+    verified = False
+
+    def schema_revision_check():
+        nonlocal verified
+        if verified:
+            return
+        try:
+            verify_schema_revision(current_app)
+            verified = True
+        except SchemaOutOfDateError:
+            current_app.logger.exception("Database schema is not up to date")
+            return Response(), 503
+
+    return schema_revision_check
+
+
+def _include_in_migrations(object, name, type_, reflected, compare_to):
+    return not (reflected and compare_to is None and (name or "").startswith(_NOT_MAPPED_SCHEMA_OBJECTS))
@@ -1,31 +1,68 @@
 import uuid
 from datetime import datetime
+from typing import Optional
 from uuid import UUID
 
-from sqlalchemy import String
+from sqlalchemy import BigInteger, DateTime, Index, String, UniqueConstraint, text
 from sqlalchemy import func
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.orm import Mapped, mapped_column
 
 from opennote.database import db
 
+# SQLite CURRENT_TIMESTAMP has no fractional seconds, so bound values have to use the same format to compare correctly
+Timestamp = DateTime().with_variant(sqlite.DATETIME(truncate_microseconds=True), "sqlite")
+
 
 class Base(db.Model):
     __abstract__ = True
     id: Mapped[UUID] = mapped_column(primary_key=True, nullable=False)
-    crated_at: Mapped[datetime] = mapped_column(server_default=func.CURRENT_TIMESTAMP())
-    updated_at: Mapped[datetime] = mapped_column(nullable=True, server_default=func.CURRENT_TIMESTAMP(),
+    crated_at: Mapped[datetime] = mapped_column(Timestamp, server_default=func.CURRENT_TIMESTAMP())
+    updated_at: Mapped[datetime] = mapped_column(Timestamp, nullable=True, server_default=func.CURRENT_TIMESTAMP(),
                                                  onupdate=func.CURRENT_TIMESTAMP())
 
 
 class Note(Base):
     __tablename__ = 'notes'
-    name: Mapped[str] = mapped_column(String(50), unique=True, nullable=False)
+    __table_args__ = (
+        # listing of user's notes, 'id' breaks ties of keyset pagination
+        Index('ix_notes_user_id_updated_at', 'user_id', 'updated_at', 'id'),
+        Index('ix_notes_user_id_change_version', 'user_id', 'change_version'),
+        UniqueConstraint('user_id', 'name', name='uq_notes_user_id_name'),
+    )
+    user_id: Mapped[UUID] = mapped_column(nullable=False)
+    name: Mapped[str] = mapped_column(String(50), nullable=False)
     content: Mapped[str] = mapped_column(unique=False, nullable=False)
+    version: Mapped[int] = mapped_column(nullable=False, server_default='1')
+    # User.notes_version of transaction which created or last updated the note
+    change_version: Mapped[int] = mapped_column(nullable=False, server_default='0')
+    __mapper_args__ = {"version_id_col": version}
 
-    def __init__(self, id, name, content):
+    def __init__(self, id, name, content, user_id: UUID, change_version: int = 0):
         self.id = id or uuid.uuid1()
         self.name = name
         self.content = content
+        self.user_id = user_id
+        self.change_version = change_version
+
+
+class NoteTombstone(db.Model):
+    """Marks deleted note, so clients syncing changes can find out about deletion"""
+    __tablename__ = 'note_tombstones'
+    __table_args__ = (
+        Index('ix_note_tombstones_user_id_change_version', 'user_id', 'change_version'),
+        Index('ix_note_tombstones_deleted_at', 'deleted_at'),
+    )
+    id: Mapped[UUID] = mapped_column(primary_key=True, nullable=False)
+    user_id: Mapped[UUID] = mapped_column(nullable=False)
+    deleted_at: Mapped[datetime] = mapped_column(Timestamp, nullable=False, server_default=func.CURRENT_TIMESTAMP())
+    # User.notes_version of transaction which deleted the note
+    change_version: Mapped[int] = mapped_column(nullable=False, server_default='0')
+
+    def __init__(self, id: UUID, user_id: UUID, change_version: int = 0):
+        self.id = id
+        self.user_id = user_id
+        self.change_version = change_version
 
 
 class User(Base):
@@ -33,17 +70,44 @@ class User(Base):
     username: Mapped[str] = mapped_column(String(50), unique=True, nullable=False)
     password: Mapped[str] = mapped_column(unique=False, nullable=False)
     password_salt: Mapped[str] = mapped_column(unique=True, nullable=False)
+    # increased by every write of user's notes (see notes.notes)
+    notes_version: Mapped[int] = mapped_column(nullable=False, server_default='0')
 
 
 class RefreshToken(Base):
     __tablename__ = 'refresh_tokens'
-    user_id: Mapped[UUID] = mapped_column(nullable=False)
-    expire_at: Mapped[int] = mapped_column(nullable=False) # Unix timestamp
+    __table_args__ = (
+        Index('ix_refresh_tokens_inactive', 'id', postgresql_where=text('NOT active'), sqlite_where=text('NOT active')),
+    )
+    user_id: Mapped[UUID] = mapped_column(nullable=False, index=True)
+    # tokens rotated from one login token, first of them gives family its id
+    family_id: Mapped[UUID] = mapped_column(nullable=False, index=True)
+    expire_at: Mapped[int] = mapped_column(nullable=False, index=True) # Unix timestamp
     active: Mapped[bool] = mapped_column(nullable=False, default=True)
 
-    def __init__(self, user_id: UUID, expire_at: int, active: bool = True):
+    def __init__(self, user_id: UUID, expire_at: int, active: bool = True, family_id: UUID = None):
         self.id = uuid.uuid4()
         self.user_id = user_id
+        self.family_id = family_id or self.id
         self.expire_at = expire_at
         self.active = active
 
+
+class TokenRevocation(db.Model):
+    """
+    Revoked family of refresh tokens, or all user's tokens issued before given time.
+    Used in stateless refresh token mode (see auth.revocations).
+    """
+    __tablename__ = 'token_revocations'
+    # increasing, so instances load only revocations added since their previous sync
+    seq: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    family_id: Mapped[Optional[UUID]] = mapped_column(nullable=True)
+    user_id: Mapped[Optional[UUID]] = mapped_column(nullable=True)
+    issued_before: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)  # Unix timestamp in milliseconds
+    expire_at: Mapped[int] = mapped_column(nullable=False, index=True)  # Unix timestamp, when tokens expire anyway
+
+    def __init__(self, expire_at: int, family_id: UUID = None, user_id: UUID = None, issued_before: int = None):
+        self.family_id = family_id
+        self.user_id = user_id
+        self.issued_before = issued_before
+        self.expire_at = expire_at
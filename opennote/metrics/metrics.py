@@ -0,0 +1,68 @@
+from typing import Optional
+
+from flask import Blueprint, Response
+from pydantic import BaseModel
+
+from opennote.auth.auth_filter import public_blueprint
+from opennote.common.routing_decorators import endpoint
+from opennote.database import db
+from opennote.notes.response_cache import notes_response_cache
+from .pool_metrics import pool_snapshot
+from .request_metrics import request_metrics
+
+METRICS_PREFIX = '/metrics'
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# pool_snapshot key -> (metric type, metric name, help)
+_POOL_METRICS = {
+    "pool_size": ("gauge", "yana_db_pool_size", "Connections kept in pool"),
+    "checked_out": ("gauge", "yana_db_pool_checked_out", "Connections currently checked out"),
+    "overflow": ("gauge", "yana_db_pool_overflow", "Connections open above pool size"),
+    "checkouts": ("counter", "yana_db_pool_checkouts_total", "Successful connection checkouts"),
+    "timeouts": ("counter", "yana_db_pool_timeouts_total", "Checkouts which timed out waiting for connection"),
+    "connections_created": ("counter", "yana_db_pool_connections_created_total", "Opened database connections"),
+    "wait_seconds_total": ("counter", "yana_db_pool_wait_seconds_total", "Time spent waiting for connections"),
+    "wait_seconds_max": ("gauge", "yana_db_pool_wait_seconds_max", "Longest wait for connection"),
+}
+# NotesResponseCache.snapshot key -> (metric type, metric name, help)
+_NOTES_CACHE_METRICS = {
+    "hits": ("counter", "yana_notes_cache_hits_total", "Notes list responses served from cache"),
+    "misses": ("counter", "yana_notes_cache_misses_total", "Notes list responses not found in cache"),
+    "evictions": ("counter", "yana_notes_cache_evictions_total", "Responses evicted from cache to fit its size"),
+    "size_bytes": ("gauge", "yana_notes_cache_size_bytes", "Size of responses kept in cache"),
+}
+
+bluprint = public_blueprint(Blueprint('metrics', __name__, url_prefix=METRICS_PREFIX))
+
+
+class DbPoolMetricsDTO(BaseModel):
+    """Fields are null when engine pool isn't metered (ex. in memory SQLite)"""
+    pool_size: Optional[int] = None
+    checked_out: Optional[int] = None
+    overflow: Optional[int] = None
+    checkouts: Optional[int] = None
+    timeouts: Optional[int] = None
+    connections_created: Optional[int] = None
+    wait_seconds_total: Optional[float] = None
+    wait_seconds_max: Optional[float] = None
+
+
+@bluprint.get('')
+@endpoint
+def get_metrics() -> tuple[Response, int]:
+    """Prometheus text format"""
+    lines = request_metrics().exposition()
+    for key, value in pool_snapshot(db.engine.pool).items():
+        metric_type, name, documentation = _POOL_METRICS[key]
+        lines += [f"# HELP {name} {documentation}", f"# TYPE {name} {metric_type}", f"{name} {value}"]
+    cache = notes_response_cache()
+    for key, value in (cache.snapshot() if cache is not None else {}).items():
+        metric_type, name, documentation = _NOTES_CACHE_METRICS[key]
+        lines += [f"# HELP {name} {documentation}", f"# TYPE {name} {metric_type}", f"{name} {value}"]
+    return Response("\n".join(lines) + "\n", content_type=PROMETHEUS_CONTENT_TYPE), 200
+
+
+@bluprint.get('/db-pool')
+@endpoint
+def get_db_pool_metrics() -> tuple[DbPoolMetricsDTO, int]:
+    return DbPoolMetricsDTO(**pool_snapshot(db.engine.pool)), 200
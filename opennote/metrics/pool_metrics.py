@@ -0,0 +1,81 @@
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class PoolMetrics:
+    """Counters of connection pool usage. Wait time covers whole checkout, including opening new connection."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connections_created = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self._lock = threading.Lock()
+
+    def record_wait(self, wait_seconds: float, timed_out: bool):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            self.wait_seconds_total += wait_seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+
+    def on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connections_created += 1
+
+
+class MeteredQueuePool(QueuePool):
+    """
+    QueuePool recording PoolMetrics, which are kept when pool is recreated (ex. on engine dispose). Checkouts and new
+    connections are counted by pool events, wait time and timeouts by timing connect().
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+        event.listen(self, "connect", self.metrics.on_connect)
+        event.listen(self, "checkout", self.metrics.on_checkout)
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except TimeoutError:
+            self.metrics.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.record_wait(time.perf_counter() - start, timed_out=False)
+        return connection
+
+    def recreate(self) -> 'MeteredQueuePool':
+        # new pool gets listeners of this one, which record into metrics it takes over
+        pool = super().recreate()
+        event.remove(pool, "connect", pool.metrics.on_connect)
+        event.remove(pool, "checkout", pool.metrics.on_checkout)
+        pool.metrics = self.metrics
+        return pool
+
+
+def pool_snapshot(pool) -> dict:
+    """Current state and counters of pool, empty when pool isn't metered (ex. in memory SQLite)"""
+    if not isinstance(pool, MeteredQueuePool):
+        return {}
+    metrics = pool.metrics
+    return {
+        "pool_size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "checkouts": metrics.checkouts,
+        "timeouts": metrics.timeouts,
+        "connections_created": metrics.connections_created,
+        "wait_seconds_total": metrics.wait_seconds_total,
+        "wait_seconds_max": metrics.wait_seconds_max,
+    }
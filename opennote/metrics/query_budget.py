@@ -0,0 +1,112 @@
+"""
+Detection of query count regressions. query_budget() fails block of code (ex. test) executing more statements than
+declared or repeating identical statement (typical N+1). With QUERY_WARNINGS app config, the same is logged for every
+request, together with statements slower than QUERY_WARNING_SLOW_MS.
+"""
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import Flask, Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEFAULT_SLOW_MS = 100
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryLog:
+    def __init__(self):
+        self.statements: list[tuple[str, float]] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def seconds(self) -> float:
+        return sum(seconds for _, seconds in self.statements)
+
+    def repeated(self) -> dict[str, int]:
+        """Statements executed more than once (with any parameters) and how many times"""
+        counts = Counter(statement for statement, _ in self.statements)
+        return {statement: count for statement, count in counts.items() if count > 1}
+
+    def slower_than(self, seconds: float) -> list[tuple[str, float]]:
+        return [(statement, duration) for statement, duration in self.statements if duration > seconds]
+
+
+_active_logs: list[QueryLog] = []
+_active_logs_lock = threading.Lock()
+
+
+@contextmanager
+def record_queries():
+    """Records statements executed by any engine (in any thread) while in block"""
+    log = QueryLog()
+    with _active_logs_lock:
+        _active_logs.append(log)
+    try:
+        yield log
+    finally:
+        with _active_logs_lock:
+            _active_logs.remove(log)
+
+
+@contextmanager
+def query_budget(max_statements: int, allow_repeated: bool = False):
+    """Raises QueryBudgetExceeded when block executed more than max_statements or repeated identical statement"""
+    with record_queries() as log:
+        yield log
+    problems = []
+    if log.count > max_statements:
+        problems.append(f"{log.count} statements executed, budget is {max_statements}")
+    if not allow_repeated and log.repeated():
+        problems.append("repeated statements")
+    if problems:
+        statements = "\n".join(statement for statement, _ in log.statements)
+        raise QueryBudgetExceeded(f"{', '.join(problems)}:\n{statements}")
+
+
+def init_query_warnings(app: Flask):
+    if app.config.get("QUERY_WARNINGS"):
+        app.before_request(_start_request_query_log)
+        app.after_request(_warn_about_request_queries)
+
+
+def _start_request_query_log():
+    g.query_log = QueryLog()
+
+
+def _warn_about_request_queries(response: Response) -> Response:
+    log = g.get("query_log")
+    if log is None:
+        return response
+    for statement, count in log.repeated().items():
+        current_app.logger.warning("%s %s executed %d times the same statement: %s",
+                                   request.method, request.path, count, statement)
+    slow_ms = current_app.config.get("QUERY_WARNING_SLOW_MS", DEFAULT_SLOW_MS)
+    for statement, seconds in log.slower_than(slow_ms / 1000):
+        current_app.logger.warning("%s %s executed slow statement (%.1fms): %s",
+                                   request.method, request.path, seconds * 1000, statement)
+    return response
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_log_start"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    logs = list(_active_logs)
+    if has_request_context() and "query_log" in g:
+        logs.append(g.query_log)
+    if logs:
+        entry = (statement, time.perf_counter() - conn.info["query_log_start"])
+        for log in logs:
+            log.statements.append(entry)
@@ -0,0 +1,139 @@
+"""
+Timings of endpoint phases and database statements of each request, exposed as Prometheus histograms (see GET /metrics)
+and as Server-Timing response header.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Flask, Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PARSE_PHASE = "parse"
+AUTH_PHASE = "auth"
+HANDLER_PHASE = "handler"
+SERIALIZE_PHASE = "serialize"
+
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENTS_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """Prometheus histogram with labels, thread safe"""
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...], buckets: tuple[float, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        self._counts: dict[tuple[str, ...], list[int]] = {}
+        self._sums: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            counts = self._counts.get(labels)
+            if counts is None:
+                counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+                self._sums[labels] = 0.0
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sums[labels] += value
+
+    def exposition(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(labels, list(counts), self._sums[labels]) for labels, counts in self._counts.items()]
+        for labels, counts, total in series:
+            label_pairs = list(zip(self.label_names, labels))
+            cumulative = 0
+            for bound, count in zip([*self.buckets, "+Inf"], counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(label_pairs + [('le', str(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(label_pairs)} {total}")
+            lines.append(f"{self.name}_count{_labels(label_pairs)} {cumulative}")
+        return lines
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.phase_seconds = Histogram("yana_endpoint_phase_seconds", "Time spent in endpoint phase",
+                                       ("endpoint", "phase"), SECONDS_BUCKETS)
+        self.db_statements = Histogram("yana_endpoint_db_statements", "SQL statements executed by request",
+                                       ("endpoint",), STATEMENTS_BUCKETS)
+        self.db_seconds = Histogram("yana_endpoint_db_seconds", "Time spent executing SQL statements by request",
+                                    ("endpoint",), SECONDS_BUCKETS)
+
+    def exposition(self) -> list[str]:
+        return self.phase_seconds.exposition() + self.db_statements.exposition() + self.db_seconds.exposition()
+
+
+class RequestTimings:
+    """Timings of a single request, collected in flask.g"""
+
+    def __init__(self):
+        self.phases: dict[str, float] = {}
+        self.db_statements = 0
+        self.db_seconds = 0.0
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def server_timing(self) -> str:
+        entries = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.phases.items()]
+        entries.append(f'db;dur={self.db_seconds * 1000:.3f};desc="{self.db_statements} statements"')
+        return ", ".join(entries)
+
+
+def request_timings() -> RequestTimings:
+    """Timings of current request, created on first use. Requires request context."""
+    timings = g.get("request_timings")
+    if timings is None:
+        timings = g.request_timings = RequestTimings()
+    return timings
+
+
+def request_metrics() -> RequestMetrics:
+    return current_app.extensions["request_metrics"]
+
+
+def init_request_metrics(app: Flask):
+    app.extensions["request_metrics"] = RequestMetrics()
+    app.after_request(_record_request_timings)
+
+
+def _record_request_timings(response: Response) -> Response:
+    timings = g.get("request_timings")
+    if timings is None or request.endpoint is None:
+        return response
+    metrics = request_metrics()
+    for phase, seconds in timings.phases.items():
+        metrics.phase_seconds.observe(seconds, request.endpoint, phase)
+    metrics.db_statements.observe(timings.db_statements, request.endpoint)
+    metrics.db_seconds.observe(timings.db_seconds, request.endpoint)
+    response.headers["Server-Timing"] = timings.server_timing()
+    return response
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["statement_start"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and "request_timings" in g:
+        timings = g.request_timings
+        timings.db_statements += 1
+        timings.db_seconds += time.perf_counter() - conn.info["statement_start"]
+
+
+def _labels(pairs: list[tuple[str, str]]) -> str:
+    escaped = [(name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for name, value in pairs]
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
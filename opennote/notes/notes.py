@@ -1,29 +1,50 @@
+import hashlib
 import uuid
-from typing import Optional, Literal
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from typing import Annotated, Optional, Literal, Union
+from urllib.parse import urlencode
 
-from flask import Blueprint, request, Response
+from flask import Blueprint, current_app, request, Response, stream_with_context
 from pydantic import BaseModel, Field
-from sqlalchemy import desc
+from sqlalchemy import bindparam, delete, desc, func, insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+from werkzeug.http import quote_etag, unquote_etag
 
+from opennote.auth.jwt import JWT
+from opennote.common.data_time_utils import timestamp_in_seconds
 from opennote.common.error_handling import ClientError
-from opennote.common.routing_decorators import endpoint
-from opennote.database import db
-from opennote.db_model import Note
+from opennote.common.routing_decorators import endpoint, json_body
+from opennote.database import READ_PRIMARY_COOKIE, db, reads_from_replica
+from opennote.db_model import Note, NoteTombstone, User
+from .response_cache import CachedResponse, notes_response_cache
+from .search import search_notes_query
 
 bluprint = Blueprint('notes', __name__, url_prefix='/notes')
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+STREAM_BATCH_SIZE = 500
+MAX_BATCH_OPERATIONS = 1000
+# tombstones of deleted notes are purged after it (see auth.refresh_token_gc), older sync tokens can't be used
+DEFAULT_TOMBSTONE_RETENTION_DAYS = 30
+
 
 class NotesClintError(ClientError[Literal[
     'NOTE_NOT_FOUND',
     'NOTE_ALREADY_EXISTS',
-    'VALIDATION_ERROR'
+    'VALIDATION_ERROR',
+    'PRECONDITION_FAILED',
+    'USER_NOT_FOUND',
+    'RESYNC_REQUIRED'
 ]]):
     pass
 
 
 class CreateNoteDTO(BaseModel):
     name: str = Field(..., max_length=50)
-    content: Optional[str] = ""
+    content: str = ""
 
 
 class NoteDTO(CreateNoteDTO):
@@ -34,57 +55,430 @@ class NoteDTO(CreateNoteDTO):
         return cls(id=note.id, name=note.name, content=note.content)
 
 
+class NotesPageDTO(BaseModel):
+    items: list[NoteDTO]
+    next_cursor: Optional[str] = None
+
+
+class NotesChangesDTO(BaseModel):
+    notes: list[NoteDTO]
+    deleted: list[uuid.UUID]
+    sync_token: str
+
+
+class NotesSearchPageDTO(BaseModel):
+    items: list[NoteDTO]
+    next_offset: Optional[int] = None
+
+
+class CreateNoteOperationDTO(BaseModel):
+    op: Literal['create']
+    note: CreateNoteDTO
+
+
+class UpdateNoteOperationDTO(BaseModel):
+    op: Literal['update']
+    note: NoteDTO
+
+
+class DeleteNoteOperationDTO(BaseModel):
+    op: Literal['delete']
+    id: uuid.UUID
+
+
+NoteOperationDTO = Annotated[
+    Union[CreateNoteOperationDTO, UpdateNoteOperationDTO, DeleteNoteOperationDTO],
+    Field(discriminator='op')
+]
+
+
+class NotesBatchDTO(BaseModel):
+    operations: list[NoteOperationDTO] = Field(..., min_length=1, max_length=MAX_BATCH_OPERATIONS)
+
+
+class OperationResultDTO(BaseModel):
+    status: Literal['CREATED', 'UPDATED', 'DELETED', 'FAILED', 'NOT_APPLIED']
+    id: uuid.UUID
+    note: Optional[NoteDTO] = None
+    code: Optional[str] = None
+
+
+class NotesBatchResultDTO(BaseModel):
+    results: list[OperationResultDTO]
+
+
 @bluprint.get('/')
 @endpoint
-def get_all_notes() -> tuple[list[NoteDTO], int]:
+def get_all_notes(jwt: JWT) -> tuple[Union[list[NoteDTO], NotesPageDTO, Response], int, dict]:
+    """
+    Without 'limit' and 'after' query params all notes are returned as a list.
+    With any of them page of notes is returned, 'next_cursor' of the page should be passed as 'after' to get next one.
+    With 'stream=true' full list is read from db in batches and sent in chunks instead of being built in memory.
+    Response has ETag, when it matches If-None-Match 304 is returned without reading notes.
+    Lists and pages are served from response cache (see response_cache) until user writes notes. Clients which wrote
+    recently (with READ_PRIMARY_COOKIE) bypass it and lists read from replica aren't cached, as they may be outdated.
+    """
+    cache = notes_response_cache()
+    if cache is None or request.args.get('stream') == 'true' or READ_PRIMARY_COOKIE in request.cookies:
+        return _list_notes(jwt.user_id)
+
+    version = _notes_version(jwt.user_id)
+    key = cache.key(jwt.user_id, version, _list_variant())
+    cached = cache.get(key)
+    if cached is None:
+        result, status, headers = _list_notes(jwt.user_id, version)
+        if isinstance(result, Response):
+            return result, status, headers
+        result_type = list[NoteDTO] if isinstance(result, list) else NotesPageDTO
+        etag, _ = unquote_etag(headers['ETag'])
+        cached = CachedResponse(etag=etag, body=json_body(result, result_type))
+        if not reads_from_replica():
+            cache.put(key, cached)
+
+    headers = {'ETag': quote_etag(cached.etag)}
+    if request.if_none_match.contains(cached.etag):
+        return Response(status=304), 304, headers
+    return Response(cached.body, mimetype='application/json'), 200, headers
+
+
+def _list_notes(user_id: uuid.UUID,
+                version: int = None) -> tuple[Union[list[NoteDTO], NotesPageDTO, Response], int, dict]:
+    """Version of user's notes is read, unless it was already read by caller"""
+    query = db.session.query(Note).filter(Note.user_id == user_id)
     name = request.args.get('name')
     if name is not None:
-        notes = db.session.query(Note).filter(Note.name == name).all()
-        return [NoteDTO.from_note(note) for note in notes], 200
+        query = query.filter(Note.name == name)
+
+    etag = _notes_list_etag(user_id, _notes_version(user_id) if version is None else version)
+    headers = {'ETag': quote_etag(etag)}
+    if request.if_none_match.contains(etag):
+        return Response(status=304), 304, headers
+
+    if 'limit' not in request.args and 'after' not in request.args:
+        query = query.order_by(desc(Note.updated_at))
+        if request.args.get('stream') == 'true':
+            return Response(stream_with_context(_stream_json_array(query)), mimetype='application/json'), 200, headers
+        return [NoteDTO.from_note(note) for note in query.all()], 200, headers
+
+    limit = _page_limit()
+    query = query.order_by(desc(Note.updated_at), desc(Note.id))
+    after = request.args.get('after')
+    if after is not None:
+        query = query.filter(tuple_(Note.updated_at, Note.id) < _decode_cursor(after))
+
+    notes = query.limit(limit + 1).all()
+    next_cursor = _encode_cursor(notes[limit - 1]) if len(notes) > limit else None
+    page = NotesPageDTO(items=[NoteDTO.from_note(note) for note in notes[:limit]], next_cursor=next_cursor)
+    return page, 200, headers
+
+
+@bluprint.get('/<uuid:id>')
+@endpoint
+def get_note(id: uuid, jwt: JWT) -> tuple[Union[NoteDTO, Response], int, dict]:
+    note = _user_note(id, jwt.user_id)
+
+    headers = {'ETag': quote_etag(_note_etag(note))}
+    if request.if_none_match.contains(_note_etag(note)):
+        return Response(status=304), 304, headers
+    return NoteDTO.from_note(note), 200, headers
+
+
+@bluprint.get('/changes')
+@endpoint
+def get_notes_changes(jwt: JWT) -> tuple[NotesChangesDTO, int]:
+    """
+    Notes created or updated and ids of notes deleted since 'since' query param, which is 'sync_token' of previous call.
+    Without 'since' all notes are returned. Token is the last notes version (see _bump_notes_version) client has seen.
+    Versions are committed in order, so changes committed after the call always have higher version than its token.
+    Tokens older than tombstone retention are refused with 410, as deletions since then may have been purged, client
+    has to sync again without 'since'.
+    """
+    synced_at = timestamp_in_seconds()
+    since = request.args.get('since')
+    notes_query = db.session.query(Note).filter(Note.user_id == jwt.user_id)
+    tombstones_query = db.session.query(NoteTombstone).filter(NoteTombstone.user_id == jwt.user_id)
+    since, since_synced_at = _decode_sync_token(since) if since is not None else (0, None)
+    retention_days = current_app.config.get("NOTES_TOMBSTONE_RETENTION_DAYS", DEFAULT_TOMBSTONE_RETENTION_DAYS)
+    if since_synced_at is not None and since_synced_at < synced_at - retention_days * 24 * 60 * 60:
+        raise NotesClintError(code="RESYNC_REQUIRED", message="since: sync token is older than deleted notes retention",
+                              status_code=410)
+    if since:
+        notes_query = notes_query.filter(Note.change_version > since)
+        tombstones_query = tombstones_query.filter(NoteTombstone.change_version > since)
+    notes = notes_query.all()
+    tombstones = tombstones_query.all()
+
+    change_versions = [note.change_version for note in notes] + [tombstone.change_version for tombstone in tombstones]
+    sync_token = max(change_versions, default=since)
+    return NotesChangesDTO(notes=[NoteDTO.from_note(note) for note in notes],
+                           deleted=[tombstone.id for tombstone in tombstones],
+                           sync_token=_encode_sync_token(sync_token, synced_at)), 200
+
+
+@bluprint.get('/search')
+@endpoint
+def search_notes(jwt: JWT) -> tuple[NotesSearchPageDTO, int]:
+    """Notes matching all words of 'q' query param, best matches first. Paginated with 'limit' and 'offset'."""
+    phrase = request.args.get('q', '').strip()
+    if not phrase:
+        raise NotesClintError(code="VALIDATION_ERROR", message="q: should not be empty", status_code=400)
+    limit = _page_limit()
+    offset = request.args.get('offset', '0')
+    if not offset.isdigit():
+        raise NotesClintError(code="VALIDATION_ERROR", message="offset: should be non negative integer", status_code=400)
+    offset = int(offset)
 
-    notes = db.session.query(Note).order_by(desc(Note.updated_at)).all()
-    return [NoteDTO.from_note(note) for note in notes], 200
+    notes = db.session.scalars(search_notes_query(phrase, jwt.user_id).limit(limit + 1).offset(offset)).all()
+    next_offset = offset + limit if len(notes) > limit else None
+    return NotesSearchPageDTO(items=[NoteDTO.from_note(note) for note in notes[:limit]], next_offset=next_offset), 200
 
 
 @bluprint.put('/<uuid:id>')
 @endpoint
-def update_note(id: uuid, body: NoteDTO) -> tuple[NoteDTO, int]:
+def update_note(id: uuid, body: NoteDTO, jwt: JWT) -> tuple[NoteDTO, int, dict]:
+    """If-Match header is optional, when provided note is updated only if it wasn't modified in meantime"""
     if id != body.id:
         raise NotesClintError(code="VALIDATION_ERROR", message="id: should match url id", status_code=400)
-    note = db.session.get(Note, id)
-    if note is None:
-        raise NotesClintError(code="NOTE_NOT_FOUND", status_code=404)
+    note = _user_note(id, jwt.user_id)
+    if request.if_match and not request.if_match.contains(_note_etag(note)):
+        raise NotesClintError(code="PRECONDITION_FAILED", status_code=412)
 
+    note.change_version = _bump_notes_version(jwt.user_id)
     note.name = body.name
     note.content = body.content
+    try:
+        db.session.flush()
+    except StaleDataError:
+        # version changed between read and update
+        db.session.rollback()
+        raise NotesClintError(code="PRECONDITION_FAILED", status_code=412)
+    result = NoteDTO.from_note(note), 200, {'ETag': quote_etag(_note_etag(note))}
     db.session.commit()
-    return NoteDTO.from_note(note), 200
+    return result
 
 
 @bluprint.post('/')
 @endpoint
-def create_note(body: CreateNoteDTO) -> tuple[NoteDTO, int]:
-    note_in_db = db.session.query(Note).filter_by(name=body.name).first()
-    if note_in_db:
-        raise NotesClintError(code="NOTE_ALREADY_EXISTS", status_code=400)
-    else:
-        new_note = Note(
-            id=uuid.uuid4(),
-            name=body.name,
-            content=body.content
-        )
-        db.session.add(new_note)
-        db.session.commit()
-        return NoteDTO.from_note(new_note), 201
+def create_note(body: CreateNoteDTO, jwt: JWT) -> tuple[NoteDTO, int, dict]:
+    new_note = Note(
+        id=uuid.uuid4(),
+        name=body.name,
+        content=body.content,
+        user_id=jwt.user_id,
+        change_version=_bump_notes_version(jwt.user_id)
+    )
+    db.session.add(new_note)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        # name is unique for user, other violations aren't client's fault
+        if db.session.scalar(select(Note.id).where(Note.user_id == jwt.user_id, Note.name == body.name)):
+            raise NotesClintError(code="NOTE_ALREADY_EXISTS", status_code=400)
+        raise
+    # built before commit, which would expire note and reload it
+    result = NoteDTO.from_note(new_note), 201, {'ETag': quote_etag(_note_etag(new_note))}
+    db.session.commit()
+    return result
 
 
 @bluprint.delete('/<uuid:id>')
 @endpoint
-def delete_note(id: uuid) -> tuple[Response, int]:
-    note = db.session.query(Note).get(id)
-    if note is None:
-        raise NotesClintError(code="NOTE_NOT_FOUND", status_code=404)
+def delete_note(id: uuid, jwt: JWT) -> tuple[Response, int]:
+    note = _user_note(id, jwt.user_id)
 
+    change_version = _bump_notes_version(jwt.user_id)
     db.session.delete(note)
+    db.session.add(NoteTombstone(id=note.id, user_id=note.user_id, change_version=change_version))
+    db.session.commit()
+    return Response(), 204
+
+
+@bluprint.post('/batch')
+@endpoint
+def apply_notes_batch(body: NotesBatchDTO, jwt: JWT) -> tuple[NotesBatchResultDTO, int]:
+    """
+    Applies all operations in single transaction or none of them. Results are in order of operations.
+    When any operation fails, its result has error code and the rest is marked as not applied.
+    """
+    operations = body.operations
+    ids, creates, updates, deletes = [], [], [], []
+    for operation in operations:
+        if operation.op == 'create':
+            creates.append(NoteDTO(id=uuid.uuid4(), **operation.note.model_dump()))
+            ids.append(creates[-1].id)
+        elif operation.op == 'update':
+            updates.append(operation.note)
+            ids.append(operation.note.id)
+        else:
+            deletes.append(operation.id)
+            ids.append(operation.id)
+
+    # taken before checks, so concurrent writes of user's notes can't take checked names before the batch is applied
+    change_version = _bump_notes_version(jwt.user_id)
+    errors = _batch_errors(operations, ids, updates, deletes, creates, jwt.user_id)
+    if errors:
+        db.session.rollback()
+        return NotesBatchResultDTO(results=[
+            OperationResultDTO(status='FAILED', id=id, code=errors[i]) if i in errors
+            else OperationResultDTO(status='NOT_APPLIED', id=id)
+            for i, id in enumerate(ids)
+        ]), 400
+
+    notes = Note.__table__
+    if deletes:
+        db.session.execute(delete(Note).where(Note.user_id == jwt.user_id, Note.id.in_(deletes)))
+        db.session.execute(insert(NoteTombstone), [{"id": id, "user_id": jwt.user_id, "change_version": change_version}
+                                                   for id in deletes])
+    if updates:
+        db.session.execute(
+            update(notes)
+            .where(notes.c.user_id == jwt.user_id, notes.c.id == bindparam('b_id'))
+            .values(name=bindparam('b_name'), content=bindparam('b_content'), version=notes.c.version + 1,
+                    change_version=change_version),
+            [{"b_id": note.id, "b_name": note.name, "b_content": note.content} for note in updates])
+    if creates:
+        db.session.execute(insert(Note), [note.model_dump() | {"user_id": jwt.user_id, "change_version": change_version}
+                                          for note in creates])
     db.session.commit()
-    return Response(), 204
\ No newline at end of file
+
+    status = {'create': 'CREATED', 'update': 'UPDATED', 'delete': 'DELETED'}
+    notes_by_id = {note.id: note for note in creates + updates}
+    return NotesBatchResultDTO(results=[
+        OperationResultDTO(status=status[operation.op], id=id, note=notes_by_id.get(id))
+        for operation, id in zip(operations, ids)
+    ]), 200
+
+
+def _batch_errors(operations, ids: list[uuid.UUID], updates: list[NoteDTO], deletes: list[uuid.UUID],
+                  creates: list[NoteDTO], user_id: uuid.UUID) -> dict[int, str]:
+    """Error codes by operation index, checked with one query for ids and one for names"""
+    errors = {}
+    seen_ids = set()
+    for i, id in enumerate(ids):
+        if id in seen_ids:
+            errors[i] = 'VALIDATION_ERROR'
+        seen_ids.add(id)
+
+    existing_ids = set(db.session.scalars(select(Note.id).where(
+        Note.user_id == user_id, Note.id.in_([note.id for note in updates] + deletes))))
+    deleted_ids = set(deletes)
+    for i, operation in enumerate(operations):
+        if operation.op != 'create' and ids[i] not in existing_ids:
+            errors.setdefault(i, 'NOTE_NOT_FOUND')
+
+    # name is taken if note having it stays after batch or another operation in batch sets it
+    renamed = {note.id: note.name for note in updates + creates}
+    taken_names = {name for id, name in db.session.execute(select(Note.id, Note.name)
+                                                           .where(Note.user_id == user_id,
+                                                                  Note.name.in_(renamed.values())))
+                   if id not in deleted_ids and id not in renamed}
+    for i, operation in enumerate(operations):
+        if operation.op == 'delete':
+            continue
+        if operation.note.name in taken_names:
+            errors.setdefault(i, 'NOTE_ALREADY_EXISTS')
+        taken_names.add(operation.note.name)
+    return errors
+
+
+def _user_note(id: uuid.UUID, user_id: uuid.UUID) -> Note:
+    """Note of the user, notes of other users are reported as not found"""
+    note = db.session.scalar(select(Note).where(Note.id == id, Note.user_id == user_id))
+    if note is None:
+        raise NotesClintError(code="NOTE_NOT_FOUND", status_code=404)
+    return note
+
+
+def _list_variant() -> str:
+    """Query params selecting part of the list, in canonical order, so their order doesn't split cached responses"""
+    return urlencode(sorted(request.args.items(multi=True)))
+
+
+def _note_etag(note: Note) -> str:
+    return f"{note.id.hex}-{note.version}"
+
+
+def _notes_version(user_id: uuid.UUID) -> Optional[int]:
+    return db.session.scalar(select(User.notes_version).where(User.id == user_id))
+
+
+def _notes_list_etag(user_id: uuid.UUID, version: Optional[int]) -> str:
+    """
+    Derived from version of user's notes, which changes on any create, update or delete of them, and from query params
+    which select part of the list. User is included, so lists of different users with the same version don't share
+    ETag.
+    """
+    state = f"{user_id}|{version}|{request.query_string.decode('utf-8')}"
+    return hashlib.sha1(state.encode('utf-8')).hexdigest()
+
+
+def _bump_notes_version(user_id: uuid.UUID) -> int:
+    """
+    Increases version of user's notes. Call in every transaction writing them. Row of the user stays locked until
+    commit, so concurrent writes of user's notes are serialized and their versions are committed in order.
+    Token of deleted user stays valid until it expires, writes with it are refused.
+    """
+    version = db.session.execute(
+        update(User).where(User.id == user_id)
+        .values(notes_version=User.notes_version + 1, updated_at=User.updated_at)
+        .returning(User.notes_version)
+    ).scalar_one_or_none()
+    if version is None:
+        raise NotesClintError(code="USER_NOT_FOUND", status_code=403)
+    return version
+
+
+def _encode_sync_token(version: int, synced_at: int) -> str:
+    return urlsafe_b64encode(f"v{version}t{synced_at}".encode("utf-8")).decode("utf-8")
+
+
+def _decode_sync_token(token: str) -> tuple[int, Optional[int]]:
+    """
+    Notes version and time of sync which returned the token. Tokens from before notes versions (timestamps) are
+    decoded as version 0 without time, so their clients get all notes once. Versions without time (tokens from before
+    tombstone retention) are decoded with time 0, so their clients sync again from scratch.
+    """
+    try:
+        decoded = urlsafe_b64decode(token.encode("utf-8")).decode("utf-8")
+        if decoded.startswith("v"):
+            version, _, synced_at = decoded[1:].partition("t")
+            return int(version), int(synced_at or 0)
+        datetime.fromisoformat(decoded)
+        return 0, None
+    except ValueError:
+        raise NotesClintError(code="VALIDATION_ERROR", message="since: invalid sync token", status_code=400)
+
+
+def _stream_json_array(query):
+    yield '['
+    separator = ''
+    chunk = []
+    for note in query.yield_per(STREAM_BATCH_SIZE):
+        chunk.append(NoteDTO.from_note(note).model_dump_json())
+        if len(chunk) == STREAM_BATCH_SIZE:
+            yield separator + ', '.join(chunk)
+            separator, chunk = ', ', []
+    if chunk:
+        yield separator + ', '.join(chunk)
+    yield ']'
+
+
+def _page_limit() -> int:
+    limit = request.args.get('limit', str(DEFAULT_PAGE_SIZE))
+    if not limit.isdigit() or not 0 < int(limit) <= MAX_PAGE_SIZE:
+        raise NotesClintError(code="VALIDATION_ERROR", message=f"limit: should be between 1 and {MAX_PAGE_SIZE}",
+                              status_code=400)
+    return int(limit)
+
+
+def _encode_cursor(note: Note) -> str:
+    return urlsafe_b64encode(f"{note.updated_at.isoformat()}|{note.id}".encode("utf-8")).decode("utf-8")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        updated_at, id = urlsafe_b64decode(cursor.encode("utf-8")).decode("utf-8").split('|')
+        return datetime.fromisoformat(updated_at), uuid.UUID(id)
+    except ValueError:
+        raise NotesClintError(code="VALIDATION_ERROR", message="after: invalid cursor", status_code=400)
@@ -0,0 +1,130 @@
+"""
+Cache of serialized responses of GET /notes/ (full lists and pages), kept in process up to NOTES_CACHE_BYTES for
+NOTES_CACHE_TTL seconds, least recently used ones are evicted first. Keys contain version of user's notes
+(User.notes_version), which every write of them increases in database, so after a write no instance finds lists cached
+before it, without invalidating anything. Responses under old versions are left to expire or be evicted.
+Optional shared backend (ex. Redis client, see LocalSharedCache for the interface) lets instances reuse responses
+cached by each other.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional
+from uuid import UUID
+
+from flask import Flask, current_app
+
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 60
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    etag: str
+    body: bytes
+
+    def to_bytes(self) -> bytes:
+        # etag is hex digest, so it never contains separator
+        return self.etag.encode("ascii") + b"\n" + self.body
+
+    @classmethod
+    def from_bytes(cls, value: bytes) -> 'CachedResponse':
+        etag, body = value.split(b"\n", 1)
+        return cls(etag=etag.decode("ascii"), body=body)
+
+
+class NotesResponseCache:
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, ttl_seconds: int = DEFAULT_TTL_SECONDS, shared=None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._clock = clock
+        self._responses: OrderedDict[str, tuple[float, CachedResponse]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(user_id: UUID, notes_version: int, variant: str) -> str:
+        """
+        Key of user's response for variant (ex. query string). Read notes version before reading notes, which the key
+        will cache, so notes written meanwhile are cached under outdated version.
+        """
+        return f"notes:{user_id}:{notes_version}:{variant}"
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        response = self._get_local(key)
+        if response is None and self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                response = CachedResponse.from_bytes(value)
+                self._put_local(key, response)
+        with self._lock:
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return response
+
+    def put(self, key: str, response: CachedResponse) -> CachedResponse:
+        self._put_local(key, response)
+        if self.shared is not None:
+            self.shared.set(key, response.to_bytes(), ex=self.ttl_seconds)
+        return response
+
+    def snapshot(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size_bytes": self.size_bytes}
+
+    def __len__(self):
+        return len(self._responses)
+
+    def _get_local(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            expire_at, response = self._responses.get(key, (None, None))
+            if response is None:
+                return None
+            if expire_at <= self._clock():
+                self._remove(key)
+                return None
+            self._responses.move_to_end(key)
+            return response
+
+    def _put_local(self, key: str, response: CachedResponse):
+        if _size(key, response) > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._responses[key] = (self._clock() + self.ttl_seconds, response)
+            self.size_bytes += _size(key, response)
+            while self.size_bytes > self.max_bytes:
+                self._remove(next(iter(self._responses)))
+                self.evictions += 1
+
+    def _remove(self, key: str):
+        _, response = self._responses.pop(key, (None, None))
+        if response is not None:
+            self.size_bytes -= _size(key, response)
+
+
+def init_notes_response_cache(app: Flask):
+    shared = app.config.get("NOTES_CACHE_SHARED_BACKEND")
+    if shared is None and app.config.get("NOTES_CACHE_REDIS_URL"):
+        import redis  # optional dependency, needed only for shared cache
+        shared = redis.Redis.from_url(app.config["NOTES_CACHE_REDIS_URL"])
+    max_bytes = app.config.get("NOTES_CACHE_BYTES", DEFAULT_MAX_BYTES)
+    app.extensions["notes_response_cache"] = NotesResponseCache(
+        max_bytes=max_bytes, ttl_seconds=app.config.get("NOTES_CACHE_TTL", DEFAULT_TTL_SECONDS),
+        shared=shared) if max_bytes else None
+
+
+def notes_response_cache() -> Optional[NotesResponseCache]:
+    """None when cache is turned off"""
+    return current_app.extensions.get("notes_response_cache")
+
+
+def _size(key: str, response: CachedResponse) -> int:
+    return len(key) + len(response.etag) + len(response.body)
@@ -0,0 +1,39 @@
+"""
+Full text search over notes name and content.
+PostgreSQL uses generated 'search_vector' column with GIN index, SQLite uses FTS5 'notes_fts' table.
+Both are created by migrations and aren't part of ORM model.
+"""
+from uuid import UUID
+
+from sqlalchemy import Select, Uuid, column, func, literal_column, select, table
+
+from opennote.database import db
+from opennote.db_model import Note
+
+TEXT_SEARCH_CONFIG = 'simple'
+
+_notes_fts = table('notes_fts', column('id', Uuid), column('rank'))
+
+
+def search_notes_query(phrase: str, user_id: UUID) -> Select:
+    """Select of user's notes matching all words of the phrase, best matches first"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return _postgresql_query(phrase).where(Note.user_id == user_id)
+    return _sqlite_query(phrase).where(Note.user_id == user_id)
+
+
+def _postgresql_query(phrase: str) -> Select:
+    search_vector = literal_column('notes.search_vector')
+    query = func.websearch_to_tsquery(TEXT_SEARCH_CONFIG, phrase)
+    return (select(Note)
+            .where(search_vector.op('@@')(query))
+            .order_by(func.ts_rank(search_vector, query).desc(), Note.id))
+
+
+def _sqlite_query(phrase: str) -> Select:
+    # every word is quoted, so FTS5 query syntax in user input is matched literally
+    match = ' '.join('"' + word.replace('"', '""') + '"' for word in phrase.split())
+    return (select(Note)
+            .join(_notes_fts, _notes_fts.c.id == Note.id)
+            .where(literal_column('notes_fts').op('MATCH')(match))
+            .order_by(_notes_fts.c.rank, Note.id))
@@ -4,4 +4,6 @@ from dataclasses import dataclass
 @dataclass
 class AppTestConfig:
     test_database_url: str = "sqlite:///:memory:"
+    test_replica_database_url: str = None
     skip_auth: bool = True
+    password_hash_work_factor: int = 1000
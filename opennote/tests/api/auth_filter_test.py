@@ -1,7 +1,11 @@
 from uuid import uuid4
 
+from flask import Blueprint
+
 from auth.jwt import JWT
 from common.data_time_utils import timestamp_in_seconds
+from opennote.auth import jwt as opennote_jwt
+from opennote.auth.auth_filter import public, public_blueprint
 
 
 def test_auth_filter_happy_path(test_app_with_auth_filter):
@@ -58,3 +62,52 @@ def test_auth_filter_do_not_check_option_request(test_app_with_auth_filter):
     with test_app_with_auth_filter.test_client() as client:
         response = client.options('/notes/')
         assert response.status_code == 200
+
+
+def test_auth_filter_verifies_token_once_for_repeated_requests(test_app_with_auth_filter, monkeypatch):
+    validate = opennote_jwt.JWT.validate
+    validated_tokens = []
+
+    def counting_validate(self):
+        validated_tokens.append(self)
+        validate(self)
+
+    monkeypatch.setattr(opennote_jwt.JWT, 'validate', counting_validate)
+    with test_app_with_auth_filter.test_client() as client:
+        response = client.post('/access-token/login', json={"username": "admin", "password": "admin"})
+        assert response.status_code == 201
+        response = client.get('/users/whoami')
+        assert response.status_code == 200
+        response = client.get('/users/whoami')
+        assert response.status_code == 200
+        assert len(validated_tokens) == 1
+
+
+def test_auth_filter_resolves_policies_of_registered_endpoints(test_app_with_auth_filter):
+    policies = test_app_with_auth_filter.extensions["auth_policies"]
+    assert not policies.requires_auth('access_token.create_token')
+    assert not policies.requires_auth('metrics.get_metrics')
+    assert policies.requires_auth('notes.get_all_notes')
+    assert policies.requires_auth('users.register')
+    assert policies.requires_auth(None)
+
+
+def test_auth_filter_allows_public_views_and_blueprints_added_later(test_app_with_auth_filter):
+    parent = Blueprint('parent', __name__, url_prefix='/parent')
+    nested = public_blueprint(Blueprint('nested', __name__, url_prefix='/nested'))
+    nested.add_url_rule('/view', view_func=lambda: "nested")
+    parent.add_url_rule('/private', view_func=lambda: "private", endpoint='private')
+    parent.add_url_rule('/public', view_func=public(lambda: "public"), endpoint='public')
+    parent.register_blueprint(nested)
+    test_app_with_auth_filter.register_blueprint(parent)
+
+    with test_app_with_auth_filter.test_client() as client:
+        assert client.get('/parent/public').status_code == 200
+        assert client.get('/parent/nested/view').status_code == 200
+        assert client.get('/parent/private').status_code == 403
+
+
+def test_auth_filter_requires_token_for_not_existing_routes(test_app_with_auth_filter):
+    with test_app_with_auth_filter.test_client() as client:
+        assert client.get('/not-existing').status_code == 403
+        assert client.get('/metrics/not-existing').status_code == 403
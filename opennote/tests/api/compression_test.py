@@ -0,0 +1,67 @@
+import gzip
+import json
+
+
+def _create_notes(client, count: int, content_size: int = 1000):
+    for i in range(count):
+        client.post('/notes/', json={"name": f"note {i}", "content": "content " * (content_size // 8)})
+
+
+def test_large_response_is_gzipped_when_accepted(user_client):
+    with user_client as client:
+        _create_notes(client, 3)
+        plain = client.get('/notes/')
+        response = client.get('/notes/', headers={"Accept-Encoding": "gzip, deflate"})
+
+    assert response.headers['Content-Encoding'] == "gzip"
+    assert "Accept-Encoding" in response.headers['Vary']
+    assert int(response.headers['Content-Length']) < len(plain.data)
+    assert json.loads(gzip.decompress(response.data)) == json.loads(plain.data)
+
+
+def test_response_is_not_compressed_when_not_accepted(user_client):
+    with user_client as client:
+        _create_notes(client, 3)
+        response = client.get('/notes/', headers={"Accept-Encoding": "identity"})
+
+    assert "Content-Encoding" not in response.headers
+    assert "Accept-Encoding" in response.headers['Vary']
+    assert len(json.loads(response.data)) == 3
+
+
+def test_small_response_is_not_compressed(user_client):
+    with user_client as client:
+        _create_notes(client, 1, content_size=10)
+        response = client.get('/notes/', headers={"Accept-Encoding": "gzip"})
+
+    assert "Content-Encoding" not in response.headers
+    assert len(json.loads(response.data)) == 1
+
+
+def test_streamed_response_is_compressed_incrementally(user_client, monkeypatch):
+    monkeypatch.setattr('opennote.notes.notes.STREAM_BATCH_SIZE', 2)
+    with user_client as client:
+        _create_notes(client, 5)
+        response = client.get('/notes/?stream=true', headers={"Accept-Encoding": "gzip"}, buffered=False)
+        chunks = list(response.response)
+
+    assert response.headers['Content-Encoding'] == "gzip"
+    assert "Content-Length" not in response.headers
+    assert len(chunks) > 2
+    assert len(json.loads(gzip.decompress(b"".join(chunks)))) == 5
+
+
+def test_compressed_list_is_cached_by_etag(test_app, user_client):
+    with user_client as client:
+        _create_notes(client, 3)
+        first = client.get('/notes/', headers={"Accept-Encoding": "gzip"})
+        second = client.get('/notes/', headers={"Accept-Encoding": "gzip"})
+        cache = test_app.extensions["compressed_bodies_cache"]
+        assert len(cache) == 1
+
+        client.post('/notes/', json={"name": "another", "content": "content"})
+        third = client.get('/notes/', headers={"Accept-Encoding": "gzip"})
+
+    assert second.data == first.data
+    assert len(cache) == 2
+    assert len(json.loads(gzip.decompress(third.data))) == 1 + 3
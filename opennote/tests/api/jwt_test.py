@@ -1,9 +1,13 @@
 import datetime
+from base64 import b64encode
 
 from uuid import uuid4
 
+from flask import Flask
+
 from opennote import create_app
-from opennote.auth.jwt import JWT
+from opennote.auth.jwt import JWT, JWTSigner, VerifiedJWTCache
+from opennote.common.data_time_utils import timestamp_in_seconds
 
 
 def test_encrypted_match_decrypted():
@@ -20,3 +24,62 @@ def test_encrypted_match_decrypted():
         assert result_token.user_id == user_id
         assert result_token.algorith == "RS256"
         result_token.validate()
+
+
+def test_verified_cache_evicts_least_recently_used_token():
+    cache = VerifiedJWTCache(max_size=2)
+    issued_at = timestamp_in_seconds()
+    tokens = [JWT.create(issued_at=issued_at, refresh_token=uuid4(), user_id=uuid4()) for _ in range(3)]
+
+    cache.put("token0", tokens[0])
+    cache.put("token1", tokens[1])
+    assert cache.get("token0") is tokens[0]
+    cache.put("token2", tokens[2])
+
+    assert len(cache) == 2
+    assert cache.get("token1") is None
+    assert cache.get("token0") is tokens[0]
+    assert cache.get("token2") is tokens[2]
+
+
+def test_verified_cache_does_not_return_expired_token():
+    cache = VerifiedJWTCache()
+    expired = JWT.create(issued_at=timestamp_in_seconds() - JWT.TIME_TO_LIVE - 1, refresh_token=uuid4(), user_id=uuid4())
+    valid = JWT.create(issued_at=timestamp_in_seconds(), refresh_token=uuid4(), user_id=uuid4())
+
+    cache.put("expired", expired)
+    cache.put("valid", valid)
+    valid.expire_at = timestamp_in_seconds() - 1
+
+    assert cache.get("expired") is None
+    assert cache.get("valid") is None
+    assert len(cache) == 0
+
+
+def test_signature_is_verified_over_token_as_received():
+    signer = JWTSigner("secret")
+    header = b64encode(b'{"alg":"RS256"}').decode()
+    payload = b64encode(f'{{"exp":{timestamp_in_seconds()},"iat":"{uuid4()}","user_id":"{uuid4()}"}}'.encode()).decode()
+    token = f"{header}.{payload}.{signer.sign(f'{header}.{payload}'.encode())}"
+
+    app = Flask(__name__)
+    app.config['JWT_SECRET'] = "secret"
+    with app.app_context():
+        JWT.from_string(token).validate()
+
+
+def test_signer_rejects_signature_made_with_other_secret():
+    signature = JWTSigner("other secret").sign(b"header.payload")
+
+    assert JWTSigner("secret").verify(b"header.payload", JWTSigner("secret").sign(b"header.payload"))
+    assert not JWTSigner("secret").verify(b"header.payload", signature)
+    assert not JWTSigner("secret").verify(b"header.payload", "not ascii ąę")
+
+
+def test_issued_at_in_milliseconds_is_read_from_token_or_whole_second():
+    issued_at = timestamp_in_seconds()
+    precise = JWT.create(issued_at=issued_at, refresh_token=uuid4(), user_id=uuid4(), issued_at_ms=issued_at * 1000 + 42)
+    legacy = JWT.create(issued_at=issued_at, refresh_token=uuid4(), user_id=uuid4())
+
+    assert JWT.from_string(f"{precise.header}.{precise.payload}.signature").issued_at_ms == issued_at * 1000 + 42
+    assert JWT.from_string(f"{legacy.header}.{legacy.payload}.signature").issued_at_ms == issued_at * 1000
@@ -0,0 +1,36 @@
+def test_metrics_do_not_require_auth(test_app_with_auth_filter):
+    with test_app_with_auth_filter.test_client() as client:
+        assert client.get('/metrics').status_code == 200
+        assert client.get('/metrics/db-pool').status_code == 200
+
+
+def test_server_timing_header_contains_endpoint_phases_and_db(user_client):
+    with user_client as client:
+        client.post('/notes/', json={"name": "note", "content": "content"})
+        response = client.get('/notes/')
+
+    timings = {entry.split(';')[0]: entry for entry in response.headers['Server-Timing'].split(', ')}
+    assert set(timings) == {"auth", "handler", "serialize", "db"}
+    assert 'desc="2 statements"' in timings["db"]
+
+
+def test_server_timing_header_contains_parse_phase_for_body(user_client):
+    with user_client as client:
+        response = client.post('/notes/', json={"name": "note", "content": "content"})
+
+    assert response.headers['Server-Timing'].startswith("parse;dur=")
+
+
+def test_metrics_expose_endpoint_histograms(user_client):
+    with user_client as client:
+        client.get('/notes/')
+        client.get('/notes/')
+        response = client.get('/metrics')
+
+    assert response.content_type == 'text/plain; version=0.0.4; charset=utf-8'
+    lines = response.text.splitlines()
+    assert "# TYPE yana_endpoint_phase_seconds histogram" in lines
+    assert 'yana_endpoint_phase_seconds_count{endpoint="notes.get_all_notes",phase="handler"} 2' in lines
+    assert 'yana_endpoint_phase_seconds_bucket{endpoint="notes.get_all_notes",phase="handler",le="+Inf"} 2' in lines
+    assert 'yana_endpoint_db_statements_bucket{endpoint="notes.get_all_notes",le="2"} 2' in lines
+    assert 'yana_endpoint_db_statements_count{endpoint="notes.get_all_notes"} 2' in lines
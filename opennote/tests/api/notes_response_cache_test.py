@@ -0,0 +1,137 @@
+import uuid
+
+from sqlalchemy import update
+
+from opennote.auth.user_cache import LocalSharedCache
+from opennote.database import db
+from opennote.db_model import User
+from opennote.notes.response_cache import CachedResponse, NotesResponseCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _create_note(client, name: str) -> dict:
+    response = client.post('/notes/', json={"name": name, "content": "content"})
+    assert response.status_code == 201
+    return response.json
+
+
+def test_notes_list_is_served_from_cache(user_client, query_budget):
+    with user_client as client:
+        _create_note(client, "note")
+        first = client.get('/notes/')
+
+        # only version of user's notes is read
+        with query_budget(1):
+            second = client.get('/notes/')
+        with query_budget(1):
+            not_modified = client.get('/notes/', headers={"If-None-Match": first.headers['ETag']})
+
+        assert second.data == first.data
+        assert second.headers['ETag'] == first.headers['ETag']
+        assert not_modified.status_code == 304
+
+
+def test_notes_list_cache_is_invalidated_by_writes(user_client):
+    with user_client as client:
+        note = _create_note(client, "note")
+        assert [item["name"] for item in client.get('/notes/').json] == ["note"]
+
+        client.put(f'/notes/{note["id"]}', json={**note, "name": "renamed"})
+        assert [item["name"] for item in client.get('/notes/').json] == ["renamed"]
+
+        client.post('/notes/batch', json={"operations": [{"op": "create", "note": {"name": "other"}}]})
+        assert len(client.get('/notes/').json) == 2
+
+        client.delete(f'/notes/{note["id"]}')
+        assert [item["name"] for item in client.get('/notes/').json] == ["other"]
+
+
+def test_notes_pages_are_cached_by_query_params_in_any_order(user_client, query_budget):
+    with user_client as client:
+        _create_note(client, "first")
+        _create_note(client, "second")
+        page = client.get('/notes/?limit=1&name=first')
+
+        with query_budget(1):
+            assert client.get('/notes/?name=first&limit=1').data == page.data
+        with query_budget(2):
+            assert client.get('/notes/?limit=1').json["next_cursor"] is not None
+
+
+def test_streamed_notes_list_is_not_cached(user_client, query_budget):
+    with user_client as client:
+        _create_note(client, "note")
+        client.get('/notes/?stream=true')
+        with query_budget(2):
+            assert len(client.get('/notes/?stream=true').json) == 1
+
+
+def test_metrics_expose_notes_cache_counters(user_client):
+    with user_client as client:
+        client.get('/notes/')
+        client.get('/notes/')
+
+        metrics = client.get('/metrics').get_data(as_text=True)
+
+        assert "yana_notes_cache_hits_total 1" in metrics
+        assert "yana_notes_cache_misses_total 1" in metrics
+
+
+def test_notes_list_cache_sees_writes_of_other_instances(test_app, user_client):
+    with user_client as client:
+        _create_note(client, "note")
+        first = client.get('/notes/')
+        # write of another instance, which doesn't reach this instance's cache
+        db.session.execute(update(User).where(User.username == "admin").values(notes_version=User.notes_version + 1))
+        db.session.commit()
+
+        second = client.get('/notes/')
+
+    assert second.headers['ETag'] != first.headers['ETag']
+    assert test_app.extensions["notes_response_cache"].misses == 2
+
+
+def test_notes_response_cache_evicts_least_recently_used_above_max_bytes():
+    user_id = uuid.uuid4()
+    cache = NotesResponseCache(max_bytes=300)
+    keys = [cache.key(user_id, 1, f"variant-{i}") for i in range(3)]
+    for key in keys[:2]:
+        cache.put(key, CachedResponse(etag="etag", body=b"x" * 80))
+    cache.get(keys[0])
+
+    cache.put(keys[2], CachedResponse(etag="etag", body=b"x" * 80))
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None and cache.get(keys[2]) is not None
+    assert cache.evictions == 1
+    assert cache.size_bytes <= 300
+
+
+def test_notes_response_cache_expires_responses_after_ttl():
+    clock = FakeClock()
+    cache = NotesResponseCache(ttl_seconds=10, clock=clock)
+    key = cache.key(uuid.uuid4(), 1, "")
+    cache.put(key, CachedResponse(etag="etag", body=b"[]"))
+
+    clock.now = 9
+    assert cache.get(key) is not None
+    clock.now = 10
+    assert cache.get(key) is None
+    assert cache.size_bytes == 0
+
+
+def test_notes_response_cache_shares_responses_through_shared_backend():
+    shared = LocalSharedCache()
+    first, second = NotesResponseCache(shared=shared), NotesResponseCache(shared=shared)
+    key = NotesResponseCache.key(uuid.uuid4(), 1, "")
+    first.put(key, CachedResponse(etag="etag", body=b"[]"))
+
+    assert second.get(key) == CachedResponse(etag="etag", body=b"[]")
+    assert second.get(NotesResponseCache.key(uuid.uuid4(), 1, "")) is None
@@ -1,7 +1,14 @@
+import base64
 import json
 import time
 import uuid
 
+from sqlalchemy import delete
+
+from opennote.common.data_time_utils import timestamp_in_seconds
+from opennote.database import db
+from opennote.db_model import User
+
 
 def test_notes_get_require_auth(test_app_with_auth_filter):
     with test_app_with_auth_filter.test_client() as client:
@@ -27,8 +34,8 @@ def test_notes_delete_require_auth(test_app_with_auth_filter):
         assert response.status_code == 403
 
 
-def test_notes_get_returns_empty_list_when_no_notes_created(test_app):
-    with test_app.test_client() as client:
+def test_notes_get_returns_empty_list_when_no_notes_created(user_client):
+    with user_client as client:
         response = client.get('/notes/')
         assert response.status_code == 200
         data = json.loads(response.data)
@@ -36,8 +43,8 @@ def test_notes_get_returns_empty_list_when_no_notes_created(test_app):
         assert len(data) == 0
 
 
-def test_notes_post_allows_adding_new_notes(test_app):
-    with test_app.test_client() as client:
+def test_notes_post_allows_adding_new_notes(user_client):
+    with user_client as client:
         post_response = client.post('/notes/', json={"name": "name1", "content": "content1"})
         assert post_response.status_code == 201
         post_data = json.loads(post_response.data)
@@ -53,8 +60,8 @@ def test_notes_post_allows_adding_new_notes(test_app):
         assert get_data[0].get('content') == "content1"
 
 
-def test_notes_post_fails_on_adding_note_with_existing_name(test_app):
-    with test_app.test_client() as client:
+def test_notes_post_fails_on_adding_note_with_existing_name(user_client):
+    with user_client as client:
         post_response = client.post('/notes/', json={"name": "name1", "content": "content1"})
         assert post_response.status_code == 201
         post_data = json.loads(post_response.data)
@@ -67,8 +74,8 @@ def test_notes_post_fails_on_adding_note_with_existing_name(test_app):
         assert post_data.get('message') is None
 
 
-def test_notes_put_updates_note(test_app):
-    with test_app.test_client() as client:
+def test_notes_put_updates_note(user_client):
+    with user_client as client:
         post_response = client.post('/notes/', json={"name": "name1", "content": "content1"})
         assert post_response.status_code == 201
         post_data = json.loads(post_response.data)
@@ -93,8 +100,8 @@ def test_notes_put_updates_note(test_app):
         assert get_data[0].get('content') == "updatedContent"
 
 
-def test_notes_put_fails_on_attempt_to_add_not_existing_entity(test_app):
-    with test_app.test_client() as client:
+def test_notes_put_fails_on_attempt_to_add_not_existing_entity(user_client):
+    with user_client as client:
         note_id = uuid.uuid1()
         put_response = client.put('/notes/' + str(note_id),
                                   json={"id": note_id, "name": "updatedName", "content": "updatedContent"})
@@ -104,8 +111,8 @@ def test_notes_put_fails_on_attempt_to_add_not_existing_entity(test_app):
         assert put_data.get('message') is None
 
 
-def test_notes_get_shows_multiple_notes(test_app):
-    with test_app.test_client() as client:
+def test_notes_get_shows_multiple_notes(user_client):
+    with user_client as client:
         post_response1 = client.post('/notes/', json={"name": "name1", "content": "content1"})
         assert post_response1.status_code == 201
         post_response2 = client.post('/notes/', json={"name": "name2", "content": "content2"})
@@ -116,14 +123,16 @@ def test_notes_get_shows_multiple_notes(test_app):
         get_data = json.loads(get_response.data)
         assert isinstance(get_data, list)
         assert len(get_data) == 2
+        # notes created within the same second have no defined order
+        get_data = sorted(get_data, key=lambda note: note.get('name'))
         assert get_data[0].get('name') == "name1"
         assert get_data[0].get('content') == "content1"
         assert get_data[1].get('name') == "name2"
         assert get_data[1].get('content') == "content2"
 
 
-def test_post_note_fails_on_too_long_name(test_app):
-    with test_app.test_client() as client:
+def test_post_note_fails_on_too_long_name(user_client):
+    with user_client as client:
         post_response = client.post('/notes/', json={"name": "a" * 51, "content": "content1"})
         assert post_response.status_code == 400
         post_data = json.loads(post_response.data)
@@ -131,8 +140,28 @@ def test_post_note_fails_on_too_long_name(test_app):
         assert post_data.get('message') == "name: String should have at most 50 characters"
 
 
-def test_put_note_fails_on_too_long_name(test_app):
-    with test_app.test_client() as client:
+def test_post_note_fails_on_null_content(user_client):
+    with user_client as client:
+        post_response = client.post('/notes/', json={"name": "name1", "content": None})
+        assert post_response.status_code == 400
+        assert json.loads(post_response.data).get('code') == "VALIDATION_ERROR"
+
+
+def test_post_note_fails_on_malformed_body(user_client):
+    with user_client as client:
+        truncated_response = client.post('/notes/', data='{"name": "name1"', content_type='application/json')
+        assert truncated_response.status_code == 400
+        assert json.loads(truncated_response.data).get('code') == "VALIDATION_ERROR"
+
+        list_response = client.post('/notes/', json=[{"name": "name1", "content": "content1"}])
+        assert list_response.status_code == 400
+        assert json.loads(list_response.data).get('code') == "VALIDATION_ERROR"
+
+        assert client.post('/notes/', data='{}', content_type='text/plain').status_code == 415
+
+
+def test_put_note_fails_on_too_long_name(user_client):
+    with user_client as client:
         post_response = client.post('/notes/', json={"name": "name1", "content": "content1"})
         assert post_response.status_code == 201
         note_id = json.loads(post_response.data).get('id')
@@ -144,8 +173,8 @@ def test_put_note_fails_on_too_long_name(test_app):
         assert put_data.get('message') == "name: String should have at most 50 characters"
 
 
-def test_put_note_fails_on_different_id_then_in_url(test_app):
-    with test_app.test_client() as client:
+def test_put_note_fails_on_different_id_then_in_url(user_client):
+    with user_client as client:
         post_response = client.post('/notes/', json={"name": "name1", "content": "content1"})
         assert post_response.status_code == 201
         note_id = json.loads(post_response.data).get('id')
@@ -157,8 +186,8 @@ def test_put_note_fails_on_different_id_then_in_url(test_app):
         assert put_data.get('message') == 'id: should match url id'
 
 
-def test_notes_post_for_existing_note_name(test_app):
-    with test_app.test_client() as client:
+def test_notes_post_for_existing_note_name(user_client):
+    with user_client as client:
         post_response = client.post('/notes/', json={"name": "name1", "content": "content1"})
         assert post_response.status_code == 201
         post_response = client.post('/notes/', json={"name": "name1", "content": "content2"})
@@ -168,8 +197,8 @@ def test_notes_post_for_existing_note_name(test_app):
         assert post_data.get('message') is None
 
 
-def test_notes_get_orders_by_last_modification_time(test_app):
-    with test_app.test_client() as client:
+def test_notes_get_orders_by_last_modification_time(user_client):
+    with user_client as client:
         post_response1 = client.post('/notes/', json={"name": "name1", "content": "content1"})
         assert post_response1.status_code == 201
         time.sleep(1)  # for stability withSQLite - it has precision of seconds standard data time
@@ -192,3 +221,421 @@ def test_notes_get_orders_by_last_modification_time(test_app):
         assert len(get_data) == 2
         assert get_data[0].get('name') == "name1"
         assert get_data[1].get('name') == "name2"
+
+
+def test_notes_get_with_limit_returns_pages_until_all_notes_listed(user_client):
+    with user_client as client:
+        for i in range(5):
+            post_response = client.post('/notes/', json={"name": f"name{i}", "content": f"content{i}"})
+            assert post_response.status_code == 201
+
+        names = []
+        cursor = None
+        for expected_size in [2, 2, 1]:
+            query = {"limit": 2} | ({"after": cursor} if cursor else {})
+            get_response = client.get('/notes/', query_string=query)
+            assert get_response.status_code == 200
+            get_data = json.loads(get_response.data)
+            assert len(get_data['items']) == expected_size
+            names += [note['name'] for note in get_data['items']]
+            cursor = get_data['next_cursor']
+
+        assert cursor is None
+        assert sorted(names) == [f"name{i}" for i in range(5)]
+
+
+def test_notes_get_with_limit_returns_no_cursor_when_single_page(user_client):
+    with user_client as client:
+        post_response = client.post('/notes/', json={"name": "name1", "content": "content1"})
+        assert post_response.status_code == 201
+
+        get_response = client.get('/notes/?limit=2')
+        assert get_response.status_code == 200
+        get_data = json.loads(get_response.data)
+        assert [note['name'] for note in get_data['items']] == ["name1"]
+        assert get_data['next_cursor'] is None
+
+
+def test_notes_get_fails_on_invalid_limit(user_client):
+    with user_client as client:
+        get_response = client.get('/notes/?limit=0')
+        assert get_response.status_code == 400
+        assert json.loads(get_response.data).get('code') == "VALIDATION_ERROR"
+
+
+def test_notes_get_fails_on_invalid_cursor(user_client):
+    with user_client as client:
+        get_response = client.get('/notes/?limit=2&after=abc')
+        assert get_response.status_code == 400
+        get_data = json.loads(get_response.data)
+        assert get_data.get('code') == "VALIDATION_ERROR"
+        assert get_data.get('message') == "after: invalid cursor"
+
+
+def test_notes_get_streamed_returns_same_notes_as_list(user_client, monkeypatch):
+    monkeypatch.setattr('opennote.notes.notes.STREAM_BATCH_SIZE', 2)
+    with user_client as client:
+        for i in range(5):
+            post_response = client.post('/notes/', json={"name": f"name{i}", "content": f"content{i}"})
+            assert post_response.status_code == 201
+
+        get_response = client.get('/notes/')
+        stream_response = client.get('/notes/?stream=true')
+        assert stream_response.status_code == 200
+        assert stream_response.is_streamed
+        assert json.loads(stream_response.data) == json.loads(get_response.data)
+
+
+def test_notes_get_streamed_returns_empty_list_when_no_notes_created(user_client):
+    with user_client as client:
+        stream_response = client.get('/notes/?stream=true')
+        assert stream_response.status_code == 200
+        assert json.loads(stream_response.data) == []
+
+
+def test_notes_search_returns_matching_notes_best_first(user_client):
+    with user_client as client:
+        notes = [
+            {"name": "shopping", "content": "milk, bread and apples"},
+            {"name": "apples", "content": "apples apples apples"},
+            {"name": "todo", "content": "call mom"},
+        ]
+        for note in notes:
+            assert client.post('/notes/', json=note).status_code == 201
+
+        search_response = client.get('/notes/search?q=apples')
+        assert search_response.status_code == 200
+        search_data = json.loads(search_response.data)
+        assert [note['name'] for note in search_data['items']] == ["apples", "shopping"]
+        assert search_data['next_offset'] is None
+
+        search_response = client.get('/notes/search', query_string={"q": "bread apples"})
+        assert [note['name'] for note in json.loads(search_response.data)['items']] == ["shopping"]
+
+
+def test_notes_search_is_paginated(user_client):
+    with user_client as client:
+        for i in range(3):
+            assert client.post('/notes/', json={"name": f"name{i}", "content": "common word"}).status_code == 201
+
+        first_page = json.loads(client.get('/notes/search?q=common&limit=2').data)
+        assert len(first_page['items']) == 2
+        assert first_page['next_offset'] == 2
+
+        second_page = json.loads(client.get(f"/notes/search?q=common&limit=2&offset={first_page['next_offset']}").data)
+        assert len(second_page['items']) == 1
+        assert second_page['next_offset'] is None
+        names = [note['name'] for note in first_page['items'] + second_page['items']]
+        assert sorted(names) == ["name0", "name1", "name2"]
+
+
+def test_notes_search_follows_updates_and_deletes(user_client):
+    with user_client as client:
+        note_id = json.loads(client.post('/notes/', json={"name": "name1", "content": "old"}).data)['id']
+        client.put('/notes/' + note_id, json={"id": note_id, "name": "name1", "content": "new"})
+
+        assert json.loads(client.get('/notes/search?q=old').data)['items'] == []
+        assert len(json.loads(client.get('/notes/search?q=new').data)['items']) == 1
+
+        client.delete('/notes/' + note_id)
+        assert json.loads(client.get('/notes/search?q=new').data)['items'] == []
+
+
+def test_notes_search_treats_query_syntax_literally(user_client):
+    with user_client as client:
+        assert client.post('/notes/', json={"name": "name1", "content": 'say "hi" AND bye'}).status_code == 201
+
+        search_response = client.get('/notes/search', query_string={"q": '"hi" AND ('})
+        assert search_response.status_code == 200
+        assert [note['name'] for note in json.loads(search_response.data)['items']] == ["name1"]
+
+        search_response = client.get('/notes/search', query_string={"q": 'hi OR hello'})
+        assert search_response.status_code == 200
+        assert json.loads(search_response.data)['items'] == []
+
+
+def test_notes_search_fails_on_empty_query(user_client):
+    with user_client as client:
+        search_response = client.get('/notes/search?q=')
+        assert search_response.status_code == 400
+        assert json.loads(search_response.data).get('code') == "VALIDATION_ERROR"
+
+
+def test_notes_get_returns_not_modified_until_notes_change(user_client):
+    with user_client as client:
+        post_response = client.post('/notes/', json={"name": "name1", "content": "content1"})
+        note_id = json.loads(post_response.data)['id']
+        get_response = client.get('/notes/')
+        etag = get_response.headers['ETag']
+
+        not_modified_response = client.get('/notes/', headers={"If-None-Match": etag})
+        assert not_modified_response.status_code == 304
+        assert not_modified_response.headers['ETag'] == etag
+        assert not_modified_response.data == b''
+
+        client.put('/notes/' + note_id, json={"id": note_id, "name": "name1", "content": "content2"})
+        modified_response = client.get('/notes/', headers={"If-None-Match": etag})
+        assert modified_response.status_code == 200
+        assert modified_response.headers['ETag'] != etag
+        assert json.loads(modified_response.data)[0]['content'] == "content2"
+
+
+def test_notes_get_etag_changes_when_note_is_replaced_within_second(user_client):
+    with user_client as client:
+        client.post('/notes/', json={"name": "name1", "content": "content"})
+        deleted_id = json.loads(client.post('/notes/', json={"name": "name2", "content": "content"}).data)['id']
+        etag = client.get('/notes/').headers['ETag']
+
+        # count, last update time and versions of listed notes stay the same
+        client.delete('/notes/' + deleted_id)
+        client.post('/notes/', json={"name": "name3", "content": "content"})
+
+        modified_response = client.get('/notes/', headers={"If-None-Match": etag})
+        assert modified_response.status_code == 200
+        assert modified_response.headers['ETag'] != etag
+
+
+def test_notes_get_etag_depends_on_query(user_client):
+    with user_client as client:
+        client.post('/notes/', json={"name": "name1", "content": "content1"})
+        etag = client.get('/notes/').headers['ETag']
+
+        page_response = client.get('/notes/?limit=1', headers={"If-None-Match": etag})
+        assert page_response.status_code == 200
+        assert page_response.headers['ETag'] != etag
+
+
+def test_note_get_returns_not_modified_for_matching_etag(user_client):
+    with user_client as client:
+        post_response = client.post('/notes/', json={"name": "name1", "content": "content1"})
+        note_id = json.loads(post_response.data)['id']
+
+        get_response = client.get('/notes/' + note_id)
+        assert get_response.status_code == 200
+        assert json.loads(get_response.data)['name'] == "name1"
+        assert get_response.headers['ETag'] == post_response.headers['ETag']
+
+        not_modified_response = client.get('/notes/' + note_id, headers={"If-None-Match": get_response.headers['ETag']})
+        assert not_modified_response.status_code == 304
+
+
+def test_note_get_fails_on_not_existing_note(user_client):
+    with user_client as client:
+        get_response = client.get('/notes/' + str(uuid.uuid4()))
+        assert get_response.status_code == 404
+        assert json.loads(get_response.data).get('code') == "NOTE_NOT_FOUND"
+
+
+def test_notes_put_with_if_match_fails_when_note_was_modified(user_client):
+    with user_client as client:
+        post_response = client.post('/notes/', json={"name": "name1", "content": "content1"})
+        note_id = json.loads(post_response.data)['id']
+        etag = post_response.headers['ETag']
+
+        put_response = client.put('/notes/' + note_id, headers={"If-Match": etag},
+                                  json={"id": note_id, "name": "name1", "content": "content2"})
+        assert put_response.status_code == 200
+        assert put_response.headers['ETag'] != etag
+
+        stale_put_response = client.put('/notes/' + note_id, headers={"If-Match": etag},
+                                        json={"id": note_id, "name": "name1", "content": "content3"})
+        assert stale_put_response.status_code == 412
+        assert json.loads(stale_put_response.data).get('code') == "PRECONDITION_FAILED"
+
+        get_data = json.loads(client.get('/notes/' + note_id).data)
+        assert get_data['content'] == "content2"
+
+
+def test_notes_changes_returns_only_changes_since_token(user_client):
+    with user_client as client:
+        unchanged_id = json.loads(client.post('/notes/', json={"name": "unchanged", "content": "c"}).data)['id']
+        updated_id = json.loads(client.post('/notes/', json={"name": "updated", "content": "c"}).data)['id']
+        deleted_id = json.loads(client.post('/notes/', json={"name": "deleted", "content": "c"}).data)['id']
+        initial_sync = json.loads(client.get('/notes/changes').data)
+        assert {note['id'] for note in initial_sync['notes']} == {unchanged_id, updated_id, deleted_id}
+        assert initial_sync['deleted'] == []
+
+        client.put('/notes/' + updated_id, json={"id": updated_id, "name": "updated", "content": "new"})
+        client.delete('/notes/' + deleted_id)
+        created_id = json.loads(client.post('/notes/', json={"name": "created", "content": "c"}).data)['id']
+
+        changes_response = client.get('/notes/changes', query_string={"since": initial_sync['sync_token']})
+        assert changes_response.status_code == 200
+        changes = json.loads(changes_response.data)
+        assert {note['id'] for note in changes['notes']} == {updated_id, created_id}
+        assert changes['deleted'] == [deleted_id]
+        assert changes['sync_token'] != initial_sync['sync_token']
+
+
+def test_notes_changes_token_can_be_used_on_empty_database(user_client):
+    with user_client as client:
+        initial_sync = json.loads(client.get('/notes/changes').data)
+        assert initial_sync['notes'] == []
+
+        client.post('/notes/', json={"name": "name1", "content": "c"})
+        changes = json.loads(client.get('/notes/changes', query_string={"since": initial_sync['sync_token']}).data)
+        assert [note['name'] for note in changes['notes']] == ["name1"]
+
+
+def test_notes_changes_returns_all_notes_for_timestamp_token(user_client):
+    with user_client as client:
+        client.post('/notes/', json={"name": "name1", "content": "c"})
+        timestamp_token = base64.urlsafe_b64encode(b"2024-01-01T00:00:00").decode("utf-8")
+
+        changes = json.loads(client.get('/notes/changes', query_string={"since": timestamp_token}).data)
+
+        assert [note['name'] for note in changes['notes']] == ["name1"]
+
+
+def test_notes_changes_requires_resync_for_token_older_than_tombstone_retention(user_client, monkeypatch):
+    with user_client as client:
+        sync_token = json.loads(client.get('/notes/changes').data)['sync_token']
+        later = timestamp_in_seconds() + 31 * 24 * 60 * 60
+        monkeypatch.setattr("opennote.notes.notes.timestamp_in_seconds", lambda: later)
+
+        changes_response = client.get('/notes/changes', query_string={"since": sync_token})
+
+        assert changes_response.status_code == 410
+        assert json.loads(changes_response.data).get('code') == "RESYNC_REQUIRED"
+        assert client.get('/notes/changes').status_code == 200
+
+
+def test_notes_changes_requires_resync_for_token_without_sync_time(user_client):
+    with user_client as client:
+        version_token = base64.urlsafe_b64encode(b"v1").decode("utf-8")
+
+        assert client.get('/notes/changes', query_string={"since": version_token}).status_code == 410
+
+
+def test_notes_changes_fails_on_invalid_token(user_client):
+    with user_client as client:
+        changes_response = client.get('/notes/changes?since=abc')
+        assert changes_response.status_code == 400
+        assert json.loads(changes_response.data).get('message') == "since: invalid sync token"
+
+
+def test_notes_batch_applies_all_operations(user_client):
+    with user_client as client:
+        updated_id = json.loads(client.post('/notes/', json={"name": "updated", "content": "c"}).data)['id']
+        deleted_id = json.loads(client.post('/notes/', json={"name": "deleted", "content": "c"}).data)['id']
+
+        batch_response = client.post('/notes/batch', json={"operations": [
+            {"op": "create", "note": {"name": "created1", "content": "c1"}},
+            {"op": "update", "note": {"id": updated_id, "name": "renamed", "content": "new"}},
+            {"op": "delete", "id": deleted_id},
+            {"op": "create", "note": {"name": "deleted", "content": "c2"}},
+        ]})
+        assert batch_response.status_code == 200
+        results = json.loads(batch_response.data)['results']
+        assert [result['status'] for result in results] == ["CREATED", "UPDATED", "DELETED", "CREATED"]
+        assert results[0]['note']['name'] == "created1"
+        assert results[1]['id'] == updated_id
+
+        get_data = json.loads(client.get('/notes/').data)
+        assert sorted((note['name'], note['content']) for note in get_data) == [
+            ("created1", "c1"), ("deleted", "c2"), ("renamed", "new")]
+        assert json.loads(client.get('/notes/changes').data)['deleted'] == [deleted_id]
+
+
+def test_notes_batch_applies_nothing_when_any_operation_fails(user_client):
+    with user_client as client:
+        client.post('/notes/', json={"name": "existing", "content": "c"})
+        kept_id = json.loads(client.post('/notes/', json={"name": "kept", "content": "c"}).data)['id']
+
+        batch_response = client.post('/notes/batch', json={"operations": [
+            {"op": "create", "note": {"name": "new", "content": "c"}},
+            {"op": "create", "note": {"name": "existing", "content": "c"}},
+            {"op": "update", "note": {"id": str(uuid.uuid4()), "name": "other", "content": "c"}},
+            {"op": "create", "note": {"name": "new", "content": "c"}},
+            {"op": "delete", "id": kept_id},
+        ]})
+        assert batch_response.status_code == 400
+        results = json.loads(batch_response.data)['results']
+        assert [(result['status'], result['code']) for result in results] == [
+            ("NOT_APPLIED", None),
+            ("FAILED", "NOTE_ALREADY_EXISTS"),
+            ("FAILED", "NOTE_NOT_FOUND"),
+            ("FAILED", "NOTE_ALREADY_EXISTS"),
+            ("NOT_APPLIED", None),
+        ]
+        assert sorted(note['name'] for note in json.loads(client.get('/notes/').data)) == ["existing", "kept"]
+
+
+def test_notes_batch_checks_names_after_locking_user_notes(user_client, monkeypatch):
+    statements = []
+    original_execute = db.session.execute
+
+    def recording_execute(statement, *args, **kwargs):
+        statements.append(str(statement).split()[0])
+        return original_execute(statement, *args, **kwargs)
+
+    with user_client as client:
+        monkeypatch.setattr(db.session, "execute", recording_execute)
+        batch_response = client.post('/notes/batch', json={"operations": [
+            {"op": "create", "note": {"name": "new", "content": "c"}}]})
+
+    assert batch_response.status_code == 200
+    # version bump (UPDATE of user row) comes before name check (SELECT)
+    assert statements[:2] == ["UPDATE", "SELECT"]
+
+
+def test_notes_batch_validates_operations(user_client):
+    with user_client as client:
+        batch_response = client.post('/notes/batch', json={"operations": [
+            {"op": "create", "note": {"name": "a" * 51, "content": "c"}},
+        ]})
+        assert batch_response.status_code == 400
+        batch_data = json.loads(batch_response.data)
+        assert batch_data.get('code') == "VALIDATION_ERROR"
+        assert batch_data.get('message') == "operations, 0, create, note, name: String should have at most 50 characters"
+
+
+def test_notes_batch_update_changes_etag(user_client):
+    with user_client as client:
+        post_response = client.post('/notes/', json={"name": "name1", "content": "c"})
+        note_id = json.loads(post_response.data)['id']
+
+        client.post('/notes/batch', json={"operations": [
+            {"op": "update", "note": {"id": note_id, "name": "name1", "content": "new"}}]})
+
+        get_response = client.get('/notes/' + note_id, headers={"If-None-Match": post_response.headers['ETag']})
+        assert get_response.status_code == 200
+        assert json.loads(get_response.data)['content'] == "new"
+
+
+def test_notes_post_fails_when_user_was_deleted(test_app, user_client):
+    with test_app.app_context():
+        db.session.execute(delete(User).where(User.username == "admin"))
+        db.session.commit()
+
+    post_response = user_client.post('/notes/', json={"name": "name1", "content": "c"})
+
+    assert post_response.status_code == 403
+    assert json.loads(post_response.data).get('code') == "USER_NOT_FOUND"
+
+
+def test_notes_are_visible_only_to_their_owner(test_app, user_client, login):
+    # clients aren't entered, entered one would keep its app context (and jwt in flask.g) for requests of the other
+    other_client = test_app.test_client()
+    other_client.post('/users/', json={"username": "other user", "password": "other password"})
+    login(other_client, "other user", "other password")
+
+    note_id = json.loads(user_client.post('/notes/', json={"name": "name1", "content": "admin content"}).data)['id']
+    other_post_response = other_client.post('/notes/', json={"name": "name1", "content": "other content"})
+    assert other_post_response.status_code == 201
+    other_note_id = json.loads(other_post_response.data)['id']
+
+    assert [note['id'] for note in json.loads(user_client.get('/notes/').data)] == [note_id]
+    assert [note['id'] for note in json.loads(other_client.get('/notes/').data)] == [other_note_id]
+    assert [note['id'] for note in json.loads(other_client.get('/notes/search?q=content').data)['items']] == [
+        other_note_id]
+    assert other_client.get('/notes/' + note_id).status_code == 404
+    assert other_client.put('/notes/' + note_id,
+                            json={"id": note_id, "name": "stolen", "content": "c"}).status_code == 404
+    assert other_client.delete('/notes/' + note_id).status_code == 404
+    assert other_client.post('/notes/batch', json={"operations": [
+        {"op": "delete", "id": note_id}]}).status_code == 400
+
+    other_client.delete('/notes/' + other_note_id)
+    assert json.loads(user_client.get('/notes/changes').data)['deleted'] == []
+    assert json.loads(user_client.get('/notes/' + note_id).data)['content'] == "admin content"
@@ -0,0 +1,53 @@
+from opennote.auth.passwords import PasswordHashing, PBKDF2_SHA256, SCRYPT, legacy_hash_password, verify_password
+
+
+def test_hash_contains_algorithm_and_work_factor():
+    hashing = PasswordHashing(algorithm=PBKDF2_SHA256, work_factor=1000, max_workers=1)
+
+    stored = hashing.hash("password", "salt")
+
+    assert stored.startswith("pbkdf2_sha256$1000$")
+    assert hashing.verify("password", "salt", stored)
+    assert not hashing.verify("wrong password", "salt", stored)
+    assert not hashing.needs_rehash(stored)
+
+
+def test_scrypt_hash_can_be_verified():
+    hashing = PasswordHashing(algorithm=SCRYPT, work_factor=2 ** 4, max_workers=1)
+
+    stored = hashing.hash("password", "salt")
+
+    assert stored.startswith("scrypt$16$")
+    assert verify_password("password", "salt", stored)
+    assert not verify_password("password", "other salt", stored)
+
+
+def test_legacy_and_weaker_hashes_need_rehash():
+    hashing = PasswordHashing(algorithm=PBKDF2_SHA256, work_factor=1000, max_workers=1)
+    legacy = legacy_hash_password("password", "salt")
+    weaker = PasswordHashing(algorithm=PBKDF2_SHA256, work_factor=10, max_workers=1).hash("password", "salt")
+
+    assert hashing.verify("password", "salt", legacy)
+    assert hashing.verify("password", "salt", weaker)
+    assert hashing.needs_rehash(legacy)
+    assert hashing.needs_rehash(weaker)
+
+
+def test_password_hashing_of_apps_shares_thread_pool():
+    first = PasswordHashing(algorithm=PBKDF2_SHA256, work_factor=1000, max_workers=2)
+    second = PasswordHashing(algorithm=SCRYPT, work_factor=2 ** 4, max_workers=2)
+
+    assert first._executor is second._executor
+
+
+def test_login_of_missing_user_verifies_password_against_current_format(test_app, monkeypatch):
+    verified = []
+    monkeypatch.setattr("opennote.auth.passwords.verify_password",
+                        lambda password, salt, stored: verified.append(stored) or False)
+
+    with test_app.test_client() as client:
+        response = client.post('/access-token/login', json={"username": "missing", "password": "password"})
+
+    assert response.status_code == 403
+    assert len(verified) == 1
+    assert not test_app.extensions["password_hashing"].needs_rehash(verified[0])
@@ -0,0 +1,93 @@
+import json
+import uuid
+
+import pytest
+
+from opennote.app import create_app
+from opennote.database import db
+from opennote.db_model import Note
+from opennote.metrics.query_budget import QueryBudgetExceeded
+from opennote.test_config import AppTestConfig
+
+
+def _create_note(client, name="note") -> dict:
+    return json.loads(client.post('/notes/', json={"name": name, "content": "content"}).data)
+
+
+def test_query_budget_fails_when_exceeded(test_app, query_budget):
+    with test_app.app_context():
+        with pytest.raises(QueryBudgetExceeded, match="2 statements executed, budget is 1"):
+            with query_budget(1):
+                db.session.get(Note, uuid.uuid4())
+                db.session.query(Note).filter_by(name="a").all()
+
+
+def test_query_budget_fails_on_repeated_statement(test_app, query_budget):
+    with test_app.app_context():
+        with pytest.raises(QueryBudgetExceeded, match="repeated statements"):
+            with query_budget(10):
+                db.session.query(Note).filter_by(name="a").all()
+                db.session.query(Note).filter_by(name="b").all()
+
+
+def test_notes_endpoints_query_budget(user_client, query_budget):
+    with user_client as client:
+        # writes also increase user's notes version
+        with query_budget(2):
+            note = _create_note(client)
+        with query_budget(2):
+            client.get('/notes/')
+        with query_budget(2):
+            client.get('/notes/?limit=10')
+        with query_budget(1):
+            client.get(f"/notes/{note['id']}")
+        with query_budget(1):
+            client.get('/notes/search?q=content')
+        with query_budget(2):
+            client.get('/notes/changes')
+        with query_budget(3):
+            client.put(f"/notes/{note['id']}", json={**note, "content": "changed"})
+        with query_budget(4):
+            client.delete(f"/notes/{note['id']}")
+
+
+def test_notes_batch_query_budget_does_not_grow_with_operations(user_client, query_budget):
+    with user_client as client:
+        notes = [_create_note(client, f"note {i}") for i in range(10)]
+        operations = [{"op": "create", "note": {"name": f"new {i}", "content": "c"}} for i in range(10)]
+        operations += [{"op": "update", "note": {**note, "content": "changed"}} for note in notes[:5]]
+        operations += [{"op": "delete", "id": note['id']} for note in notes[5:]]
+
+        with query_budget(7):
+            response = client.post('/notes/batch', json={"operations": operations})
+        assert response.status_code == 200
+
+
+def test_auth_endpoints_query_budget(test_app, query_budget):
+    with test_app.test_client() as client:
+        with query_budget(1):
+            client.post('/users/', json={"username": "test name", "password": "test password"})
+        with query_budget(3):
+            client.post('/access-token/login', json={"username": "test name", "password": "test password"})
+
+
+def test_query_warnings_log_repeated_statements(monkeypatch, caplog):
+    monkeypatch.setenv("QUERY_WARNINGS", "true")
+    app = create_app(AppTestConfig())
+
+    @app.get('/repeating')
+    def repeating():
+        db.session.query(Note).filter_by(name="a").all()
+        db.session.query(Note).filter_by(name="b").all()
+        return "", 200
+
+    with app.test_client() as client:
+        client.get('/repeating')
+
+    assert "GET /repeating executed 2 times the same statement" in caplog.text
+
+
+def test_token_refresh_query_budget(user_client, query_budget):
+    # rotation is one update returning family and one insert
+    with query_budget(2):
+        assert user_client.post('/access-token/refresh').status_code == 201
@@ -0,0 +1,134 @@
+import uuid
+
+from opennote.auth.auth import create_salt
+from opennote.auth.user_cache import LocalSharedCache, UserCache
+from opennote.database import db
+from opennote.db_model import User
+
+ADMIN_ID = uuid.UUID("a155d430-fac1-489c-8d2b-634808e04bd6")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _add_user(username: str) -> uuid.UUID:
+    id = uuid.uuid4()
+    db.session.add(User(id=id, username=username, password_salt=create_salt(), password="hash"))
+    db.session.commit()
+    return id
+
+
+def test_user_cache_serves_user_by_id_and_username_without_queries(test_app, query_budget):
+    cache = UserCache()
+    with test_app.app_context():
+        assert cache.by_username("admin").id == ADMIN_ID
+        with query_budget(0):
+            assert cache.by_username("admin").id == ADMIN_ID
+            assert cache.by_id(ADMIN_ID).username == "admin"
+
+
+def test_user_cache_does_not_keep_missing_users(test_app):
+    cache = UserCache()
+    with test_app.app_context():
+        assert cache.by_username("new user") is None
+        id = _add_user("new user")
+        assert cache.by_username("new user").id == id
+
+
+def test_user_cache_evicts_least_recently_used_user(test_app, query_budget):
+    cache = UserCache(max_size=4)
+    with test_app.app_context():
+        ids = [_add_user(f"user {i}") for i in range(3)]
+        cache.by_id(ids[0])
+        cache.by_id(ids[1])
+        cache.by_id(ids[0])
+        cache.by_id(ids[2])
+
+        assert len(cache) == 4
+        with query_budget(0):
+            cache.by_username("user 0")
+            cache.by_username("user 2")
+        with query_budget(1):
+            cache.by_username("user 1")
+
+
+def test_user_cache_expires_users_after_ttl(test_app, query_budget):
+    clock = FakeClock()
+    cache = UserCache(ttl_seconds=10, clock=clock)
+    with test_app.app_context():
+        cache.by_id(ADMIN_ID)
+        clock.now = 9
+        with query_budget(0):
+            cache.by_id(ADMIN_ID)
+        clock.now = 10
+        with query_budget(1):
+            cache.by_id(ADMIN_ID)
+
+
+def test_user_cache_is_invalidated_on_user_write(test_app):
+    with test_app.app_context():
+        cache = test_app.extensions["user_cache"]
+        assert cache.by_id(ADMIN_ID).username == "admin"
+
+        db.session.get(User, ADMIN_ID).username = "renamed"
+        assert cache.by_id(ADMIN_ID).username == "admin"
+        db.session.commit()
+
+        assert cache.by_id(ADMIN_ID).username == "renamed"
+        assert cache.by_username("admin") is None
+
+
+def test_user_cache_is_not_invalidated_on_rollback(test_app, query_budget):
+    with test_app.app_context():
+        cache = test_app.extensions["user_cache"]
+        cache.by_id(ADMIN_ID)
+        db.session.get(User, ADMIN_ID).username = "renamed"
+        db.session.flush()
+        db.session.rollback()
+
+        with query_budget(0):
+            assert cache.by_id(ADMIN_ID).username == "admin"
+
+
+def test_user_cache_does_not_keep_password(test_app):
+    shared = LocalSharedCache()
+    with test_app.app_context():
+        UserCache(shared=shared).by_id(ADMIN_ID)
+
+    assert "password" not in shared.get(f"user:id:{ADMIN_ID}")
+
+
+def test_user_cache_shares_users_and_invalidations_through_shared_backend(test_app, query_budget):
+    shared = LocalSharedCache()
+    first, second = UserCache(shared=shared), UserCache(shared=shared)
+    with test_app.app_context():
+        first.by_username("admin")
+        with query_budget(0):
+            assert second.by_id(ADMIN_ID).username == "admin"
+
+        first.invalidate(ADMIN_ID, "admin")
+        assert shared.get(f"user:id:{ADMIN_ID}") is None
+        assert shared.get("user:username:admin") is None
+
+
+def test_local_shared_cache_expires_values():
+    clock = FakeClock()
+    shared = LocalSharedCache(clock=clock)
+    shared.set("key", "value", ex=5)
+    assert shared.get("key") == "value"
+    clock.now = 5
+    assert shared.get("key") is None
+
+
+def test_whoami_and_login_read_user_from_cache(user_client, query_budget):
+    with user_client as client:
+        with query_budget(0):
+            assert client.get('/users/whoami').json == {"username": "admin"}
+        with query_budget(2):
+            # password hash is read by id and refresh token is written
+            assert client.post('/access-token/login', json={"username": "admin", "password": "admin"}).status_code == 201
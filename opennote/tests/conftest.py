@@ -1,8 +1,12 @@
 import os
+import sqlite3
 
 import pytest
+from sqlalchemy import make_url
 
+from opennote import database
 from opennote.app import create_app
+from opennote.metrics.query_budget import query_budget as query_budget_context
 from opennote.test_config import AppTestConfig
 
 
@@ -15,6 +19,38 @@ def setup():
     os.environ["ORIGINS"] = "*"
 
 
+@pytest.fixture(scope="session", autouse=True)
+def migrate_in_memory_database_once():
+    """
+    Migrations take most of create_app time. In memory SQLite database is migrated once per session, next apps get its
+    copy instead.
+    """
+    migrate_db = database.migrate_db
+    migrated = None
+
+    def migrate_or_copy(app):
+        nonlocal migrated
+        url = make_url(app.config["SQLALCHEMY_DATABASE_URI"])
+        if url.get_backend_name() != 'sqlite' or url.database not in (None, '', ':memory:'):
+            return migrate_db(app)
+        if migrated is None:
+            migrate_db(app)
+        with app.app_context():
+            connection = database.db.engine.raw_connection()
+            try:
+                if migrated is None:
+                    migrated = sqlite3.connect(':memory:', check_same_thread=False)
+                    connection.driver_connection.backup(migrated)
+                else:
+                    migrated.backup(connection.driver_connection)
+            finally:
+                connection.close()
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(database, "migrate_db", migrate_or_copy)
+        yield
+
+
 @pytest.fixture
 def test_app():
     app = create_app(AppTestConfig())
@@ -25,3 +61,26 @@ def test_app():
 def test_app_with_auth_filter():
     app = create_app(AppTestConfig(skip_auth=False))
     yield app
+
+
+@pytest.fixture
+def login():
+    """Logs given test client in, by default as admin user (created with starting data)"""
+    def login_client(client, username: str = "admin", password: str = "admin"):
+        response = client.post('/access-token/login', json={"username": username, "password": password})
+        assert response.status_code == 201
+        return client
+
+    return login_client
+
+
+@pytest.fixture
+def user_client(test_app, login):
+    """Test client logged in as admin user, not yet entered"""
+    return login(test_app.test_client())
+
+
+@pytest.fixture
+def query_budget():
+    """Context manager failing test when block exceeds given number of SQL statements or repeats one"""
+    return query_budget_context
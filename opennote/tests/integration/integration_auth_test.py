@@ -1,8 +1,10 @@
 import re
+from uuid import UUID, uuid4
 
 from opennote.auth.jwt import JWT
+from opennote.auth.passwords import legacy_hash_password
 from opennote.database import db
-from opennote.db_model import RefreshToken
+from opennote.db_model import RefreshToken, User
 
 
 def test_login_creates_refresh_token(test_app):
@@ -47,3 +49,90 @@ def test_preform_token_refresh_creates_new_refresh_token(test_app):
         assert active_token is not None
         assert deactivated_token is not None
         assert active_token.expire_at >= deactivated_token.expire_at
+
+
+def test_login_rehashes_legacy_password(test_app):
+    with test_app.app_context():
+        user = User(id=uuid4(), username="legacy", password_salt="salt", password=legacy_hash_password("test", "salt"))
+        db.session.add(user)
+        db.session.commit()
+
+    with test_app.test_client() as client:
+        response = client.post('/access-token/login', json={"username": "legacy", "password": "test"})
+        assert response.status_code == 201
+
+        user = db.session.query(User).filter_by(username="legacy").first()
+        assert user.password.startswith("pbkdf2_sha256$")
+
+        response = client.post('/access-token/login', json={"username": "legacy", "password": "test"})
+        assert response.status_code == 201
+
+
+def _refresh_tokens_of_admin(test_app) -> list[RefreshToken]:
+    with test_app.app_context():
+        return db.session.query(RefreshToken).filter_by(user_id=UUID("a155d430-fac1-489c-8d2b-634808e04bd6")).all()
+
+
+def test_token_refresh_keeps_family(test_app, login):
+    client = login(test_app.test_client())
+    login_jwt = JWT.from_string(client.get_cookie('Authorization').value.split(' ')[1])
+
+    assert client.post('/access-token/refresh').status_code == 201
+
+    refreshed_jwt = JWT.from_string(client.get_cookie('Authorization').value.split(' ')[1])
+    assert refreshed_jwt.family_id == login_jwt.refresh_token
+    assert {token.family_id for token in _refresh_tokens_of_admin(test_app)} == {login_jwt.refresh_token}
+
+
+def test_reuse_of_rotated_token_revokes_family(test_app, login):
+    client = login(test_app.test_client())
+    login_cookie = client.get_cookie('Authorization').value
+    assert client.post('/access-token/refresh').status_code == 201
+    refreshed_cookie = client.get_cookie('Authorization').value
+    other_session = login(test_app.test_client())
+
+    client.set_cookie('Authorization', login_cookie)
+    assert client.post('/access-token/refresh').status_code == 403
+
+    client.set_cookie('Authorization', refreshed_cookie)
+    assert client.post('/access-token/refresh').status_code == 403
+    assert other_session.post('/access-token/refresh').status_code == 201
+
+
+def test_logout_deactivates_family(test_app, login):
+    client = login(test_app.test_client())
+    assert client.post('/access-token/refresh').status_code == 201
+
+    assert client.post('/access-token/logout').status_code == 204
+
+    assert not any(token.active for token in _refresh_tokens_of_admin(test_app))
+
+
+def test_logout_everywhere_deactivates_all_user_tokens(test_app, login):
+    client = login(test_app.test_client())
+    other_session = login(test_app.test_client())
+
+    assert client.post('/access-token/logout-everywhere').status_code == 204
+
+    assert not any(token.active for token in _refresh_tokens_of_admin(test_app))
+    assert other_session.post('/access-token/refresh').status_code == 403
+
+
+def test_logout_fails_with_rotated_token(test_app, login):
+    client = login(test_app.test_client())
+    login_cookie = client.get_cookie('Authorization').value
+    assert client.post('/access-token/refresh').status_code == 201
+
+    client.set_cookie('Authorization', login_cookie)
+    assert client.post('/access-token/logout').status_code == 403
+    assert client.post('/access-token/logout-everywhere').status_code == 403
+
+    assert any(token.active for token in _refresh_tokens_of_admin(test_app))
+
+
+def test_logout_everywhere_fails_with_expired_refresh_token(test_app, login, monkeypatch):
+    client = login(test_app.test_client())
+    later = JWT.from_string(client.get_cookie('Authorization').value.split(' ')[1]).refresh_token_expire_at + 1
+    monkeypatch.setattr("opennote.auth.auth.timestamp_in_seconds", lambda: later)
+
+    assert client.post('/access-token/logout-everywhere').status_code == 403
@@ -0,0 +1,62 @@
+import pytest
+from sqlalchemy.exc import TimeoutError
+
+from opennote.app import create_app
+from opennote.database import db
+from opennote.test_config import AppTestConfig
+
+
+@pytest.fixture()
+def pooled_app(tmp_path, monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "1")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "0")
+    monkeypatch.setenv("DB_POOL_TIMEOUT", "0")
+    return create_app(AppTestConfig(test_database_url=f"sqlite:///{tmp_path / 'yana.db'}"))
+
+
+def test_pool_metrics_count_checkouts(pooled_app, login):
+    client = login(pooled_app.test_client())
+    before = client.get('/metrics/db-pool').json
+    client.get('/notes/')
+    after = client.get('/metrics/db-pool').json
+
+    assert after["pool_size"] == 1
+    assert after["checked_out"] == 0
+    assert after["checkouts"] > before["checkouts"]
+    assert after["timeouts"] == 0
+    assert after["connections_created"] >= 1
+
+
+def test_pool_metrics_count_timeouts(pooled_app):
+    with pooled_app.app_context():
+        with db.engine.connect():
+            with pytest.raises(TimeoutError):
+                db.engine.connect()
+
+    snapshot = pooled_app.test_client().get('/metrics/db-pool').json
+    assert snapshot["timeouts"] == 1
+
+
+def test_pool_metrics_are_null_for_in_memory_database():
+    app = create_app(AppTestConfig())
+    with app.test_client() as client:
+        assert set(client.get('/metrics/db-pool').json.values()) == {None}
+
+
+def test_pool_metrics_are_exposed_for_prometheus(pooled_app):
+    lines = pooled_app.test_client().get('/metrics').text.splitlines()
+
+    assert "# TYPE yana_db_pool_checkouts_total counter" in lines
+    assert "yana_db_pool_size 1" in lines
+    assert "yana_db_pool_checked_out 0" in lines
+
+
+def test_pool_metrics_are_kept_when_pool_is_recreated(pooled_app):
+    with pooled_app.app_context():
+        db.engine.connect().close()
+        before = db.engine.pool.metrics.checkouts
+        db.engine.dispose()
+        db.engine.connect().close()
+
+        assert db.engine.pool.metrics.checkouts == before + 1
+        assert db.engine.pool.metrics.connections_created == 2
@@ -0,0 +1,75 @@
+import shutil
+
+import pytest
+
+from opennote.app import create_app
+from opennote.database import READ_PRIMARY_COOKIE
+from opennote.test_config import AppTestConfig
+
+
+@pytest.fixture()
+def replicated_app(tmp_path):
+    primary = tmp_path / 'primary.db'
+    replica = tmp_path / 'replica.db'
+    create_app(AppTestConfig(test_database_url=f"sqlite:///{primary}"))
+    # replica stand-in is a copy of migrated primary, which never receives later writes (like a lagging replica)
+    shutil.copy(primary, replica)
+    return create_app(AppTestConfig(test_database_url=f"sqlite:///{primary}",
+                                    test_replica_database_url=f"sqlite:///{replica}"))
+
+
+def test_get_reads_from_replica(replicated_app, login):
+    writer = login(replicated_app.test_client())
+    reader = login(replicated_app.test_client())
+    # login wrote refresh token, so it would read from primary for a while
+    reader.delete_cookie(READ_PRIMARY_COOKIE)
+
+    response = writer.post('/notes/', json={"name": "note", "content": "content"})
+    assert response.status_code == 201
+
+    assert reader.get('/notes/').json == []
+    assert reader.get(f"/notes/{response.json['id']}").status_code == 404
+    assert reader.get('/notes/search?q=content').json["items"] == []
+
+
+def test_write_sets_read_primary_cookie(replicated_app, login):
+    client = login(replicated_app.test_client())
+    client.delete_cookie(READ_PRIMARY_COOKIE)
+
+    assert client.get('/notes/').headers.get('Set-Cookie') is None
+    response = client.post('/notes/', json={"name": "note", "content": "content"})
+
+    cookie = response.headers['Set-Cookie']
+    assert cookie.startswith(f"{READ_PRIMARY_COOKIE}=1;")
+    assert "Max-Age=10" in cookie
+
+
+def test_reads_own_writes_from_primary(replicated_app, login):
+    client = login(replicated_app.test_client())
+
+    created = client.post('/notes/', json={"name": "note", "content": "content"}).json
+    client.set_cookie(READ_PRIMARY_COOKIE, "1")
+
+    assert [note["id"] for note in client.get('/notes/').json] == [created["id"]]
+    assert client.get(f"/notes/{created['id']}").status_code == 200
+
+
+def test_writes_go_to_primary_after_reads_from_replica(replicated_app, login):
+    client = login(replicated_app.test_client())
+    created = client.post('/notes/', json={"name": "note", "content": "content"}).json
+
+    response = client.put(f"/notes/{created['id']}", json={**created, "content": "changed"})
+
+    assert response.status_code == 200
+
+
+def test_notes_lists_read_from_replica_are_not_cached(replicated_app, login):
+    writer = login(replicated_app.test_client())
+    reader = login(replicated_app.test_client())
+    reader.delete_cookie(READ_PRIMARY_COOKIE)
+
+    created = writer.post('/notes/', json={"name": "note", "content": "content"}).json
+    assert reader.get('/notes/').json == []
+
+    assert [note["id"] for note in writer.get('/notes/').json] == [created["id"]]
+    assert len(replicated_app.extensions["notes_response_cache"]) == 0
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from opennote.auth.refresh_token_gc import PurgeResult, RefreshTokenPurgeScheduler, purge_refresh_tokens
+from opennote.common.data_time_utils import timestamp_in_seconds
+from opennote.database import db
+from opennote.db_model import NoteTombstone, RefreshToken, TokenRevocation
+
+
+def add_tokens(expire_at: int, active: bool, count: int = 1) -> list[RefreshToken]:
+    tokens = [RefreshToken(user_id=uuid4(), expire_at=expire_at, active=active) for _ in range(count)]
+    db.session.add_all(tokens)
+    db.session.commit()
+    return tokens
+
+
+def test_purge_removes_expired_and_inactive_tokens_in_batches(test_app):
+    with test_app.app_context():
+        now = timestamp_in_seconds()
+        valid = add_tokens(expire_at=now + 100, active=True, count=2)
+        add_tokens(expire_at=now - 100, active=True, count=3)
+        add_tokens(expire_at=now + 100, active=False, count=2)
+
+        result = purge_refresh_tokens(batch_size=2)
+
+        assert result.removed == 5
+        assert result.seconds >= 0
+        remaining = db.session.query(RefreshToken).all()
+        assert {token.id for token in remaining} == {token.id for token in valid}
+
+
+def test_purge_removes_expired_token_revocations(test_app):
+    with test_app.app_context():
+        now = timestamp_in_seconds()
+        db.session.add_all([TokenRevocation(family_id=uuid4(), expire_at=now - 100),
+                            TokenRevocation(family_id=uuid4(), expire_at=now + 100)])
+        db.session.commit()
+
+        result = purge_refresh_tokens()
+
+        assert result.revocations_removed == 1
+        assert [revocation.expire_at for revocation in db.session.query(TokenRevocation).all()] == [now + 100]
+
+
+def test_purge_removes_tombstones_older_than_retention(test_app):
+    with test_app.app_context():
+        test_app.config["NOTES_TOMBSTONE_RETENTION_DAYS"] = 30
+        old, recent = NoteTombstone(id=uuid4(), user_id=uuid4()), NoteTombstone(id=uuid4(), user_id=uuid4())
+        old.deleted_at = datetime.utcnow() - timedelta(days=31)
+        db.session.add_all([old, recent])
+        db.session.commit()
+
+        result = purge_refresh_tokens(batch_size=1)
+
+        assert result.tombstones_removed == 1
+        assert [tombstone.id for tombstone in db.session.query(NoteTombstone).all()] == [recent.id]
+
+
+def test_purge_command_reports_removed_tokens(test_app):
+    with test_app.app_context():
+        add_tokens(expire_at=timestamp_in_seconds() - 100, active=True, count=3)
+
+    result = test_app.test_cli_runner().invoke(args=['refresh-tokens', 'purge', '--batch-size', '2'])
+
+    assert result.exit_code == 0
+    assert result.output.startswith("Removed 3 refresh tokens in ")
+
+
+def test_purge_scheduler_purges_until_stopped(test_app, monkeypatch):
+    scheduler = RefreshTokenPurgeScheduler(test_app, interval=0, batch_size=2)
+    runs = []
+
+    def purge(batch_size: int) -> PurgeResult:
+        runs.append(batch_size)
+        if len(runs) == 3:
+            scheduler.stop()
+        return PurgeResult(removed=0, seconds=0)
+
+    monkeypatch.setattr("opennote.auth.refresh_token_gc.purge_refresh_tokens", purge)
+    scheduler.run()
+
+    assert runs == [2, 2, 2]
@@ -0,0 +1,32 @@
+from opennote.app import create_app
+from opennote.database import db
+from opennote.db_model import User
+from opennote.test_config import AppTestConfig
+
+
+def test_check_startup_mode_requires_setup_db(tmp_path, monkeypatch, login):
+    monkeypatch.setenv("DB_STARTUP_MODE", "check")
+    app = create_app(AppTestConfig(test_database_url=f"sqlite:///{tmp_path / 'yana.db'}"))
+
+    with app.test_client() as client:
+        assert client.get('/notes/').status_code == 503
+
+        result = app.test_cli_runner().invoke(args=['setup-db'])
+        assert result.exit_code == 0
+        assert result.output.endswith("Database is up to date\n")
+
+        login(client)
+        assert client.get('/notes/').status_code == 200
+    with app.app_context():
+        assert db.session.query(User).filter_by(username="admin").first() is not None
+
+
+def test_check_startup_mode_accepts_migrated_database(tmp_path, monkeypatch, login):
+    migrated_url = f"sqlite:///{tmp_path / 'yana.db'}"
+    monkeypatch.setenv("DB_STARTUP_MODE", "migrate")
+    create_app(AppTestConfig(test_database_url=migrated_url))
+
+    monkeypatch.setenv("DB_STARTUP_MODE", "check")
+    app = create_app(AppTestConfig(test_database_url=migrated_url))
+    with login(app.test_client()) as client:
+        assert client.get('/notes/').status_code == 200
@@ -0,0 +1,168 @@
+import uuid
+
+import pytest
+
+from opennote.app import create_app
+from opennote.auth.jwt import JWT
+from opennote.auth.revocations import BloomFilter, TokenDenylist, revoke_family
+from opennote.common.data_time_utils import timestamp_in_seconds
+from opennote.database import db
+from opennote.db_model import RefreshToken, TokenRevocation
+from opennote.test_config import AppTestConfig
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture()
+def stateless_app(monkeypatch):
+    monkeypatch.setenv("REFRESH_TOKEN_MODE", "stateless")
+    return create_app(AppTestConfig())
+
+
+def _auth_cookie(client) -> str:
+    return client.get_cookie('Authorization').value
+
+
+def test_bloom_filter_contains_added_keys_and_few_others():
+    bloom = BloomFilter(capacity=1000, false_positive_rate=0.01)
+    added = [uuid.uuid4().bytes for _ in range(1000)]
+    for key in added:
+        bloom.add(key)
+
+    assert all(key in bloom for key in added)
+    false_positives = sum(uuid.uuid4().bytes in bloom for _ in range(10_000))
+    assert false_positives < 300
+
+
+def test_stateless_refresh_does_not_touch_database(stateless_app, login, query_budget):
+    client = login(stateless_app.test_client())
+    family_id = JWT.from_string(_auth_cookie(client).split(' ')[1]).family_id
+    # first refresh loads revocations
+    assert client.post('/access-token/refresh').status_code == 201
+
+    with query_budget(0):
+        assert client.post('/access-token/refresh').status_code == 201
+    refreshed = JWT.from_string(_auth_cookie(client).split(' ')[1])
+    assert refreshed.family_id == family_id
+    with stateless_app.app_context():
+        assert db.session.query(RefreshToken).count() == 0
+
+
+def test_stateless_logout_revokes_whole_family(stateless_app, login):
+    client = login(stateless_app.test_client())
+    login_cookie = _auth_cookie(client)
+    assert client.post('/access-token/refresh').status_code == 201
+
+    assert client.post('/access-token/logout').status_code == 204
+
+    client.set_cookie('Authorization', login_cookie)
+    assert client.post('/access-token/refresh').status_code == 403
+    other_session = login(stateless_app.test_client())
+    assert other_session.post('/access-token/refresh').status_code == 201
+    # revoked token can't log out other sessions
+    assert client.post('/access-token/logout-everywhere').status_code == 403
+    assert other_session.post('/access-token/refresh').status_code == 201
+
+
+def test_stateless_logout_revokes_tokens_refreshed_after_presented_one(stateless_app, login, monkeypatch):
+    day = 60 * 60 * 24
+    now = timestamp_in_seconds()
+    clock = {"now": now}
+    for module in ("opennote.auth.auth", "opennote.auth.jwt", "opennote.auth.revocations"):
+        monkeypatch.setattr(f"{module}.timestamp_in_seconds", lambda: clock["now"])
+    client = login(stateless_app.test_client())
+    login_cookie = _auth_cookie(client)
+    clock["now"] = now + 3 * day
+    assert client.post('/access-token/refresh').status_code == 201
+    refreshed_cookie = _auth_cookie(client)
+
+    client.set_cookie('Authorization', login_cookie)
+    assert client.post('/access-token/logout').status_code == 204
+
+    # login token would have expired by now, refreshed one not
+    clock["now"] = now + 8 * day
+    client.set_cookie('Authorization', refreshed_cookie)
+    assert client.post('/access-token/refresh').status_code == 403
+
+
+def test_stateless_logout_everywhere_revokes_tokens_issued_before(stateless_app, login):
+    client = login(stateless_app.test_client())
+    other_session = login(stateless_app.test_client())
+
+    assert client.post('/access-token/logout-everywhere').status_code == 204
+
+    assert other_session.post('/access-token/refresh').status_code == 403
+    # token issued after revocation stays valid, also within the same second
+    new_session = login(stateless_app.test_client())
+    assert new_session.post('/access-token/refresh').status_code == 201
+
+
+def test_denylist_is_loaded_when_app_is_created(tmp_path, monkeypatch, query_budget):
+    monkeypatch.setenv("REFRESH_TOKEN_MODE", "stateless")
+    database_url = f"sqlite:///{tmp_path / 'app.db'}"
+    family_id = uuid.uuid4()
+    with create_app(AppTestConfig(test_database_url=database_url)).app_context():
+        revoke_family(family_id)
+
+    started_app = create_app(AppTestConfig(test_database_url=database_url))
+
+    with started_app.app_context(), query_budget(0):
+        assert started_app.extensions["token_denylist"].is_revoked(family_id)
+
+
+def test_denylist_loads_revocations_of_other_instances_when_sync_is_due(stateless_app):
+    clock = FakeClock()
+    other_instance = TokenDenylist(sync_seconds=5, clock=clock)
+    family_id = uuid.uuid4()
+    with stateless_app.app_context():
+        assert not other_instance.is_revoked(family_id)
+        revoke_family(family_id)
+
+        clock.now = 4
+        assert not other_instance.is_revoked(family_id)
+        clock.now = 5
+        assert other_instance.is_revoked(family_id)
+
+
+def test_denylist_syncs_once_when_sync_is_due_for_concurrent_lookups(stateless_app, query_budget):
+    clock = FakeClock()
+    denylist = TokenDenylist(sync_seconds=5, clock=clock)
+    with stateless_app.app_context():
+        denylist.sync()
+        clock.now = 5
+
+        with query_budget(1):
+            denylist.sync()
+            denylist.sync()
+
+
+def test_denylist_forgets_expired_revocations(stateless_app):
+    denylist = TokenDenylist(capacity=2)
+    expired, valid = uuid.uuid4(), uuid.uuid4()
+    with stateless_app.app_context():
+        db.session.add(TokenRevocation(family_id=valid, expire_at=timestamp_in_seconds() + 100))
+        db.session.commit()
+        denylist.add(expired, timestamp_in_seconds() - 1)
+
+        denylist.sync()
+
+        assert len(denylist) == 1
+        assert denylist.is_revoked(valid)
+        assert not denylist.is_revoked(expired)
+
+
+def test_denylist_grows_bloom_filter_above_capacity(stateless_app):
+    denylist = TokenDenylist(capacity=2)
+    families = [uuid.uuid4() for _ in range(5)]
+    with stateless_app.app_context():
+        for family_id in families:
+            denylist.add(family_id, timestamp_in_seconds() + 100)
+
+        assert denylist.capacity >= 5
+        assert all(denylist.is_revoked(family_id) for family_id in families)